@@ -2,66 +2,344 @@ import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
+from sklearn.impute import SimpleImputer
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.linear_model import LinearRegression, LogisticRegression
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.metrics import mean_squared_error, r2_score
 import statsmodels.api as sm
+from scipy import sparse
 from typing import Dict, List, Any, Tuple, Optional
-from sqlalchemy import create_engine
+import sqlalchemy as sa
+from database import get_engine
+from setup_database import Property
+from model_registry import ModelRegistry
+from market_aggregates import ALL, LISTING_COLUMNS as MARKET_LISTING_COLUMNS, load_market_stats, compute_market_stats
+from analytics_queries import build_listings_query
+from listing_schema import read_listings
+from feature_matrix import FeatureMatrix, load_feature_matrix
+from forecast_engine import ForecastEngine
 import json
+import os
 from datetime import datetime, timedelta
 
+def _with_amenities(X, amenities: Optional[sparse.csr_matrix], rows: Optional[np.ndarray] = None):
+    """Transformed listing columns followed by the sparse amenity columns (rows of them, if given)"""
+    if amenities is None:
+        return X
+    if rows is not None:
+        amenities = amenities[rows]
+    return sparse.hstack([sparse.csr_matrix(X), amenities], format='csr')
+
+def _typical_amenities(amenities: sparse.csr_matrix) -> np.ndarray:
+    """Median value of each amenity present on at least half of the listings, 0 for the rest"""
+    columns = amenities.tocsc()
+    typical = np.zeros(columns.shape[1], dtype=np.float32)
+    for column in range(columns.shape[1]):
+        values = columns.data[columns.indptr[column]:columns.indptr[column + 1]]
+        if len(values) * 2 >= columns.shape[0]:
+            typical[column] = np.median(values)
+    return typical
+
 class MarketAnalytics:
-    def __init__(self, db_engine):
-        self.engine = db_engine
+    # Price model inputs; year and month are derived from begin_date by the listings query
+    PRICE_FEATURES = [
+        'construction_ft2', 'year', 'month',
+        'total_bedrooms', 'total_baths', 'garage_stalls'
+    ]
+    CATEGORICAL_FEATURES = ['property_type', 'area']
+    TARGET = 'current_price'
+    # Amenities from property_features used by the price model: the most common ones,
+    # present on at least PROPERTY_FEATURE_MIN_COUNT of the market's listings
+    PROPERTY_FEATURE_MIN_COUNT = 20
+    MAX_PROPERTY_FEATURES = 100
+
+    def __init__(self, db_engine=None, model_registry: Optional[ModelRegistry] = None,
+                 backend: Optional[str] = None, snapshot_path: Optional[str] = None):
+        self.engine = db_engine or get_engine()
+        self.registry = model_registry or ModelRegistry()
+        # 'database' (default) or 'duckdb' to scan the latest Parquet snapshot instead;
+        # set with ANALYTICS_BACKEND / ANALYTICS_SNAPSHOT
+        self.backend = backend or os.getenv('ANALYTICS_BACKEND', 'database')
+        if self.backend == 'duckdb':
+            from duckdb_analytics import SnapshotAnalytics
+            self.snapshot = SnapshotAnalytics(snapshot_path or os.getenv('ANALYTICS_SNAPSHOT') or None)
+        elif self.backend == 'database':
+            self.snapshot = None
+        else:
+            raise ValueError(f"Unknown analytics backend {self.backend}; use 'database' or 'duckdb'")
+        # Parallelism of model fitting; batch workers set this to 1
+        self.n_jobs = -1
         self.models = {}
         self.transformers = {}
+        self.feature_matrix: Optional[FeatureMatrix] = None
+        self.forecast_engine = ForecastEngine(max_workers=1)
         
     def analyze_price_trends(self, area: Optional[str] = None, 
                            property_type: Optional[str] = None) -> Dict[str, Any]:
         """Analyze and predict price trends"""
-        # Build query based on filters
-        query = """
-            SELECT 
-                p.*,
-                EXTRACT(MONTH FROM begin_date) as month,
-                EXTRACT(YEAR FROM begin_date) as year
-            FROM properties p
-            WHERE begin_date IS NOT NULL
-                AND current_price > 0
+        df = self._load_listings(area, property_type)
+        return self.analyze_listings(df, area, property_type)
+
+    def _load_listings(self, area: Optional[str] = None,
+                       property_type: Optional[str] = None) -> pd.DataFrame:
+        """Listings with a begin date and a positive price, optionally for one market"""
+        # Only the model inputs and the columns the aggregate fallback needs
+        columns = (['id'] + self.PRICE_FEATURES + self.CATEGORICAL_FEATURES + [self.TARGET]
+                   + [column.key for column in MARKET_LISTING_COLUMNS])
+        query = build_listings_query(columns, area=area, property_type=property_type)
+        if self.snapshot:
+            return self.snapshot.read_listings(query)
+        return read_listings(query, self.engine)
+
+    def analyze_listings(self, df: pd.DataFrame, area: Optional[str] = None,
+                         property_type: Optional[str] = None,
+                         market_stats: Optional[pd.DataFrame] = None,
+                         data_version: Optional[Dict[str, Any]] = None,
+                         forecasts: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Trends, seasonality, forecasts and model metrics for one market's listings.
+
+        market_stats, data_version and forecasts can be passed in by callers that
+        already computed them for every market (see batch_analytics.py); otherwise
+        they are read from the database or computed for this market.
         """
-        
-        if area:
-            query += f" AND area = '{area}'"
-        if property_type:
-            query += f" AND property_type = '{property_type}'"
-            
-        df = pd.read_sql(query, self.engine)
-        
-        # Prepare features for modeling
-        features = [
-            'construction_ft2', 'year', 'month', 
-            'total_bedrooms', 'total_baths', 'garage_stalls'
-        ]
-        
-        categorical_features = ['property_type', 'area']
-        target = 'current_price'
-        
-        # Create and train price prediction model
-        model, transformer = self._train_price_model(
-            df, features, categorical_features, target
+        features = self.PRICE_FEATURES
+        categorical_features = self.CATEGORICAL_FEATURES
+        target = self.TARGET
+
+        # Reuse the fitted price model unless the underlying listings changed
+        model, transformer = self._get_price_model(
+            df, features, categorical_features, target, area, property_type, data_version
         )
         
         # Generate predictions and insights
-        trends = self._analyze_temporal_trends(df, model, transformer)
-        seasonality = self._analyze_seasonality(df)
-        forecasts = self._generate_price_forecasts(df, model, transformer)
-        
+        if market_stats is None:
+            market_stats = self._load_market_stats(df, area, property_type)
+        trends = self._analyze_temporal_trends(market_stats)
+        seasonality = self._analyze_seasonality(market_stats)
+        if forecasts is None:
+            forecasts = self._generate_price_forecasts(market_stats, area, property_type)
+
         return {
             "trends": trends,
             "seasonality": seasonality,
             "forecasts": forecasts,
+            "listing_model_forecasts": self._typical_listing_forecasts(df, model, transformer),
             "model_metrics": self._get_model_metrics(model)
         }
+
+    def _data_version(self, area: Optional[str], property_type: Optional[str]) -> Dict[str, Any]:
+        """Row count and last update time of the listings behind a market"""
+        query = sa.select(
+            sa.func.count().label('listings'),
+            sa.func.max(Property.updated_at).label('last_updated')
+        ).where(Property.begin_date.isnot(None), Property.current_price > 0)
+        if area:
+            query = query.where(Property.area == area)
+        if property_type:
+            query = query.where(Property.property_type == property_type)
+        if self.snapshot:
+            row = self.snapshot.read(query).iloc[0]
+            last_updated = None if pd.isna(row['last_updated']) else row['last_updated'].to_pydatetime()
+            return {"listings": int(row['listings']), "last_updated": last_updated}
+        with self.engine.connect() as conn:
+            row = conn.execute(query).one()
+        return {"listings": row.listings, "last_updated": row.last_updated}
+
+    def _get_price_model(self, df: pd.DataFrame, features: List[str], categorical_features: List[str],
+                         target: str, area: Optional[str], property_type: Optional[str],
+                         data_version: Optional[Dict[str, Any]] = None):
+        """Price model from the registry, trained and stored only on a miss"""
+        if df.empty:
+            return None, None
+
+        key = self.registry.make_key(
+            area=area, property_type=property_type, features=features,
+            categorical_features=categorical_features, target=target,
+            property_features=(self.PROPERTY_FEATURE_MIN_COUNT, self.MAX_PROPERTY_FEATURES),
+            data_version=data_version or self._data_version(area, property_type)
+        )
+        cached = self.registry.get(key)
+        if cached is None:
+            cached = self._train_price_model(df, features, categorical_features, target)
+            self.registry.put(key, cached)
+
+        model, transformer = cached
+        self.models[(area, property_type)] = model
+        self.transformers[(area, property_type)] = transformer
+        return model, transformer
+
+    def _train_price_model(self, df: pd.DataFrame, features: List[str], categorical_features: List[str],
+                           target: str) -> Tuple[RandomForestRegressor, ColumnTransformer]:
+        """Fit a random forest price model; metrics come from a 20% holdout"""
+        # Feature columns the listings table does not provide are skipped
+        features = [feature for feature in features if feature in df.columns]
+        categorical_features = [feature for feature in categorical_features if feature in df.columns]
+
+        transformer = ColumnTransformer([
+            ('numeric', Pipeline([
+                ('impute', SimpleImputer(strategy='median')),
+                ('scale', StandardScaler())
+            ]), features),
+            ('categorical', Pipeline([
+                ('impute', SimpleImputer(strategy='constant', fill_value='Unknown')),
+                ('encode', OneHotEncoder(handle_unknown='ignore'))
+            ]), categorical_features)
+        ])
+        X = df[features + categorical_features].astype({feature: float for feature in features})
+        y = df[target]
+        amenities, property_features = self._property_feature_inputs(df)
+
+        model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=self.n_jobs)
+        metrics = {"samples": len(df)}
+        if len(df) >= 20:
+            X_train, X_test, y_train, y_test, train_rows, test_rows = train_test_split(
+                X, y, np.arange(len(df)), test_size=0.2, random_state=42
+            )
+            model.fit(_with_amenities(transformer.fit_transform(X_train), amenities, train_rows), y_train)
+            predictions = model.predict(_with_amenities(transformer.transform(X_test), amenities, test_rows))
+            metrics.update(
+                r2=float(r2_score(y_test, predictions)),
+                rmse=float(np.sqrt(mean_squared_error(y_test, predictions)))
+            )
+        else:
+            model.fit(_with_amenities(transformer.fit_transform(X), amenities), y)
+
+        model.metrics_ = metrics
+        model.input_features_ = features + categorical_features
+        model.property_features_ = property_features
+        model.property_feature_names_ = self.feature_matrix.names(property_features) if property_features else []
+        return model, transformer
+
+    def _property_features(self) -> FeatureMatrix:
+        """Property x feature matrix, loaded on first use and brought up to date afterwards"""
+        if self.snapshot:
+            if self.feature_matrix is None:
+                self.feature_matrix = FeatureMatrix.build(self.snapshot.read)
+        elif self.feature_matrix is None:
+            self.feature_matrix = load_feature_matrix(self.engine)
+        else:
+            self.feature_matrix.update(lambda query: pd.read_sql(query, self.engine))
+        return self.feature_matrix
+
+    def _property_feature_inputs(self, df: pd.DataFrame,
+                                 feature_ids: Optional[List[int]] = None) -> Tuple[Optional[sparse.csr_matrix], List[int]]:
+        """Sparse amenity columns for df's listings (the frequent ones unless feature_ids is given)"""
+        if 'id' not in df.columns or df.empty:
+            return None, []
+        matrix = self._property_features()
+        property_ids = df['id'].to_numpy(dtype=np.int64)
+        if feature_ids is None:
+            feature_ids = matrix.frequent_features(property_ids, self.PROPERTY_FEATURE_MIN_COUNT,
+                                                   self.MAX_PROPERTY_FEATURES).tolist()
+        if not feature_ids:
+            return None, []
+        return matrix.rows(property_ids, feature_ids), list(feature_ids)
+
+    def _generate_price_forecasts(self, market_stats: pd.DataFrame, area: Optional[str],
+                                  property_type: Optional[str]) -> List[Dict[str, Any]]:
+        """Median price forecast with an 80% interval for the months after market_stats"""
+        if market_stats.empty:
+            return []
+        return self.forecast_engine.forecast_market(market_stats, area, property_type)
+
+    def _typical_listing_forecasts(self, df: pd.DataFrame, model, transformer,
+                                   periods: int = 6) -> List[Dict[str, Any]]:
+        """Price model estimate for a typical listing in each of the next periods months"""
+        if model is None or df.empty:
+            return []
+
+        # Typical listing: median numerics and most frequent categoricals
+        typical = {}
+        for feature in model.input_features_:
+            column = df[feature]
+            if pd.api.types.is_numeric_dtype(column):
+                typical[feature] = column.median()
+            else:
+                typical[feature] = column.mode().iloc[0] if column.notna().any() else None
+
+        last_month = pd.Timestamp(int(df['year'].max()), int(df.loc[df['year'] == df['year'].max(), 'month'].max()), 1)
+        months = [last_month + pd.DateOffset(months=offset) for offset in range(1, periods + 1)]
+        future = pd.DataFrame([dict(typical, year=month.year, month=month.month) for month in months])
+        future = future[model.input_features_]
+
+        # Typical amenities: those most listings have, at their median value
+        property_features = getattr(model, 'property_features_', [])
+        amenities = None
+        if property_features:
+            listing_amenities, _ = self._property_feature_inputs(df, property_features)
+            typical_amenities = (_typical_amenities(listing_amenities) if listing_amenities is not None
+                                 else np.zeros(len(property_features), dtype=np.float32))
+            amenities = sparse.csr_matrix(np.tile(typical_amenities, (len(future), 1)))
+
+        predictions = model.predict(_with_amenities(transformer.transform(future), amenities))
+        return [
+            {"month": month.strftime('%Y-%m'), "predicted_price": float(price)}
+            for month, price in zip(months, predictions)
+        ]
+
+    def _get_model_metrics(self, model) -> Dict[str, Any]:
+        """Holdout metrics recorded when the model was trained"""
+        if model is None:
+            return {}
+        metrics = dict(getattr(model, 'metrics_', {}))
+        metrics["features"] = list(getattr(model, 'input_features_', []))
+        metrics["property_features"] = list(getattr(model, 'property_feature_names_', []))
+        return metrics
+
+    def _load_market_stats(self, df: pd.DataFrame, area: Optional[str],
+                           property_type: Optional[str]) -> pd.DataFrame:
+        """Monthly aggregates from market_monthly_stats, computed from df if not refreshed yet"""
+        if self.snapshot:
+            return self.snapshot.market_stats(area, property_type)
+        stats = load_market_stats(self.engine, area, property_type)
+        if stats.empty and not df.empty:
+            stats = compute_market_stats(df)
+            stats = stats[(stats['area'] == (area or ALL))
+                          & (stats['property_type'] == (property_type or ALL))]
+            stats = stats.drop(columns=['area', 'property_type']).reset_index(drop=True)
+        return stats
+
+    def _analyze_temporal_trends(self, market_stats: pd.DataFrame) -> Dict[str, Any]:
+        """Month-over-month price trends from the monthly aggregates"""
+        if market_stats.empty:
+            return {"monthly": [], "trend_per_month": None, "yoy_change": None}
+
+        stats = market_stats.set_index('month').sort_index()
+        median = stats['median_price']
+
+        # Least-squares slope of the monthly median, as a share of the average price
+        months = np.arange(len(median))
+        slope = np.polyfit(months, median.values, 1)[0] if len(median) > 1 else 0.0
+
+        yoy = None
+        year_ago = median.index[-1] - pd.DateOffset(years=1)
+        if year_ago in median.index:
+            yoy = float(median.iloc[-1] / median[year_ago] - 1)
+
+        monthly = stats.reset_index()
+        monthly['month'] = monthly['month'].dt.strftime('%Y-%m')
+        return {
+            "monthly": monthly.replace({np.nan: None}).to_dict('records'),
+            "trend_per_month": float(slope / median.mean()) if median.mean() else None,
+            "yoy_change": yoy
+        }
+
+    def _analyze_seasonality(self, market_stats: pd.DataFrame) -> Dict[str, Any]:
+        """Calendar-month price and volume indices (1.0 = average month)"""
+        if market_stats.empty:
+            return {"price_index": {}, "volume_index": {}, "peak_month": None, "low_month": None}
+
+        by_month = market_stats.groupby(market_stats['month'].dt.month).agg(
+            median_price=('median_price', 'mean'),
+            listings=('listings', 'mean')
+        )
+        price_index = by_month['median_price'] / by_month['median_price'].mean()
+        volume_index = by_month['listings'] / by_month['listings'].mean()
+        return {
+            "price_index": {int(month): float(value) for month, value in price_index.items()},
+            "volume_index": {int(month): float(value) for month, value in volume_index.items()},
+            "peak_month": int(price_index.idxmax()),
+            "low_month": int(price_index.idxmin())
+        }
\ No newline at end of file
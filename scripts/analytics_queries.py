@@ -0,0 +1,50 @@
+import sqlalchemy as sa
+from datetime import datetime
+from typing import Iterable, List, Optional
+from setup_database import Property
+
+def listing_columns(columns: Iterable[str]) -> List[str]:
+    """The requested columns that exist on the properties table, in request order"""
+    table = Property.__table__
+    seen = []
+    for column in columns:
+        if column in table.c and column not in seen:
+            seen.append(column)
+    return seen
+
+def build_listings_query(columns: Iterable[str], area: Optional[str] = None,
+                         property_type: Optional[str] = None,
+                         begin_after: Optional[datetime] = None,
+                         begin_before: Optional[datetime] = None,
+                         min_price: float = 0, max_price: Optional[float] = None,
+                         date_parts: bool = True) -> sa.Select:
+    """SELECT of only the needed listing columns, with every filter as a bound parameter.
+
+    Requested columns the table does not have (e.g. model features that are not
+    imported yet) are skipped. With date_parts=True, month and year of begin_date
+    are computed by the database. Filter values never end up in the SQL text, so
+    each query shape compiles to one cached statement regardless of the market.
+    """
+    table = Property.__table__
+    selected = [table.c[column] for column in listing_columns(columns)]
+    if date_parts:
+        selected += [
+            sa.extract('month', table.c.begin_date).label('month'),
+            sa.extract('year', table.c.begin_date).label('year')
+        ]
+
+    query = sa.select(*selected).where(
+        table.c.begin_date.isnot(None),
+        table.c.current_price > sa.bindparam('min_price', min_price)
+    )
+    if area:
+        query = query.where(table.c.area == sa.bindparam('area', area))
+    if property_type:
+        query = query.where(table.c.property_type == sa.bindparam('property_type', property_type))
+    if begin_after:
+        query = query.where(table.c.begin_date >= sa.bindparam('begin_after', begin_after))
+    if begin_before:
+        query = query.where(table.c.begin_date < sa.bindparam('begin_before', begin_before))
+    if max_price is not None:
+        query = query.where(table.c.current_price <= sa.bindparam('max_price', max_price))
+    return query
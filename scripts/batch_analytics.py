@@ -0,0 +1,143 @@
+import argparse
+import json
+import os
+import time
+import pandas as pd
+import sqlalchemy as sa
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from setup_database import Property, MarketMonthlyStats
+from database import get_engine
+from market_aggregates import compute_market_stats
+from model_registry import ModelRegistry, MODEL_DIR
+from advanced_analytics import MarketAnalytics
+from feature_matrix import load_feature_matrix
+from forecast_engine import ForecastEngine
+
+# Per-process analytics instance, created by the pool initializer
+_analytics = None
+
+def _init_worker(model_dir: str, db_url: str):
+    global _analytics
+    # Listings, aggregates, data versions and forecasts come from the parent; workers
+    # still read the feature matrix (and its updates) from the parent's database
+    _analytics = MarketAnalytics(get_engine(db_url, pool_size=1, max_overflow=0),
+                                 model_registry=ModelRegistry(model_dir))
+    _analytics.n_jobs = 1
+
+def _analyze_partition(area: str, property_type: str, listings: pd.DataFrame,
+                       market_stats: pd.DataFrame, data_version: Dict[str, Any],
+                       forecasts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    result = _analytics.analyze_listings(listings, area, property_type, market_stats=market_stats,
+                                         data_version=data_version, forecasts=forecasts)
+    return {
+        "area": area,
+        "property_type": property_type,
+        "listings": len(listings),
+        "seconds": time.perf_counter() - start,
+        "result": result
+    }
+
+def _market_versions(engine) -> Dict[tuple, Dict[str, Any]]:
+    """Data version of every market in one grouped query (same values as MarketAnalytics._data_version)"""
+    query = (
+        sa.select(Property.area, Property.property_type,
+                  sa.func.count().label('listings'),
+                  sa.func.max(Property.updated_at).label('last_updated'))
+        .where(Property.begin_date.isnot(None), Property.current_price > 0)
+        .group_by(Property.area, Property.property_type)
+    )
+    with engine.connect() as conn:
+        return {
+            (row.area, row.property_type): {"listings": row.listings, "last_updated": row.last_updated}
+            for row in conn.execute(query)
+        }
+
+def analyze_all_markets(engine=None, max_workers: Optional[int] = None, min_listings: int = 20,
+                        model_dir: str = MODEL_DIR) -> Dict[str, Any]:
+    """Run the price trend analysis for every area x property_type in one pass.
+
+    Listings, monthly aggregates and data versions are loaded once and partitioned
+    in memory; each partition is analyzed in a worker process. Markets with fewer
+    than min_listings listings are reported as skipped.
+    """
+    engine = engine or get_engine()
+    analytics = MarketAnalytics(engine)
+    start = time.perf_counter()
+
+    listings = analytics._load_listings()
+    stats = pd.read_sql(sa.select(MarketMonthlyStats), engine)
+    if stats.empty:
+        stats = compute_market_stats(listings)
+    stats['month'] = pd.to_datetime(stats['month'])
+    stats_by_market = {key: group for key, group in stats.groupby(['area', 'property_type'], observed=True)}
+    versions = _market_versions(engine)
+    # Brought up to date once here; workers then load the cached matrix
+    load_feature_matrix(engine)
+    load_seconds = time.perf_counter() - start
+    print(f"Loaded {len(listings)} listings and {len(stats)} aggregate rows in {load_seconds:.2f}s")
+
+    # Every market's price series is forecast in one pass over the panel of monthly aggregates
+    forecast_engine = ForecastEngine(max_workers=max_workers)
+    forecasts = forecast_engine.forecast(stats)
+    print(f"Forecast {forecast_engine.last_run['series']} markets in {forecast_engine.last_run['seconds']:.2f}s")
+
+    partitions, skipped = [], []
+    for (area, property_type), group in listings.groupby(['area', 'property_type'], observed=True):
+        if len(group) < min_listings:
+            skipped.append({"area": area, "property_type": property_type, "listings": len(group)})
+            continue
+        market_stats = stats_by_market.get((area, property_type), stats.iloc[0:0])
+        market_stats = market_stats.drop(columns=['id', 'area', 'property_type', 'refreshed_at'],
+                                         errors='ignore').reset_index(drop=True)
+        partitions.append((area, property_type, group, market_stats, versions.get((area, property_type)),
+                           forecasts.get((area, property_type), [])))
+
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(partitions) or 1))
+    print(f"Analyzing {len(partitions)} markets with {max_workers} workers "
+          f"({len(skipped)} skipped below {min_listings} listings)...")
+
+    results, errors = [], []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(model_dir, engine.url.render_as_string(hide_password=False))) as pool:
+        futures = {pool.submit(_analyze_partition, *partition): partition[:2] for partition in partitions}
+        for future in as_completed(futures):
+            area, property_type = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                errors.append({"area": area, "property_type": property_type, "error": str(e)})
+                print(f"Error analyzing {area} / {property_type}: {str(e)}")
+                continue
+            results.append(result)
+            print(f"{area} / {property_type}: {result['listings']} listings in {result['seconds']:.2f}s")
+
+    elapsed = time.perf_counter() - start
+    print(f"Analyzed {len(results)} markets in {elapsed:.2f}s")
+    return {
+        "markets": sorted(results, key=lambda result: (result['area'], result['property_type'])),
+        "skipped": skipped,
+        "errors": errors,
+        "load_seconds": load_seconds,
+        "seconds": elapsed,
+        "workers": max_workers
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Price trend analysis for every market")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument('--min-listings', type=int, default=20)
+    args = parser.parse_args()
+
+    results = analyze_all_markets(max_workers=args.workers, min_listings=args.min_listings)
+
+    os.makedirs('output', exist_ok=True)
+    output_path = os.path.join('output', f"market_trends_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"Saved results to {output_path}")
+
+if __name__ == "__main__":
+    main()
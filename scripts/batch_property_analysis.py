@@ -0,0 +1,232 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+import anthropic
+import pandas as pd
+import sqlalchemy as sa
+from dotenv import load_dotenv
+from setup_database import Property, PropertyFeature, Feature
+from database import get_engine
+from claude_api import MODEL, property_analysis_prompt
+from context_window import estimate_tokens
+from response_cache import ResponseCache, cache_key
+
+# Load environment variables
+load_dotenv()
+
+CHECKPOINT_PATH = os.path.join('output', 'property_analyses.jsonl')
+
+# Overloaded (529), rate limited (429) and transient server errors are retried
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504, 529}
+
+PROPERTY_COLUMNS = [Property.id, Property.list_number, Property.area, Property.state,
+                    Property.current_price, Property.property_type]
+
+class TokenBucket:
+    """Async token bucket: capacity tokens, refilled at rate tokens per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1.0):
+        # A request larger than the bucket waits for a full bucket instead of forever
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+class Checkpoint:
+    """Analyses written as JSON lines as they finish.
+
+    Each record carries the cache_key of its prompt. When a run is started again
+    with the same path, listings with an analysis of the same prompt are skipped;
+    failed ones and listings whose text changed since are analyzed again.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH):
+        self.path = path
+        self.done: Set[Tuple[str, str]] = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A run killed mid-write leaves a partial last line
+                        continue
+                    if 'analysis' in record and 'prompt_key' in record:
+                        self.done.add((record['list_number'], record['prompt_key']))
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = open(path, 'a')
+
+    def write(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        if 'analysis' in record:
+            self.done.add((record['list_number'], record['prompt_key']))
+
+    def close(self):
+        self._file.close()
+
+def _retry_delay(error: Exception, attempt: int, backoff: float, max_backoff: float) -> float:
+    """Seconds to wait before retrying: the server's retry-after if given, else jittered exponential"""
+    if isinstance(error, anthropic.APIStatusError):
+        try:
+            return min(max_backoff, float(error.response.headers.get('retry-after')))
+        except (TypeError, ValueError):
+            pass
+    return min(max_backoff, backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code in RETRY_STATUSES
+    return isinstance(error, anthropic.APIConnectionError)
+
+async def analyze_properties(properties: Iterable[Dict], client: anthropic.AsyncAnthropic,
+                             checkpoint_path: str = CHECKPOINT_PATH, model: str = MODEL,
+                             max_tokens: int = 1024, temperature: float = 0.7, concurrency: int = 8,
+                             requests_per_minute: float = 50, tokens_per_minute: Optional[float] = None,
+                             max_retries: int = 6, backoff: float = 1.0, max_backoff: float = 60.0,
+                             cache: Optional[ResponseCache] = None) -> Dict[str, int]:
+    """Analyze property dicts concurrently, appending each result to a checkpoint file.
+
+    At most concurrency requests are in flight, and requests (and optionally
+    estimated input tokens) are paced by token buckets holding one second of
+    the per-minute budget. Overload and rate limit errors are retried with
+    exponential backoff; listings already analyzed from the same prompt in the
+    checkpoint are skipped. The client should be created with max_retries=0 so retries are
+    only done here. With a cache, listings whose prompt was answered before
+    reuse that answer without a request.
+
+    Returns:
+        Counts of analyzed, skipped, failed and cached (analyzed from the cache) listings
+    """
+    checkpoint = Checkpoint(checkpoint_path)
+    requests = TokenBucket(requests_per_minute / 60, max(1.0, requests_per_minute / 60))
+    tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute / 60) if tokens_per_minute else None
+    counts = {'analyzed': 0, 'skipped': 0, 'failed': 0, 'cached': 0}
+    properties = iter(properties)
+    start = time.perf_counter()
+
+    async def analyze(prompt: str, key: str) -> Dict[str, Any]:
+        cached = cache.get(key) if cache else None
+        if cached is not None:
+            return {"analysis": cached['response'], "model": model, "input_tokens": cached['input_tokens'],
+                    "output_tokens": cached['output_tokens'], "cached": True}
+
+        for attempt in range(max_retries + 1):
+            await requests.acquire()
+            if tokens is not None:
+                await tokens.acquire(estimate_tokens(prompt))
+            try:
+                response = await client.messages.create(
+                    model=model, max_tokens=max_tokens, temperature=temperature,
+                    messages=[{"role": "user", "content": prompt}]
+                )
+                if cache:
+                    cache.put(key, response.content[0].text, response.usage.input_tokens,
+                              response.usage.output_tokens)
+                return {"analysis": response.content[0].text, "model": response.model,
+                        "input_tokens": response.usage.input_tokens,
+                        "output_tokens": response.usage.output_tokens}
+            except Exception as e:
+                if attempt == max_retries or not _retryable(e):
+                    return {"error": str(e)}
+                await asyncio.sleep(_retry_delay(e, attempt, backoff, max_backoff))
+
+    async def worker():
+        # Workers share one iterator, so a large query is never held in memory as tasks
+        for property_data in properties:
+            list_number = str(property_data.get('list_number'))
+            prompt = property_analysis_prompt(property_data)
+            key = cache_key(model, max_tokens, temperature, None, prompt)
+            if (list_number, key) in checkpoint.done:
+                counts['skipped'] += 1
+                continue
+            result = await analyze(prompt, key)
+            checkpoint.write({"list_number": list_number, "prompt_key": key, **result,
+                              "analyzed_at": datetime.now().isoformat()})
+            counts['failed' if 'error' in result else 'analyzed'] += 1
+            counts['cached'] += result.get('cached', False)
+            done = counts['analyzed'] + counts['failed']
+            if done % 100 == 0:
+                print(f"Analyzed {counts['analyzed']} listings ({counts['failed']} failed) "
+                      f"in {time.perf_counter() - start:.1f}s")
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        checkpoint.close()
+    return counts
+
+def load_properties(engine, since: Optional[datetime] = None, limit: Optional[int] = None,
+                    chunksize: int = 1000) -> Iterable[Dict]:
+    """Property dicts for analyze_properties, features as "Name: value" text, in chunks"""
+    query = sa.select(*PROPERTY_COLUMNS).order_by(Property.id)
+    if since is not None:
+        query = query.where(Property.updated_at >= since)
+    if limit is not None:
+        query = query.limit(limit)
+
+    for chunk in pd.read_sql(query, engine, chunksize=chunksize):
+        features = pd.read_sql(
+            sa.select(PropertyFeature.property_id, Feature.name, PropertyFeature.value)
+            .join(Feature, PropertyFeature.feature_id == Feature.id)
+            .where(PropertyFeature.property_id.in_(chunk['id'].tolist())),
+            engine
+        )
+        text = (features['name'] + ': ' + features['value'].fillna('')).groupby(features['property_id']).agg(', '.join)
+        chunk['features'] = chunk['id'].map(text).fillna('')
+        yield from chunk.drop(columns=['id']).to_dict('records')
+
+async def _run(args) -> Dict[str, int]:
+    client = anthropic.AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"), base_url=args.base_url, max_retries=0)
+    cache = None if args.no_cache else ResponseCache()
+    try:
+        since = datetime.fromisoformat(args.since) if args.since else None
+        return await analyze_properties(
+            load_properties(get_engine(), since, args.limit), client, args.checkpoint,
+            concurrency=args.concurrency, requests_per_minute=args.rpm, tokens_per_minute=args.tpm, cache=cache
+        )
+    finally:
+        await client.close()
+        if cache:
+            stats = cache.stats()
+            print(f"Response cache: {stats['hits']} hits, {stats['misses']} misses, "
+                  f"{stats['evictions']} evicted, {stats['entries']} entries")
+            cache.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze listings with Claude concurrently, resuming from a checkpoint")
+    parser.add_argument('--since', help="Only listings updated at or after this ISO timestamp (e.g. the last import)")
+    parser.add_argument('--limit', type=int, help="Analyze at most this many listings")
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH, help="Results file; rerun with the same file to resume")
+    parser.add_argument('--concurrency', type=int, default=8, help="Requests in flight")
+    parser.add_argument('--rpm', type=float, default=50, help="Requests per minute")
+    parser.add_argument('--tpm', type=float, help="Estimated input tokens per minute")
+    parser.add_argument('--no-cache', action='store_true', help="Always call the API, even for unchanged listings")
+    parser.add_argument('--base-url', help="API base URL (default: ANTHROPIC_BASE_URL or the public API)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = asyncio.run(_run(args))
+    print(f"Analyzed {counts['analyzed']} listings, skipped {counts['skipped']} already done, "
+          f"{counts['failed']} failed in {time.perf_counter() - start:.1f}s; results in {args.checkpoint}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import argparse
+import statistics
+import time
+from mls_field_mapper import MLSFieldMapper
+from synthetic_mls import synthetic_mls_frame
+
+def benchmark(rows: int, repeat: int, seed_value: int = 42) -> dict:
+    df = synthetic_mls_frame(rows, seed_value)
+    mapper = MLSFieldMapper()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        mapper.process_dataframe(df)
+        timings.append(time.perf_counter() - start)
+    seconds = statistics.median(timings)
+    return {'rows': rows, 'seconds': seconds, 'rows_per_sec': rows / seconds if seconds > 0 else 0.0}
+
+def main():
+    parser = argparse.ArgumentParser(description="Time MLSFieldMapper.process_dataframe on synthetic listings")
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Mapping {args.rows} synthetic listings ({args.repeat} runs)...")
+    result = benchmark(args.rows, args.repeat)
+    print(f"Median {result['seconds']:.2f}s ({result['rows_per_sec']:.0f} rows/sec)")
+
+if __name__ == "__main__":
+    main()
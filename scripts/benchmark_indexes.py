@@ -0,0 +1,132 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import numpy as np
+import sqlalchemy as sa
+from datetime import datetime, timedelta
+from typing import Dict, List
+from setup_database import Base, Property, Feature, FeatureCategory, PropertyFeature
+from database import get_engine
+from migrations import migrate, downgrade, applied_versions
+
+INDEX_MIGRATION = 2
+
+# Representative hot-path queries: analytics filter, feature rewrite, feature lookup
+QUERIES = {
+    'price_trends_filter': ("""
+        SELECT id, current_price, begin_date FROM properties
+        WHERE begin_date IS NOT NULL AND current_price > 0
+            AND area = :area AND property_type = :property_type
+            AND begin_date >= :since
+    """, {'area': 'Area 3', 'property_type': 'Condo', 'since': datetime(2023, 1, 1)}),
+    'features_by_property': ("""
+        SELECT feature_id, value FROM property_features WHERE property_id = :property_id
+    """, {'property_id': 1234}),
+    'properties_by_feature': ("""
+        SELECT COUNT(*) FROM property_features WHERE feature_id = :feature_id
+    """, {'feature_id': 3}),
+    'feature_by_name': ("""
+        SELECT id FROM features WHERE category_id = :category_id AND name = :name
+    """, {'category_id': 2, 'name': 'Feature 7'}),
+}
+
+def seed(engine, rows: int, seed_value: int = 42):
+    """Fill an empty database with deterministic synthetic listings and features"""
+    rng = np.random.default_rng(seed_value)
+    start = datetime(2020, 1, 1)
+    properties = [
+        {
+            'id': i + 1,
+            'list_number': str(100000 + i),
+            'area': f"Area {rng.integers(20)}",
+            'property_type': ['House', 'Condo', 'Lot', 'Commercial'][rng.integers(4)],
+            'current_price': float(rng.integers(50, 2000) * 1000),
+            'begin_date': start + timedelta(days=int(rng.integers(1500)))
+        }
+        for i in range(rows)
+    ]
+    categories = [{'id': i + 1, 'name': f"Category {i}"} for i in range(5)]
+    features = [{'id': i + 1, 'category_id': i % 5 + 1, 'name': f"Feature {i}"} for i in range(50)]
+    property_features = [
+        {'property_id': prop['id'], 'feature_id': int(feature_id), 'value': 'Yes'}
+        for prop in properties for feature_id in rng.choice(50, size=5, replace=False) + 1
+    ]
+    with engine.begin() as conn:
+        conn.execute(sa.insert(Property.__table__), properties)
+        conn.execute(sa.insert(FeatureCategory.__table__), categories)
+        conn.execute(sa.insert(Feature.__table__), features)
+        conn.execute(sa.insert(PropertyFeature.__table__), property_features)
+
+def explain(conn, sql: str, params: Dict) -> str:
+    if conn.dialect.name == 'postgresql':
+        plan = conn.execute(sa.text(f"EXPLAIN ANALYZE {sql}"), params).scalars().all()
+    else:
+        plan = [row[-1] for row in conn.execute(sa.text(f"EXPLAIN QUERY PLAN {sql}"), params)]
+    return ' | '.join(line.strip() for line in plan)
+
+def run_queries(engine, repeat: int) -> Dict[str, Dict]:
+    """Median wall time and plan for each benchmark query"""
+    results = {}
+    with engine.connect() as conn:
+        for name, (sql, params) in QUERIES.items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(sa.text(sql), params).fetchall()
+                timings.append(time.perf_counter() - start)
+            results[name] = {'ms': statistics.median(timings) * 1000, 'plan': explain(conn, sql, params)}
+    return results
+
+def report(before: Dict, after: Dict) -> List[str]:
+    lines = [f"{'query':<24}{'before ms':>12}{'after ms':>12}{'speedup':>10}"]
+    for name in QUERIES:
+        old, new = before.get(name), after[name]
+        if old:
+            speedup = old['ms'] / new['ms'] if new['ms'] > 0 else float('inf')
+            lines.append(f"{name:<24}{old['ms']:>12.3f}{new['ms']:>12.3f}{speedup:>9.1f}x")
+        else:
+            lines.append(f"{name:<24}{'-':>12}{new['ms']:>12.3f}{'-':>10}")
+    for name in QUERIES:
+        if name in before:
+            lines.append(f"{name} before: {before[name]['plan']}")
+        lines.append(f"{name} after:  {after[name]['plan']}")
+    return lines
+
+def benchmark(engine, repeat: int = 20) -> List[str]:
+    """Time the queries without, then with, the index migration"""
+    before = {}
+    if INDEX_MIGRATION not in applied_versions(engine):
+        migrate(engine, target=INDEX_MIGRATION - 1)
+        before = run_queries(engine, repeat)
+    migrate(engine)
+    after = run_queries(engine, repeat)
+    return report(before, after)
+
+def main():
+    parser = argparse.ArgumentParser(description="Before/after timings for the index migration")
+    parser.add_argument('--rows', type=int, default=50000, help="Synthetic listings for the SQLite run")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--configured-db', action='store_true',
+                        help="Benchmark the configured database instead of a temporary SQLite one "
+                             "(measures 'before' only if the index migration is still pending)")
+    args = parser.parse_args()
+
+    if args.configured_db:
+        lines = benchmark(get_engine(), args.repeat)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = get_engine(f"sqlite:///{os.path.join(tmp, 'benchmark.db')}")
+            Base.metadata.create_all(engine)
+            migrate(engine)
+            downgrade(engine, INDEX_MIGRATION - 1)
+            print(f"Seeding {args.rows} synthetic listings...")
+            seed(engine, args.rows)
+            lines = benchmark(engine, args.repeat)
+            engine.dispose()
+
+    print('\n'.join(lines))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import pandas as pd
+import sqlalchemy as sa
+from datetime import datetime
+from sqlalchemy.orm import sessionmaker
+from typing import Any, Dict, List, Optional
+from setup_database import Base
+from database import get_engine
+from migrations import migrate
+from synthetic_mls import write_mls_csv
+from import_data import stream_import_data
+from import_profiler import ImportProfiler
+from verify_fields import validate_csv
+from reconcile import reconcile
+from market_aggregates import refresh_market_stats
+from model_registry import ModelRegistry
+from advanced_analytics import MarketAnalytics
+
+SIZES = {'10k': 10000, '100k': 100000, '1m': 1000000}
+
+# Each size is generated in a different encoding so detection and decoding are exercised
+SIZE_ENCODINGS = {'10k': 'utf-8', '100k': 'latin1', '1m': 'cp1252'}
+
+DATA_DIR = os.path.join('data', 'benchmarks')
+RESULTS_DIR = os.path.join('output', 'benchmarks')
+
+# Market analyzed by the MarketAnalytics benchmark (present at every size)
+BENCHMARK_MARKET = ('Area 0', 'House')
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def dataset(rows: int, encoding: str, seed_value: int = 42) -> str:
+    """Path of the synthetic CSV for these parameters, generated on first use"""
+    path = os.path.join(DATA_DIR, f"mls_{rows}_{encoding}_{seed_value}.csv")
+    if not os.path.exists(path):
+        print(f"Generating {rows} synthetic listings ({encoding}) at {path}...")
+        write_mls_csv(path + '.tmp', rows, seed_value, encoding)
+        os.replace(path + '.tmp', path)
+    return path
+
+def _timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def run_size(rows: int, encoding: str, db_url: str, seed_value: int = 42,
+             chunksize: int = 50000) -> Dict[str, Any]:
+    """Import, validate, verify and analyze one synthetic dataset on an empty schema"""
+    csv_path = dataset(rows, encoding, seed_value)
+    engine = get_engine(db_url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    migrate(engine)
+
+    session = sessionmaker(bind=engine)()
+    profiler = ImportProfiler(engine)
+    try:
+        imported, import_seconds = _timed(stream_import_data, csv_path, session,
+                                          chunksize=chunksize, profiler=profiler)
+    finally:
+        session.close()
+
+    report, validation_seconds = _timed(validate_csv, csv_path, chunksize=100000)
+    reconciled, verification_seconds = _timed(reconcile, csv_path, engine)
+    _, market_stats_seconds = _timed(refresh_market_stats, engine, full=True)
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        analytics = MarketAnalytics(engine, ModelRegistry(model_dir))
+        cold, analytics_cold_seconds = _timed(analytics.analyze_price_trends, *BENCHMARK_MARKET)
+        _, analytics_warm_seconds = _timed(analytics.analyze_price_trends, *BENCHMARK_MARKET)
+
+    return {
+        'rows': rows,
+        'encoding': encoding,
+        'metrics': {
+            'import_seconds': import_seconds,
+            'import_rows_per_sec': rows / import_seconds if import_seconds > 0 else None,
+            'validation_seconds': validation_seconds,
+            'verification_seconds': verification_seconds,
+            'market_stats_seconds': market_stats_seconds,
+            'analytics_cold_seconds': analytics_cold_seconds,
+            'analytics_warm_seconds': analytics_warm_seconds
+        },
+        'import_stages': {name: stage['seconds'] for name, stage in profiler.report()['stages'].items()},
+        'checks': {
+            'imported_rows': imported['rows'],
+            'validation_passed': report.passed,
+            'reconciled': not (reconciled['missing'] or reconciled['extra'] or reconciled['changed']),
+            'analytics_samples': cold['model_metrics'].get('samples', 0)
+        }
+    }
+
+def run_suite(sizes: List[str], db_url: Optional[str] = None, encoding: Optional[str] = None,
+              seed_value: int = 42) -> Dict[str, Any]:
+    """Run every size; without db_url each size gets its own temporary SQLite database"""
+    results = {}
+    dialect = sa.engine.make_url(db_url).get_backend_name() if db_url else 'sqlite'
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            url = db_url or f"sqlite:///{os.path.join(tmp, f'benchmark_{size}.db')}"
+            print(f"=== {size} ({SIZES[size]} rows) on {dialect} ===")
+            results[size] = run_size(SIZES[size], encoding or SIZE_ENCODINGS[size], url, seed_value)
+            if not db_url:
+                get_engine(url).dispose()
+    return {
+        'started_at': datetime.now().isoformat(),
+        'commit': _git_commit(),
+        'dialect': dialect,
+        'environment': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'sqlalchemy': sa.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()
+        },
+        'sizes': results
+    }
+
+def latest_results(dialect: str, results_dir: str = RESULTS_DIR) -> Optional[str]:
+    """Most recent stored results file for a dialect"""
+    for path in sorted(glob.glob(os.path.join(results_dir, '*.json')), reverse=True):
+        with open(path) as f:
+            if json.load(f).get('dialect') == dialect:
+                return path
+    return None
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.2) -> List[str]:
+    """Metric-by-metric comparison; *_seconds metrics slower by more than threshold are flagged"""
+    lines = [f"Compared with {baseline.get('commit') or 'unknown commit'} ({baseline.get('started_at')})",
+             f"{'size':<6}{'metric':<26}{'baseline':>12}{'current':>12}{'change':>9}"]
+    for size, result in current['sizes'].items():
+        before = baseline.get('sizes', {}).get(size, {}).get('metrics', {})
+        for metric, value in result['metrics'].items():
+            old = before.get(metric)
+            if old is None or value is None or not old:
+                continue
+            change = value / old - 1
+            flag = '  REGRESSION' if metric.endswith('_seconds') and change > threshold else ''
+            lines.append(f"{size:<6}{metric:<26}{old:>12.3f}{value:>12.3f}{change:>+9.0%}{flag}")
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description="Import, validation, verification and analytics benchmarks")
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['10k', '100k'])
+    parser.add_argument('--db-url', help="Scratch database to benchmark against; its tables are DROPPED "
+                                         "(default: a temporary SQLite database per size)")
+    parser.add_argument('--encoding', help="Use one encoding for every size instead of rotating")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--baseline', help="Results file to compare with (default: latest for the dialect)")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Slowdown flagged as a regression")
+    args = parser.parse_args()
+
+    dialect = sa.engine.make_url(args.db_url).get_backend_name() if args.db_url else 'sqlite'
+    baseline_path = args.baseline or latest_results(dialect)
+
+    results = run_suite(args.sizes, args.db_url, args.encoding, args.seed)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    results_path = os.path.join(RESULTS_DIR, f"{stamp}_{results['commit'] or 'nocommit'}.json")
+    with open(results_path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    for size, result in results['sizes'].items():
+        metrics = ', '.join(f"{name} {value:.2f}" for name, value in result['metrics'].items() if value is not None)
+        print(f"{size}: {metrics}")
+        failed = [name for name, ok in result['checks'].items() if ok is False]
+        if failed:
+            print(f"{size}: checks failed: {failed}")
+    if baseline_path:
+        with open(baseline_path) as f:
+            print('\n'.join(compare(results, json.load(f), args.threshold)))
+    print(f"Saved results to {results_path}")
+
+if __name__ == "__main__":
+    main()
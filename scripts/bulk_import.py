@@ -0,0 +1,240 @@
+import io
+import time
+import hashlib
+import pandas as pd
+import sqlalchemy as sa
+from sqlalchemy import text
+from typing import Dict, Optional, Tuple
+from datetime import datetime
+from setup_database import Property
+from import_profiler import ImportProfiler, stage
+
+# Property column -> column of the processed MLS frame (same mapping as prop_data in import_data)
+PROPERTY_FIELD_MAP = {
+    'list_number': 'List Number',
+    'agency_name': 'Agency Name',
+    'agency_phone': 'Agency Phone',
+    'listing_agent': 'Listing Agent',
+    'property_type': 'property_type',
+    'status': 'Status',
+    'days_on_market': 'Days on Market',
+    'area': 'Area',
+    'community': 'Community',
+    'initial_price': 'initial_price',
+    'current_price': 'current_price',
+    'sold_price': 'sold_price',
+    'development_name': 'property_name',
+    'state': 'state',
+    'construction_ft2': 'construction_ft2',
+    'lot_measurements': 'lot_measurements',
+    'half_bath': 'half_bath',
+    'floor_number': 'floor_number',
+    'furnished': 'furnished',
+    'construction_m2': 'construction_m2',
+    'begin_date': 'begin_date'
+}
+
+STAGING_TABLE = 'properties_staging'
+
+def list_number_keys(list_numbers: pd.Series) -> pd.Series:
+    """Convert a List Number column to the string keys stored in properties.list_number"""
+    return list_numbers.astype(str).where(list_numbers.notna(), None)
+
+def map_properties(df: pd.DataFrame) -> pd.DataFrame:
+    """Build a frame of Property columns from a processed MLS frame"""
+    props = pd.DataFrame(index=df.index)
+    for column, source in PROPERTY_FIELD_MAP.items():
+        props[column] = df[source] if source in df.columns else None
+
+    props['list_number'] = list_number_keys(props['list_number'])
+
+    # Coerce to the column types of the properties table so staging never rejects a batch
+    for column in Property.__table__.columns:
+        if column.name not in props.columns:
+            continue
+        if isinstance(column.type, sa.Integer):
+            props[column.name] = pd.to_numeric(props[column.name], errors='coerce').round().astype('Int64')
+        elif isinstance(column.type, sa.Float):
+            props[column.name] = pd.to_numeric(props[column.name], errors='coerce')
+        elif isinstance(column.type, sa.Boolean):
+            props[column.name] = props[column.name].astype('boolean')
+        elif isinstance(column.type, sa.DateTime):
+            props[column.name] = pd.to_datetime(props[column.name], errors='coerce')
+
+    return props
+
+def content_hashes(props: pd.DataFrame, features: Optional[pd.Series] = None) -> pd.Series:
+    """SHA-1 of the mapped Property fields plus the raw Features string, one per row.
+
+    Values are hashed in their coerced form (see map_properties), so the digest only
+    changes when the stored listing would change.
+    """
+    columns = [column for column in PROPERTY_FIELD_MAP if column in props.columns]
+    strings = props[columns].astype(str).where(props[columns].notna(), '')
+    if features is None:
+        features = pd.Series('', index=props.index)
+    features = features.astype(str).where(features.notna(), '')
+
+    canonical = features
+    for column in columns:
+        canonical = canonical + '\x1f' + strings[column]
+    return pd.Series(
+        [hashlib.sha1(value.encode('utf-8')).hexdigest() for value in canonical],
+        index=props.index
+    )
+
+def filter_changed(session, props: pd.DataFrame) -> pd.DataFrame:
+    """Keep only rows that are new or whose content_hash differs from the stored one"""
+    stored = {}
+    list_numbers = props['list_number'].dropna().unique().tolist()
+    for start in range(0, len(list_numbers), 1000):
+        rows = session.execute(
+            sa.select(Property.list_number, Property.content_hash)
+            .where(Property.list_number.in_(list_numbers[start:start + 1000]))
+        )
+        stored.update(dict(rows.all()))
+    return props[props['content_hash'] != props['list_number'].map(stored)]
+
+def to_records(props: pd.DataFrame):
+    """Convert a frame to DBAPI-friendly dicts (native Python values, NULL for NaN/NA)"""
+    values = props.astype(object)
+    return values.where(values.notna(), None).to_dict('records')
+
+def _staging_table(columns) -> sa.Table:
+    """Temporary table with the same column types as properties"""
+    source = Property.__table__
+    return sa.Table(
+        STAGING_TABLE, sa.MetaData(),
+        *[sa.Column(name, source.c[name].type) for name in columns],
+        prefixes=['TEMPORARY']
+    )
+
+def copy_into(conn, table: sa.Table, props: pd.DataFrame):
+    """Load a frame into a table with COPY (PostgreSQL/psycopg2 only)"""
+    buffer = io.StringIO()
+    props.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    columns = ', '.join(props.columns)
+    statement = f"COPY {table.name} ({columns}) FROM STDIN WITH (FORMAT csv)"
+    cursor = conn.connection.dbapi_connection.cursor()
+    start = time.perf_counter()
+    try:
+        cursor.copy_expert(statement, buffer)
+    finally:
+        cursor.close()
+    # The raw cursor bypasses the engine's execute events; count the round trip explicitly
+    stats = getattr(conn.engine, 'stats', None)
+    if stats:
+        stats.record_query(statement, time.perf_counter() - start)
+
+def stage_properties(conn, props: pd.DataFrame) -> sa.Table:
+    """Create the staging table and load the mapped frame into it"""
+    staging = _staging_table(props.columns)
+    conn.execute(text(f"DROP TABLE IF EXISTS {STAGING_TABLE}"))
+    staging.create(conn)
+
+    if conn.dialect.name == 'postgresql' and conn.dialect.driver == 'psycopg2':
+        copy_into(conn, staging, props)
+    else:
+        conn.execute(staging.insert(), to_records(props))
+    return staging
+
+def bulk_upsert_properties(session, props: pd.DataFrame) -> Tuple[int, int]:
+    """Merge mapped properties into the properties table with one INSERT ... ON CONFLICT.
+
+    Rows without a list number cannot be matched and are skipped; when a list number
+    repeats, the last row wins (as in the row-by-row import).
+
+    Returns:
+        Tuple of (created, updated) counts
+    """
+    props = props[props['list_number'].notna()].drop_duplicates('list_number', keep='last')
+    if props.empty:
+        return 0, 0
+
+    props = props.assign(updated_at=datetime.now())
+    conn = session.connection()
+    stage_properties(conn, props)
+    try:
+        updated = conn.execute(text(f"""
+            SELECT COUNT(*)
+            FROM {STAGING_TABLE} s
+            JOIN properties p ON p.list_number = s.list_number
+        """)).scalar()
+
+        columns = ', '.join(props.columns)
+        assignments = ', '.join(
+            f"{column} = EXCLUDED.{column}" for column in props.columns
+            if column not in ('list_number', 'updated_at')
+        )
+        if 'content_hash' in props.columns:
+            # Only move updated_at when the listing content actually changed
+            assignments += (", updated_at = CASE WHEN properties.content_hash = EXCLUDED.content_hash "
+                            "THEN properties.updated_at ELSE EXCLUDED.updated_at END")
+        else:
+            assignments += ", updated_at = EXCLUDED.updated_at"
+        # "WHERE true" keeps SQLite from parsing ON CONFLICT as part of the SELECT; the
+        # ORDER BY makes concurrent importers lock overlapping listings in the same order
+        conn.execute(text(f"""
+            INSERT INTO properties ({columns})
+            SELECT {columns} FROM {STAGING_TABLE} WHERE true ORDER BY list_number
+            ON CONFLICT (list_number) DO UPDATE SET {assignments}
+        """))
+    finally:
+        conn.execute(text(f"DROP TABLE IF EXISTS {STAGING_TABLE}"))
+
+    return len(props) - updated, updated
+
+def get_property_ids(session, list_numbers) -> Dict[str, int]:
+    """Map list numbers to property ids"""
+    ids = {}
+    list_numbers = list(list_numbers)
+    for start in range(0, len(list_numbers), 1000):
+        rows = session.execute(
+            sa.select(Property.id, Property.list_number)
+            .where(Property.list_number.in_(list_numbers[start:start + 1000]))
+        )
+        ids.update({list_number: prop_id for prop_id, list_number in rows})
+    return ids
+
+def bulk_import_properties(df: pd.DataFrame, session, delta: bool = False,
+                           profiler: Optional[ImportProfiler] = None, commit: bool = True) -> Dict[str, float]:
+    """Upsert a processed MLS frame in one set-based statement and report throughput.
+
+    With delta=True, listings whose content hash matches the stored one are skipped
+    entirely; stats['changed'] holds the list numbers that were written. Callers
+    that write the features next pass commit=False and commit both together, since
+    the stored hash also covers the Features string.
+    """
+    start = time.perf_counter()
+    with stage(profiler, 'db_upsert', len(df)):
+        props = map_properties(df)
+        props['content_hash'] = content_hashes(props, df.get('Features'))
+        skipped = int(props['list_number'].isna().sum())
+
+        unchanged = 0
+        if delta:
+            changed = filter_changed(session, props[props['list_number'].notna()])
+            unchanged = int(props['list_number'].notna().sum()) - len(changed)
+            props = changed
+
+        created, updated = bulk_upsert_properties(session, props)
+    if commit:
+        with stage(profiler, 'commit'):
+            session.commit()
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        'rows': len(df),
+        'created': created,
+        'updated': updated,
+        'unchanged': unchanged,
+        'skipped': skipped,
+        'changed': set(props['list_number'].dropna()),
+        'seconds': elapsed,
+        'rows_per_sec': len(df) / elapsed if elapsed > 0 else 0.0
+    }
+    print(f"Bulk upsert: {stats['rows']} rows in {elapsed:.2f}s "
+          f"({stats['rows_per_sec']:.0f} rows/sec) - Created: {created}, Updated: {updated}, "
+          f"Unchanged: {unchanged}, Skipped (no list number): {skipped}")
+    return stats
@@ -1,176 +1,144 @@
 import anthropic
 import os
-import json
-import sqlite3
-import pandas as pd
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple, Union
 from dotenv import load_dotenv
+from conversation_store import ConversationStore, CONVERSATIONS_DB
+from context_window import ContextWindow, TokenCounter, DEFAULT_CONTEXT_TOKENS
+from response_cache import ResponseCache, cache_key
 
 # Load environment variables
 load_dotenv()
 
+MODEL = "claude-3-sonnet-20240229"
+
+def property_analysis_prompt(property_data: Dict) -> str:
+    """Prompt asking for an analysis of one listing (area, state, current_price, property_type, features)"""
+    return f"""
+        Please analyze this property listing and provide insights:
+        
+        Location: {property_data.get('area')}, {property_data.get('state')}
+        Price: ${property_data.get('current_price') or 0:,.2f}
+        Type: {property_data.get('property_type')}
+        Features: {property_data.get('features', '')}
+        
+        Please provide:
+        1. Key property highlights
+        2. Market position analysis
+        3. Notable features and amenities
+        4. Potential concerns or considerations
+        """
+
 class ClaudeAPI:
-    def __init__(self, store_conversations: bool = True):
+    def __init__(self, store_conversations: bool = True, cache_responses: bool = True,
+                 client: Optional[anthropic.Anthropic] = None):
         """
         Initialize the Claude API wrapper
         
         Args:
             store_conversations (bool): Whether to store conversation history in SQLite
+            cache_responses (bool): Whether to reuse stored property analyses for unchanged prompts
+            client (anthropic.Anthropic): Client to send requests with; by default one is
+                created from ANTHROPIC_API_KEY
         """
         self.api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not self.api_key:
-            raise ValueError("ANTHROPIC_API_KEY environment variable not set")
-            
-        self.client = anthropic.Anthropic(api_key=self.api_key)
+        if client is None:
+            if not self.api_key:
+                raise ValueError("ANTHROPIC_API_KEY environment variable not set")
+            client = anthropic.Anthropic(api_key=self.api_key)
+
+        self.client = client
         self.store_conversations = store_conversations
         
         # Default configuration
         self.config = {
-            "model": "claude-3-sonnet-20240229",  # Latest model
+            "model": MODEL,  # Latest model
             "max_tokens": 1024,
-            "temperature": 0.7
+            "temperature": 0.7,
+            # Input token budget per turn; older history beyond it is not sent
+            "max_context_tokens": int(os.getenv("CLAUDE_CONTEXT_TOKENS", DEFAULT_CONTEXT_TOKENS))
         }
-        
+
+        # The SDK's bundled tokenizer counts locally, without an API call
+        self.token_counter = TokenCounter(self.client.count_tokens)
+
+        # Response of the last send_message call, None if it failed
+        self.last_response = None
+        self.response_cache = ResponseCache() if cache_responses else None
+
         if store_conversations:
             self.setup_conversation_storage()
 
     def setup_conversation_storage(self):
-        """Set up SQLite database for conversation storage"""
-        db_path = os.path.join('data', 'conversations.db')
-        os.makedirs('data', exist_ok=True)
-        
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()
-        
-        # Create tables if they don't exist
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS conversations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                conversation_id TEXT UNIQUE,
-                created_at TIMESTAMP,
-                last_updated TIMESTAMP,
-                metadata TEXT
-            )
-        ''')
-        
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                conversation_id TEXT,
-                role TEXT,
-                content TEXT,
-                tokens INTEGER,
-                timestamp TIMESTAMP,
-                FOREIGN KEY (conversation_id) REFERENCES conversations (conversation_id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """Open the SQLite conversation store, kept open for the life of this wrapper"""
+        self.store = ConversationStore(CONVERSATIONS_DB)
 
     def count_tokens(self, message: str) -> int:
-        """Count tokens in message"""
-        try:
-            response = self.client.messages.count_tokens(
-                messages=[{"role": "user", "content": message}]
-            )
-            return response.token_count
-        except Exception as e:
-            print(f"Error counting tokens: {str(e)}")
-            return 0
+        """Count tokens in message (offline, cached by text)"""
+        return self.token_counter.count(message)
 
     def create_conversation(self, metadata: Optional[Dict] = None) -> str:
         """Create a new conversation"""
         if not self.store_conversations:
             return None
             
-        conversation_id = f"conv_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        
-        conn = sqlite3.connect(os.path.join('data', 'conversations.db'))
-        c = conn.cursor()
-        
-        c.execute('''
-            INSERT INTO conversations (conversation_id, created_at, last_updated, metadata)
-            VALUES (?, ?, ?, ?)
-        ''', (conversation_id, datetime.now(), datetime.now(), json.dumps(metadata or {})))
-        
-        conn.commit()
-        conn.close()
-        
+        conversation_id = f"conv_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        self.store.create_conversation(conversation_id, metadata)
         return conversation_id
 
     def add_message(self, conversation_id: str, role: str, content: str, tokens: int = None):
         """Add message to conversation history"""
+        self.add_messages(conversation_id, [(role, content, tokens)])
+
+    def add_messages(self, conversation_id: str, messages: List[Tuple[str, str, Optional[int]]]):
+        """Add (role, content, tokens) messages to conversation history in one transaction"""
         if not self.store_conversations:
             return
-            
-        conn = sqlite3.connect(os.path.join('data', 'conversations.db'))
-        c = conn.cursor()
-        
-        if tokens is None:
-            tokens = self.count_tokens(content)
-        
-        c.execute('''
-            INSERT INTO messages (conversation_id, role, content, tokens, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (conversation_id, role, content, tokens, datetime.now()))
-        
-        c.execute('''
-            UPDATE conversations 
-            SET last_updated = ? 
-            WHERE conversation_id = ?
-        ''', (datetime.now(), conversation_id))
-        
-        conn.commit()
-        conn.close()
+
+        self.store.add_messages(conversation_id, [
+            (role, content, self.count_tokens(content) if tokens is None else tokens)
+            for role, content, tokens in messages
+        ])
 
     def get_conversation_history(self, conversation_id: str) -> List[Dict]:
         """Get message history for a conversation"""
         if not self.store_conversations:
             return []
-            
-        conn = sqlite3.connect(os.path.join('data', 'conversations.db'))
-        df = pd.read_sql_query('''
-            SELECT role, content, tokens, timestamp
-            FROM messages
-            WHERE conversation_id = ?
-            ORDER BY timestamp ASC
-        ''', conn, params=(conversation_id,))
-        conn.close()
-        
-        return df.to_dict('records')
+
+        return self.store.history(conversation_id)
 
     def send_message(self, message: str, conversation_id: Optional[str] = None,
                     system_prompt: Optional[str] = None) -> Union[str, Tuple[str, int]]:
         """Send message to Claude and get response"""
+        self.last_response = None
         try:
-            messages = []
-            
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            
+            history = []
             if conversation_id and self.store_conversations:
                 history = self.get_conversation_history(conversation_id)
-                messages.extend([{"role": msg["role"], "content": msg["content"]} 
-                               for msg in history])
-            
-            messages.append({"role": "user", "content": message})
-            
+
+            window = ContextWindow(self.config["max_context_tokens"], self.token_counter)
+            messages, _ = window.fit(history, message, system_prompt)
+
+            # The system prompt is a request parameter, not a message role
+            request = {"system": system_prompt} if system_prompt else {}
+
             response = self.client.messages.create(
                 model=self.config["model"],
                 max_tokens=self.config["max_tokens"],
-                messages=messages
+                temperature=self.config["temperature"],
+                messages=messages,
+                **request
             )
-            
+
             if conversation_id and self.store_conversations:
-                self.add_message(conversation_id, "user", message)
-                self.add_message(
-                    conversation_id, 
-                    "assistant", 
-                    response.content[0].text
-                )
-            
+                # The response reports its own length, so only the user message is counted
+                self.add_messages(conversation_id, [
+                    ("user", message, self.count_tokens(message)),
+                    ("assistant", response.content[0].text, response.usage.output_tokens)
+                ])
+
+            # Set only once the exchange is stored, so an error text is never taken for the answer
+            self.last_response = response
             return response.content[0].text
             
         except Exception as e:
@@ -180,33 +148,43 @@ class ClaudeAPI:
 
     def analyze_property(self, property_data: Dict) -> Dict:
         """Analyze a property using Claude"""
-        prompt = f"""
-        Please analyze this property listing and provide insights:
-        
-        Location: {property_data.get('area')}, {property_data.get('state')}
-        Price: ${property_data.get('current_price', 0):,.2f}
-        Type: {property_data.get('property_type')}
-        Features: {property_data.get('features', '')}
-        
-        Please provide:
-        1. Key property highlights
-        2. Market position analysis
-        3. Notable features and amenities
-        4. Potential concerns or considerations
-        """
-        
+        prompt = property_analysis_prompt(property_data)
+
+        key = cache_key(self.config["model"], self.config["max_tokens"], self.config["temperature"], None, prompt)
+        cached = self.response_cache.get(key) if self.response_cache else None
+
         conv_id = self.create_conversation(metadata={
             "type": "property_analysis",
             "property_id": property_data.get("list_number")
         })
         
-        analysis = self.send_message(prompt, conversation_id=conv_id)
+        if cached is not None:
+            # Same listing text as an earlier analysis: record it without calling the API
+            analysis = cached["response"]
+            if conv_id:
+                self.add_messages(conv_id, [
+                    ("user", prompt, self.count_tokens(prompt)),
+                    ("assistant", analysis, cached["output_tokens"])
+                ])
+        else:
+            analysis = self.send_message(prompt, conversation_id=conv_id)
+            if self.response_cache and self.last_response is not None:
+                self.response_cache.put(key, analysis, self.last_response.usage.input_tokens,
+                                        self.last_response.usage.output_tokens)
         
         return {
             "analysis": analysis,
-            "conversation_id": conv_id
+            "conversation_id": conv_id,
+            "cached": cached is not None
         }
 
+    def close(self):
+        """Close the conversation store and response cache"""
+        if self.store_conversations:
+            self.store.close()
+        if self.response_cache:
+            self.response_cache.close()
+
 def main():
     api = ClaudeAPI()
     response = api.send_message("Hello, Claude! Please help me with MLS data analysis.")
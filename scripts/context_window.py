@@ -0,0 +1,75 @@
+import math
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Rough characters per token for English and Spanish listing text
+CHARS_PER_TOKEN = 4
+
+# Input tokens (system prompt, history and the new message) sent per turn
+DEFAULT_CONTEXT_TOKENS = 8000
+
+def estimate_tokens(text: str) -> int:
+    """Character-based token estimate, for when no tokenizer is available"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+class TokenCounter:
+    """Offline token counts, memoized by text.
+
+    count is a text -> tokens function such as the SDK's bundled tokenizer
+    (Anthropic.count_tokens); estimate_tokens is used when there is none or it fails.
+    """
+
+    def __init__(self, count: Optional[Callable[[str], int]] = None, cache_size: int = 4096):
+        self._count = count
+        self.count = lru_cache(maxsize=cache_size)(self._count_text)
+
+    def _count_text(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._count is not None:
+            try:
+                return int(self._count(text))
+            except Exception as e:
+                print(f"Error counting tokens, using estimate: {str(e)}")
+                self._count = None
+        return estimate_tokens(text)
+
+    def message_tokens(self, message: Dict) -> int:
+        """Stored count of a history message, counted only when missing"""
+        # Rows written while counting went through the API hold 0 when it failed
+        return message.get('tokens') or self.count(message['content'])
+
+class ContextWindow:
+    """Keeps the messages sent per turn under a token budget.
+
+    The newest history messages that fit next to the system prompt and the new
+    message are kept and older ones dropped, so a turn costs about the same
+    however long the conversation has run. History tokens come from the counts
+    stored with each message.
+    """
+
+    def __init__(self, max_tokens: int = DEFAULT_CONTEXT_TOKENS, counter: Optional[TokenCounter] = None):
+        self.max_tokens = max_tokens
+        self.counter = counter or TokenCounter()
+
+    def fit(self, history: List[Dict], message: str, system: Optional[str] = None) -> Tuple[List[Dict], int]:
+        """API messages for a new user message on top of as much history as fits.
+
+        Returns:
+            (messages, dropped): role/content dicts ending with the new message,
+            and how many history messages were left out
+        """
+        budget = self.max_tokens - self.counter.count(message) - self.counter.count(system or '')
+        start = len(history)
+        for index in range(len(history) - 1, -1, -1):
+            budget -= self.counter.message_tokens(history[index])
+            if budget < 0:
+                break
+            start = index
+        # The API expects the conversation to open with a user turn
+        while start < len(history) and history[start]['role'] != 'user':
+            start += 1
+
+        messages = [{"role": msg["role"], "content": msg["content"]} for msg in history[start:]]
+        messages.append({"role": "user", "content": message})
+        return messages, start
@@ -0,0 +1,159 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+CONVERSATIONS_DB = os.path.join('data', 'conversations.db')
+
+# Conversations whose history is kept in memory, least recently used dropped first
+HISTORY_CACHE_SIZE = 64
+
+CREATE_CONVERSATIONS = '''
+    CREATE TABLE IF NOT EXISTS conversations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        conversation_id TEXT UNIQUE,
+        created_at TIMESTAMP,
+        last_updated TIMESTAMP,
+        metadata TEXT
+    )
+'''
+
+CREATE_MESSAGES = '''
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        conversation_id TEXT,
+        role TEXT,
+        content TEXT,
+        tokens INTEGER,
+        timestamp TIMESTAMP,
+        FOREIGN KEY (conversation_id) REFERENCES conversations (conversation_id)
+    )
+'''
+
+CREATE_MESSAGES_INDEX = '''
+    CREATE INDEX IF NOT EXISTS idx_messages_conversation_timestamp
+    ON messages (conversation_id, timestamp)
+'''
+
+# Statements are reused verbatim so sqlite3 keeps them compiled in its statement cache
+INSERT_CONVERSATION = '''
+    INSERT INTO conversations (conversation_id, created_at, last_updated, metadata)
+    VALUES (?, ?, ?, ?)
+'''
+
+INSERT_MESSAGE = '''
+    INSERT INTO messages (conversation_id, role, content, tokens, timestamp)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+TOUCH_CONVERSATION = '''
+    UPDATE conversations
+    SET last_updated = ?
+    WHERE conversation_id = ?
+'''
+
+SELECT_HISTORY = '''
+    SELECT id, role, content, tokens, timestamp
+    FROM messages
+    WHERE conversation_id = ?
+    ORDER BY timestamp ASC, id ASC
+'''
+
+SELECT_LAST_ID = 'SELECT max(id) FROM messages WHERE conversation_id = ?'
+
+def _timestamp() -> str:
+    # Same text the sqlite3 datetime adapter wrote for the existing rows
+    return datetime.now().isoformat(' ')
+
+class ConversationStore:
+    """Conversation history in SQLite on one long-lived connection.
+
+    The database runs in WAL mode so the chat tools and batch jobs can read
+    while another process writes. Each conversation's history is read from disk
+    once and then kept in memory, extended as messages are added. The cached copy
+    is only served while the conversation's newest message id is the one it ends
+    with, so messages another store appended are read again.
+    """
+
+    def __init__(self, path: str = CONVERSATIONS_DB, cache_size: int = HISTORY_CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # isolation_level=None: transactions are opened explicitly, so a batch commits once
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(CREATE_CONVERSATIONS)
+        self.conn.execute(CREATE_MESSAGES)
+        self.conn.execute(CREATE_MESSAGES_INDEX)
+        # conversation_id -> (newest message id, history)
+        self._histories: 'OrderedDict[str, Tuple[Optional[int], List[Dict]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create_conversation(self, conversation_id: str, metadata: Optional[Dict] = None):
+        now = _timestamp()
+        with self._lock:
+            self.conn.execute(INSERT_CONVERSATION, (conversation_id, now, now, json.dumps(metadata or {})))
+            self._cache(conversation_id, None, [])
+
+    def add_messages(self, conversation_id: str, messages: Iterable[Tuple[str, str, Optional[int]]]):
+        """Append (role, content, tokens) messages in one transaction"""
+        now = _timestamp()
+        rows = [(conversation_id, role, content, tokens, now) for role, content, tokens in messages]
+        with self._lock:
+            # IMMEDIATE: no other writer can append between reading the last id and inserting
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                previous_id = self._last_id(conversation_id)
+                self.conn.executemany(INSERT_MESSAGE, rows)
+                self.conn.execute(TOUCH_CONVERSATION, (now, conversation_id))
+                last_id = self._last_id(conversation_id)
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+            cached = self._histories.get(conversation_id)
+            if cached is not None and cached[0] == previous_id:
+                history = cached[1]
+                history.extend({'role': role, 'content': content, 'tokens': tokens, 'timestamp': timestamp}
+                               for _, role, content, tokens, timestamp in rows)
+                self._cache(conversation_id, last_id, history)
+            else:
+                # Another store wrote to the conversation since it was cached
+                self._histories.pop(conversation_id, None)
+
+    def add_message(self, conversation_id: str, role: str, content: str, tokens: Optional[int] = None):
+        self.add_messages(conversation_id, [(role, content, tokens)])
+
+    def history(self, conversation_id: str) -> List[Dict]:
+        """Messages of a conversation, oldest first (role, content, tokens, timestamp)"""
+        with self._lock:
+            cached = self._histories.get(conversation_id)
+            if cached is not None and cached[0] == self._last_id(conversation_id):
+                history = cached[1]
+                self._histories.move_to_end(conversation_id)
+            else:
+                rows = self.conn.execute(SELECT_HISTORY, (conversation_id,)).fetchall()
+                history = [{'role': role, 'content': content, 'tokens': tokens, 'timestamp': timestamp}
+                           for _, role, content, tokens, timestamp in rows]
+                self._cache(conversation_id, max((row[0] for row in rows), default=None), history)
+            # Callers get their own list; the cached one only grows through add_messages
+            return list(history)
+
+    def _last_id(self, conversation_id: str) -> Optional[int]:
+        return self.conn.execute(SELECT_LAST_ID, (conversation_id,)).fetchone()[0]
+
+    def _cache(self, conversation_id: str, last_id: Optional[int], history: List[Dict]):
+        self._histories[conversation_id] = (last_id, history)
+        self._histories.move_to_end(conversation_id)
+        while len(self._histories) > self.cache_size:
+            self._histories.popitem(last=False)
+
+    def close(self):
+        with self._lock:
+            self._histories.clear()
+            self.conn.close()
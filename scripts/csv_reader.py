@@ -0,0 +1,41 @@
+import codecs
+import pandas as pd
+from typing import Dict, Iterator, Optional
+
+# Tried in order; latin1 decodes any byte sequence so later entries are only reached by name
+ENCODINGS = ['utf-8', 'latin1', 'iso-8859-1', 'cp1252']
+
+# Columns that must keep their text form across chunks (a chunk of numeric-looking
+# list numbers would otherwise be parsed as int, another one with a gap as float)
+CSV_DTYPES = {'List Number': str}
+
+def detect_encoding(file_path: str, sample_size: int = 1 << 20) -> str:
+    """Pick the first supported encoding that decodes a byte sample of the file"""
+    with open(file_path, 'rb') as f:
+        sample = f.read(sample_size)
+
+    for encoding in ENCODINGS:
+        try:
+            # final=False tolerates a multi-byte character cut off at the end of the sample
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+
+    raise ValueError(f"Could not detect encoding of {file_path}")
+
+def iter_csv_chunks(file_path: str, chunksize: int = 50000, encoding: Optional[str] = None,
+                    dtype: Optional[Dict[str, str]] = None) -> Iterator[pd.DataFrame]:
+    """Read a CSV in fixed-size chunks so memory is bounded by chunksize, not file size"""
+    encoding = encoding or detect_encoding(file_path)
+    reader = pd.read_csv(file_path, encoding=encoding, dtype=dtype or CSV_DTYPES, chunksize=chunksize)
+    try:
+        for chunk in reader:
+            yield chunk
+    except UnicodeDecodeError as e:
+        raise ValueError(
+            f"{file_path} is not valid {encoding} past the sampled bytes; "
+            f"pass the encoding explicitly ({str(e)})"
+        )
+    finally:
+        reader.close()
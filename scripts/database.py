@@ -0,0 +1,191 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, '') else default
+
+def get_database_url() -> str:
+    """Database URL from DATABASE_URL, DB_BACKEND=sqlite (SQLITE_PATH) or the DB_* settings in .env"""
+    if os.getenv("DATABASE_URL"):
+        return os.getenv("DATABASE_URL")
+
+    if os.getenv("DB_BACKEND", "postgresql") == "sqlite":
+        return f"sqlite:///{os.getenv('SQLITE_PATH', os.path.join('data', 'market_analysis.db'))}"
+
+    return URL.create(
+        "postgresql",
+        username=os.getenv("DB_USER", "postgres"),
+        password=os.getenv("DB_PASSWORD", "admin"),
+        host=os.getenv("DB_HOST", "localhost"),
+        port=_env_int("DB_PORT", 5432),
+        database=os.getenv("DB_NAME", "market_analysis_db")
+    ).render_as_string(hide_password=False)
+
+class EngineStats:
+    """Connection and query counters collected from engine and pool events"""
+
+    def __init__(self, slow_query_ms: int):
+        self.slow_query_ms = slow_query_ms
+        self.checkouts = 0
+        self.active_connections = 0
+        self.peak_active_connections = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.queries = 0
+        self.slow_queries = deque(maxlen=100)
+        self._lock = threading.Lock()
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.checkout_wait_total += seconds
+            self.checkout_wait_max = max(self.checkout_wait_max, seconds)
+
+    def record_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+            self.active_connections += 1
+            self.peak_active_connections = max(self.peak_active_connections, self.active_connections)
+
+    def record_checkin(self):
+        with self._lock:
+            self.active_connections -= 1
+
+    def record_query(self, statement: str, seconds: float):
+        with self._lock:
+            self.queries += 1
+        if self.slow_query_ms and seconds * 1000 >= self.slow_query_ms:
+            self.slow_queries.append({'seconds': seconds, 'statement': statement[:500]})
+            logger.warning(f"Slow query ({seconds * 1000:.0f} ms): {statement[:200]}")
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'active_connections': self.active_connections,
+                'peak_active_connections': self.peak_active_connections,
+                'checkout_wait_total': self.checkout_wait_total,
+                'checkout_wait_avg': self.checkout_wait_total / self.checkouts if self.checkouts else 0.0,
+                'checkout_wait_max': self.checkout_wait_max,
+                'queries': self.queries,
+                'slow_queries': list(self.slow_queries)
+            }
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection"""
+
+    stats: Optional[EngineStats] = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if self.stats:
+                self.stats.record_wait(time.perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+def _instrument(engine, stats: EngineStats):
+    engine.stats = stats
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.stats = stats
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.record_checkout()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        stats.record_checkin()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        stats.record_query(statement, time.perf_counter() - conn.info['query_start'].pop())
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(context):
+        if context.connection is not None and context.connection.info.get('query_start'):
+            context.connection.info['query_start'].pop()
+
+def _configure_sqlite(engine):
+    """WAL journaling so analytics can read while an import writes, and fewer fsyncs per commit"""
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+def get_engine(url: Optional[str] = None, **overrides):
+    """Shared, pooled engine for a database URL.
+
+    Pool settings come from DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT and
+    DB_POOL_RECYCLE; DB_STATEMENT_TIMEOUT_MS sets a PostgreSQL statement_timeout and
+    DB_SLOW_QUERY_MS the slow-query log threshold. Keyword arguments override the
+    pool settings (e.g. pool_size=1 for worker processes). Engines are cached per
+    process, so every caller with the same settings shares one pool.
+    """
+    url = url or get_database_url()
+    key = (url, tuple(sorted(overrides.items())))
+    with _engines_lock:
+        if key in _engines:
+            return _engines[key]
+
+        options = {'pool_pre_ping': True}
+        connect_args = {}
+        if make_url(url).get_backend_name() != 'sqlite':
+            options.update(
+                poolclass=InstrumentedQueuePool,
+                pool_size=_env_int("DB_POOL_SIZE", 5),
+                max_overflow=_env_int("DB_MAX_OVERFLOW", 10),
+                pool_timeout=_env_int("DB_POOL_TIMEOUT", 30),
+                pool_recycle=_env_int("DB_POOL_RECYCLE", 1800)
+            )
+        statement_timeout = _env_int("DB_STATEMENT_TIMEOUT_MS", 0)
+        if statement_timeout and make_url(url).get_backend_name() == 'postgresql':
+            connect_args['options'] = f"-c statement_timeout={statement_timeout}"
+        if connect_args:
+            options['connect_args'] = connect_args
+        options.update(overrides)
+
+        engine = create_engine(url, **options)
+        if make_url(url).get_backend_name() == 'sqlite':
+            _configure_sqlite(engine)
+        _instrument(engine, EngineStats(_env_int("DB_SLOW_QUERY_MS", 1000)))
+        _engines[key] = engine
+        return engine
+
+def get_session(url: Optional[str] = None, **overrides):
+    """New session bound to the shared engine"""
+    return sessionmaker(bind=get_engine(url, **overrides))()
+
+def engine_stats(engine) -> Dict:
+    """Pool status plus the counters collected for an engine from get_engine"""
+    stats = engine.stats.as_dict() if hasattr(engine, 'stats') else {}
+    stats['pool'] = engine.pool.status()
+    return stats
@@ -0,0 +1,153 @@
+import argparse
+import os
+import time
+import pandas as pd
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from typing import List, Optional
+from snapshot import SNAPSHOT_DIR, SNAPSHOT_TABLES, list_snapshots, _snapshot_chain
+from market_aggregates import ALL, STAT_COLUMNS
+from listing_schema import apply_schema
+
+try:
+    import duckdb
+except ImportError:  # optional: only needed for ANALYTICS_BACKEND=duckdb
+    duckdb = None
+
+# Snapshot tables whose rows are replaced per property rather than per id (see restore_snapshot)
+PER_PROPERTY_TABLES = {'property_features': 'property_id'}
+
+# The grouping sets of market_aggregates.GROUPINGS, per month
+MARKET_STATS_SQL = """
+    WITH listings AS (
+        SELECT area, property_type, date_trunc('month', begin_date) AS month, current_price,
+               current_price / CASE WHEN construction_ft2 > 0 THEN construction_ft2 END AS price_per_ft2,
+               current_price / CASE WHEN construction_m2 > 0 THEN construction_m2 END AS price_per_m2,
+               days_on_market
+        FROM properties
+        WHERE begin_date IS NOT NULL AND current_price > 0 {filters}
+    )
+    SELECT {area} AS area, {property_type} AS property_type, month,
+           COUNT(*) AS listings,
+           AVG(current_price) AS mean_price,
+           MEDIAN(current_price) AS median_price,
+           AVG(price_per_ft2) AS mean_price_per_ft2,
+           MEDIAN(price_per_ft2) AS median_price_per_ft2,
+           MEDIAN(price_per_m2) AS median_price_per_m2,
+           AVG(days_on_market) AS mean_days_on_market
+    FROM listings
+    {group_by}
+    ORDER BY 1, 2, 3
+"""
+
+def _require_duckdb():
+    if duckdb is None:
+        raise ImportError("The DuckDB analytics backend needs the duckdb package (pip install duckdb)")
+
+def _parquet_list(name: str, chain: List[str]) -> str:
+    return ', '.join("'" + os.path.join(path, f'{name}.parquet').replace("'", "''") + "'" for path in chain)
+
+def _view_sql(name: str, chain: List[str]) -> str:
+    """Current rows of a table across a snapshot chain: later snapshots replace earlier rows"""
+    files = _parquet_list(name, chain)
+    if len(chain) == 1:
+        return f"CREATE VIEW {name} AS SELECT * FROM read_parquet([{files}])"
+    if name in PER_PROPERTY_TABLES:
+        # Rows come from the latest snapshot holding the property itself, which carries its
+        # complete (possibly empty) set, as on restore
+        key = PER_PROPERTY_TABLES[name]
+        return (f"CREATE VIEW {name} AS SELECT rows.* EXCLUDE (filename) "
+                f"FROM read_parquet([{files}], filename = true) rows "
+                f"JOIN (SELECT id, max(parse_dirpath(filename)) AS snapshot "
+                f"      FROM read_parquet([{_parquet_list('properties', chain)}], filename = true) GROUP BY id) latest "
+                f"ON rows.{key} = latest.id AND parse_dirpath(rows.filename) = latest.snapshot")
+    return (f"CREATE VIEW {name} AS SELECT * EXCLUDE (filename) "
+            f"FROM read_parquet([{files}], filename = true) "
+            f"QUALIFY row_number() OVER (PARTITION BY id ORDER BY filename DESC) = 1")
+
+class SnapshotAnalytics:
+    """Analytical queries over Parquet snapshots (see snapshot.py), run by DuckDB.
+
+    The listing tables of a snapshot chain are exposed as views with the same
+    names and columns as in the database, so SQLAlchemy Core selects built for the
+    properties table (e.g. build_listings_query) run unchanged. Results reflect the
+    database as of the snapshot; listings deleted since are not tracked, as on restore.
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = None, snapshot_dir: str = SNAPSHOT_DIR,
+                 threads: Optional[int] = None):
+        _require_duckdb()
+        if snapshot_path is None:
+            snapshots = list_snapshots(snapshot_dir)
+            if not snapshots:
+                raise FileNotFoundError(f"No snapshots in {snapshot_dir}; run snapshot.py create first")
+            snapshot_path = snapshots[-1]
+        self.snapshot_path = snapshot_path
+        self.conn = duckdb.connect()
+        if threads:
+            self.conn.execute(f"SET threads = {int(threads)}")
+
+        chain = _snapshot_chain(snapshot_path)
+        for name in SNAPSHOT_TABLES:
+            self.conn.execute(_view_sql(name, chain))
+
+    def read(self, query: sa.Select) -> pd.DataFrame:
+        """Run a SQLAlchemy Core select (PostgreSQL SQL, bound parameters kept) and fetch a DataFrame"""
+        compiled = query.compile(dialect=postgresql.dialect(paramstyle='qmark'))
+        params = [compiled.params[name] for name in compiled.positiontup]
+        return self.conn.execute(compiled.string, params).df()
+
+    def read_listings(self, query: sa.Select) -> pd.DataFrame:
+        """Listings in the compact dtypes read_listings produces for the database"""
+        return apply_schema(self.read(query))
+
+    def _market_stats(self, filters: str, params: list, area: str, property_type: str,
+                      group_by: str) -> pd.DataFrame:
+        sql = MARKET_STATS_SQL.format(filters=filters, area=area, property_type=property_type,
+                                      group_by=group_by)
+        df = self.conn.execute(sql, params).df()
+        df['month'] = pd.to_datetime(df['month']).astype('datetime64[ns]')
+        return df
+
+    def market_stats(self, area: Optional[str] = None,
+                     property_type: Optional[str] = None) -> pd.DataFrame:
+        """Monthly aggregates for one market, as market_aggregates.load_market_stats returns them"""
+        filters, params = '', []
+        if area:
+            filters += ' AND area = ?'
+            params.append(area)
+        if property_type:
+            filters += ' AND property_type = ?'
+            params.append(property_type)
+        df = self._market_stats(filters, params, 'NULL', 'NULL', 'GROUP BY month')
+        return df.drop(columns=['area', 'property_type'])[['month'] + STAT_COLUMNS]
+
+    def all_market_stats(self) -> pd.DataFrame:
+        """Every market's monthly aggregates, as market_aggregates.compute_market_stats returns them"""
+        area = f"CASE WHEN GROUPING(area) = 1 THEN '{ALL}' ELSE area END"
+        property_type = f"CASE WHEN GROUPING(property_type) = 1 THEN '{ALL}' ELSE property_type END"
+        group_by = ("GROUP BY GROUPING SETS ((area, property_type, month), (area, month), "
+                    "(property_type, month), (month)) "
+                    "HAVING (GROUPING(area) = 1 OR area IS NOT NULL) "
+                    "AND (GROUPING(property_type) = 1 OR property_type IS NOT NULL)")
+        return self._market_stats('', [], area, property_type, group_by)
+
+    def close(self):
+        self.conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Market aggregates computed by DuckDB over a Parquet snapshot")
+    parser.add_argument('snapshot', nargs='?', help="Snapshot directory (defaults to the latest)")
+    parser.add_argument('--output', help="Write the aggregates to this CSV file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    analytics = SnapshotAnalytics(args.snapshot)
+    stats = analytics.all_market_stats()
+    print(f"Computed {len(stats)} market stats rows from {analytics.snapshot_path} "
+          f"in {time.perf_counter() - start:.2f}s")
+    if args.output:
+        stats.to_csv(args.output, index=False)
+
+if __name__ == "__main__":
+    main()
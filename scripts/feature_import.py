@@ -0,0 +1,140 @@
+import pandas as pd
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql, sqlite
+from typing import Dict, Optional
+from setup_database import FeatureCategory, Feature, PropertyFeature
+from bulk_import import list_number_keys, get_property_ids, copy_into, to_records
+
+def parse_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Parse the whole 'category|name|value;...' Features column at once.
+
+    Returns:
+        DataFrame with list_number, category, feature and value columns, one row per token.
+        Tokens that do not have exactly three parts are dropped.
+    """
+    features = df.loc[df['Features'].notna() & df['List Number'].notna(), ['List Number', 'Features']]
+    tokens = pd.DataFrame({
+        'list_number': list_number_keys(features['List Number']),
+        'token': features['Features'].astype(str).str.split(';')
+    }).explode('token')
+
+    tokens = tokens[tokens['token'].str.count(r'\|') == 2]
+    parts = tokens['token'].str.split('|', expand=True)
+    if parts.empty:
+        return pd.DataFrame(columns=['list_number', 'category', 'feature', 'value'])
+
+    return pd.DataFrame({
+        'list_number': tokens['list_number'],
+        'category': parts[0].str.strip(),
+        'feature': parts[1].str.strip(),
+        'value': parts[2].str.strip()
+    }).reset_index(drop=True)
+
+def insert_ignore(session, model):
+    """INSERT that leaves rows created concurrently by another importer alone"""
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(model).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        return sqlite.insert(model).on_conflict_do_nothing()
+    return sa.insert(model)
+
+class FeatureDictionary:
+    """In-memory name -> id lookup for feature categories and features.
+
+    Loaded once per import; unknown names are bulk inserted and added to the
+    dictionary, so repeated tokens never go back to the database.
+    """
+
+    def __init__(self, session):
+        self.categories: Dict[str, int] = dict(
+            session.execute(sa.select(FeatureCategory.name, FeatureCategory.id)).all()
+        )
+        self.features: Dict[tuple, int] = {
+            (category_id, name): feature_id
+            for feature_id, category_id, name in session.execute(
+                sa.select(Feature.id, Feature.category_id, Feature.name)
+            )
+        }
+
+    def _add_categories(self, session, names):
+        session.execute(insert_ignore(session, FeatureCategory), [{'name': name} for name in names])
+        rows = session.execute(
+            sa.select(FeatureCategory.name, FeatureCategory.id)
+            .where(FeatureCategory.name.in_(names))
+        )
+        self.categories.update(dict(rows.all()))
+
+    def _add_features(self, session, keys):
+        session.execute(
+            insert_ignore(session, Feature),
+            [{'category_id': int(category_id), 'name': name} for category_id, name in keys]
+        )
+        category_ids = {int(category_id) for category_id, _ in keys}
+        rows = session.execute(
+            sa.select(Feature.id, Feature.category_id, Feature.name)
+            .where(Feature.category_id.in_(category_ids))
+        )
+        self.features.update({(category_id, name): feature_id for feature_id, category_id, name in rows})
+
+    def resolve(self, session, parsed: pd.DataFrame) -> pd.Series:
+        """Return the feature id for every parsed token, creating missing names in bulk"""
+        missing = sorted(set(parsed['category']) - self.categories.keys())
+        if missing:
+            self._add_categories(session, missing)
+        category_ids = parsed['category'].map(self.categories)
+
+        keys = list(zip(category_ids, parsed['feature']))
+        missing = sorted(set(keys) - self.features.keys())
+        if missing:
+            self._add_features(session, missing)
+
+        return pd.Series([self.features[key] for key in keys], index=parsed.index)
+
+def write_property_features(session, prop_ids, rows: pd.DataFrame):
+    """Replace the features of a batch of properties with one delete and one insert"""
+    prop_ids = list(prop_ids)
+    for start in range(0, len(prop_ids), 10000):
+        session.execute(
+            sa.delete(PropertyFeature)
+            .where(PropertyFeature.property_id.in_(prop_ids[start:start + 10000]))
+        )
+
+    if rows.empty:
+        return
+
+    conn = session.connection()
+    if conn.dialect.name == 'postgresql' and conn.dialect.driver == 'psycopg2':
+        copy_into(conn, PropertyFeature.__table__, rows)
+    else:
+        session.execute(sa.insert(PropertyFeature), to_records(rows))
+
+def import_features(df: pd.DataFrame, session,
+                    dictionary: Optional[FeatureDictionary] = None) -> Dict[str, int]:
+    """Normalize the Features column of a processed MLS frame into property_features.
+
+    Properties whose Features value is present get their existing rows replaced,
+    as in the row-by-row import; a repeated List Number takes its last row's.
+    Pass the same dictionary across batches to avoid reloading it.
+    """
+    if 'Features' not in df.columns:
+        return {'properties': 0, 'features': 0}
+
+    dictionary = dictionary or FeatureDictionary(session)
+    # Like the property upsert, the last row of a repeated List Number wins
+    keys = list_number_keys(df['List Number'])
+    df = df[keys.isna() | ~keys.duplicated(keep='last')]
+    parsed = parse_features(df)
+
+    with_features = df['Features'].notna() & df['List Number'].notna()
+    prop_ids = get_property_ids(session, list_number_keys(df.loc[with_features, 'List Number']).unique())
+
+    rows = pd.DataFrame({
+        'property_id': parsed['list_number'].map(prop_ids),
+        'feature_id': dictionary.resolve(session, parsed),
+        'value': parsed['value']
+    })
+    rows = rows[rows['property_id'].notna()].astype({'property_id': 'int64'})
+
+    write_property_features(session, prop_ids.values(), rows)
+    return {'properties': len(prop_ids), 'features': len(rows)}
@@ -0,0 +1,211 @@
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+from datetime import datetime
+from scipy import sparse
+from typing import Callable, List, Tuple
+from setup_database import Property, PropertyFeature, Feature, FeatureCategory
+from database import get_engine
+from mls_field_mapper import FALSE_VALUES, _on_uniques
+
+FEATURE_MATRIX_PATH = os.path.join('data', 'feature_matrix.npz')
+
+# Leading number of a feature value ("3", "2.5", "1,200 m2")
+NUMBER_PATTERN = r'^(-?\d+(?:\.\d+)?)'
+
+def parse_feature_values(values: pd.Series) -> np.ndarray:
+    """Numeric feature values as numbers, "no"-like values as 0 and anything else as 1 (present)"""
+    def parse(text: pd.Series) -> pd.Series:
+        text = text.astype(str).str.strip()
+        number = pd.to_numeric(text.str.replace(',', '', regex=False).str.extract(NUMBER_PATTERN)[0],
+                               errors='coerce')
+        absent = text.str.lower().isin(FALSE_VALUES) | (text == '')
+        return number.where(number.notna(), np.where(absent, 0.0, 1.0))
+    return _on_uniques(values.fillna(''), parse).to_numpy(dtype=np.float32)
+
+def _features_query(properties=None) -> sa.Select:
+    query = sa.select(PropertyFeature.property_id, PropertyFeature.feature_id, PropertyFeature.value).where(
+        PropertyFeature.property_id.isnot(None), PropertyFeature.feature_id.isnot(None)
+    )
+    if properties is not None:
+        query = query.where(PropertyFeature.property_id.in_(properties))
+    return query
+
+def _feature_names(read, feature_ids: np.ndarray) -> List[str]:
+    """'Category: Name' for each feature id"""
+    names = read(
+        sa.select(Feature.id, FeatureCategory.name.label('category'), Feature.name)
+        .join(FeatureCategory, Feature.category_id == FeatureCategory.id, isouter=True)
+    ).set_index('id')
+    labels = names['category'].fillna('').str.cat(names['name'].fillna(''), sep=': ')
+    return [labels.get(feature_id, str(feature_id)) for feature_id in feature_ids]
+
+def _to_csr(rows: pd.DataFrame, property_ids: np.ndarray, feature_ids: np.ndarray) -> sparse.csr_matrix:
+    """CSR matrix of (property_id, feature_id, value) rows on the given sorted axes"""
+    values = parse_feature_values(rows['value'])
+    keep = values != 0
+    # Duplicate (property, feature) rows are summed by the conversion; imports do not write them
+    return sparse.coo_matrix(
+        (values[keep],
+         (np.searchsorted(property_ids, rows['property_id'].to_numpy(dtype=np.int64)[keep]),
+          np.searchsorted(feature_ids, rows['feature_id'].to_numpy(dtype=np.int64)[keep]))),
+        shape=(len(property_ids), len(feature_ids))
+    ).tocsr()
+
+def _lookup(axis: np.ndarray, ids) -> Tuple[np.ndarray, np.ndarray]:
+    """Positions of ids on a sorted axis, and which ids are actually on it"""
+    ids = np.asarray(ids, dtype=np.int64)
+    if len(axis) == 0:
+        return np.zeros(len(ids), dtype=np.int64), np.zeros(len(ids), dtype=bool)
+    positions = np.searchsorted(axis, ids).clip(max=len(axis) - 1)
+    return positions, axis[positions] == ids
+
+class FeatureMatrix:
+    """Properties x features CSR matrix built from the property_features EAV table.
+
+    Rows are property ids and columns feature ids, both sorted; values come from
+    parse_feature_values. Queries go through a read(select) -> DataFrame function,
+    so the matrix can be built from the database or from a snapshot
+    (SnapshotAnalytics.read). Like snapshots, updates pick up properties by
+    updated_at and do not notice deleted listings.
+    """
+
+    def __init__(self, matrix: sparse.csr_matrix, property_ids: np.ndarray, feature_ids: np.ndarray,
+                 feature_names: List[str], as_of: datetime, source: str = ''):
+        self.matrix = matrix
+        self.property_ids = property_ids
+        self.feature_ids = feature_ids
+        self.feature_names = feature_names
+        self.as_of = as_of
+        self.source = source
+
+    @classmethod
+    def build(cls, read: Callable[[sa.Select], pd.DataFrame], source: str = '') -> 'FeatureMatrix':
+        """Matrix of every property's features"""
+        # Taken before reading so features written meanwhile are picked up by the next update
+        as_of = datetime.now()
+        rows = read(_features_query())
+        property_ids = np.unique(rows['property_id'].to_numpy(dtype=np.int64))
+        feature_ids = np.unique(rows['feature_id'].to_numpy(dtype=np.int64))
+        return cls(_to_csr(rows, property_ids, feature_ids), property_ids, feature_ids,
+                   _feature_names(read, feature_ids), as_of, source)
+
+    def update(self, read: Callable[[sa.Select], pd.DataFrame]) -> int:
+        """Replace the rows of properties updated since the matrix was built or last updated.
+
+        New features get columns; columns of features no longer used stay (empty)
+        until the next rebuild.
+
+        Returns:
+            Number of properties whose rows were replaced
+        """
+        as_of = datetime.now()
+        changed_query = sa.select(Property.id).where(Property.updated_at >= self.as_of)
+        changed = read(changed_query)['id'].to_numpy(dtype=np.int64)
+        if len(changed) == 0:
+            self.as_of = as_of
+            return 0
+        rows = read(_features_query(changed_query))
+
+        kept = np.flatnonzero(~np.isin(self.property_ids, changed))
+        property_ids = np.union1d(self.property_ids[kept], rows['property_id'].to_numpy(dtype=np.int64))
+        feature_ids = np.union1d(self.feature_ids, rows['feature_id'].to_numpy(dtype=np.int64))
+
+        # Unchanged rows are moved onto the new axes, then the changed properties' rows added
+        old = self.matrix[kept].tocoo()
+        moved = sparse.coo_matrix(
+            (old.data, (np.searchsorted(property_ids, self.property_ids[kept][old.row]),
+                        np.searchsorted(feature_ids, self.feature_ids[old.col]))),
+            shape=(len(property_ids), len(feature_ids))
+        ).tocsr()
+
+        if len(feature_ids) != len(self.feature_ids):
+            self.feature_names = _feature_names(read, feature_ids)
+        self.matrix = moved + _to_csr(rows, property_ids, feature_ids)
+        self.property_ids, self.feature_ids, self.as_of = property_ids, feature_ids, as_of
+        return len(changed)
+
+    def rows(self, property_ids, feature_ids=None) -> sparse.csr_matrix:
+        """Rows for property_ids in that order, restricted to feature_ids (default: all).
+
+        Properties and features the matrix does not have come back as zeros.
+        """
+        row_positions, found_rows = _lookup(self.property_ids, property_ids)
+        feature_ids = self.feature_ids if feature_ids is None else feature_ids
+        col_positions, found_cols = _lookup(self.feature_ids, feature_ids)
+        if not found_rows.any() or not found_cols.any():
+            return sparse.csr_matrix((len(found_rows), len(found_cols)), dtype=np.float32)
+
+        selected = self.matrix[row_positions][:, col_positions]
+        # Rows and columns that were not found only matched a neighbour's position
+        return (sparse.diags(found_rows.astype(np.float32)) @ selected
+                @ sparse.diags(found_cols.astype(np.float32))).tocsr()
+
+    def frequent_features(self, property_ids, min_count: int = 20, max_features: int = 100) -> np.ndarray:
+        """Ids of the features present on at least min_count of the properties, most common first"""
+        counts = np.asarray((self.rows(property_ids) != 0).sum(axis=0)).ravel()
+        order = np.argsort(-counts, kind='stable')[:max_features]
+        return self.feature_ids[order[counts[order] >= min_count]]
+
+    def names(self, feature_ids) -> List[str]:
+        positions = np.searchsorted(self.feature_ids, feature_ids)
+        return [self.feature_names[position] for position in positions]
+
+    def save(self, path: str = FEATURE_MATRIX_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Written next to the target and renamed, so readers never see a partial file
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(
+            tmp_path, data=self.matrix.data, indices=self.matrix.indices, indptr=self.matrix.indptr,
+            shape=np.array(self.matrix.shape), property_ids=self.property_ids, feature_ids=self.feature_ids,
+            feature_names=np.array(self.feature_names, dtype=str),
+            as_of=np.array(self.as_of.isoformat()), source=np.array(self.source)
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = FEATURE_MATRIX_PATH) -> 'FeatureMatrix':
+        with np.load(path, allow_pickle=False) as saved:
+            matrix = sparse.csr_matrix((saved['data'], saved['indices'], saved['indptr']),
+                                       shape=tuple(saved['shape']))
+            return cls(matrix, saved['property_ids'], saved['feature_ids'], saved['feature_names'].tolist(),
+                       datetime.fromisoformat(str(saved['as_of'])), str(saved['source']))
+
+def _source(engine) -> str:
+    return engine.url.render_as_string(hide_password=True)
+
+def load_feature_matrix(engine, path: str = FEATURE_MATRIX_PATH, rebuild: bool = False) -> FeatureMatrix:
+    """Cached feature matrix brought up to date with the database, built on first use"""
+    start = time.perf_counter()
+    def read(query):
+        return pd.read_sql(query, engine)
+
+    matrix = None
+    if not rebuild and os.path.exists(path):
+        matrix = FeatureMatrix.load(path)
+        if matrix.source != _source(engine):
+            matrix = None
+
+    if matrix is None:
+        matrix = FeatureMatrix.build(read, _source(engine))
+        print(f"Built feature matrix: {matrix.matrix.shape[0]} properties x {matrix.matrix.shape[1]} features, "
+              f"{matrix.matrix.nnz} values in {time.perf_counter() - start:.2f}s")
+    else:
+        changed = matrix.update(read)
+        if not changed:
+            return matrix
+        print(f"Updated feature matrix for {changed} properties in {time.perf_counter() - start:.2f}s")
+    matrix.save(path)
+    return matrix
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or update the cached property x feature matrix")
+    parser.add_argument('--rebuild', action='store_true', help="Rebuild instead of updating the cache")
+    args = parser.parse_args()
+    load_feature_matrix(get_engine(), rebuild=args.rebuild)
+
+if __name__ == "__main__":
+    main()
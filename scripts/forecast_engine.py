@@ -0,0 +1,240 @@
+import argparse
+import json
+import os
+import time
+import warnings
+import joblib
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+import statsmodels.api as sm
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from statsmodels.tsa.statespace.exponential_smoothing import ExponentialSmoothing
+from typing import Any, Dict, List, Optional, Tuple
+from setup_database import MarketMonthlyStats
+from database import get_engine
+from market_aggregates import ALL
+
+FORECAST_DIR = os.path.join('data', 'forecasts')
+
+SEASON = 12
+
+# Observed months a series needs for each model; shorter series get a flat naive forecast
+SEASONAL_MIN_MONTHS = 36
+TREND_MIN_MONTHS = 12
+
+# Cached parameters are reused (filtering only) until this many months were appended
+REFIT_MONTHS = 12
+
+# Coverage of the forecast interval
+INTERVAL = 0.8
+
+def build_panel(stats: pd.DataFrame, value: str = 'median_price') -> pd.DataFrame:
+    """Months x (area, property_type) panel of one monthly statistic.
+
+    stats has the market_monthly_stats columns (every grouping set, so rollups are
+    series too). The months run continuously from the first to the last month of
+    any market; months in which a market had no listings are NaN.
+    """
+    stats = stats.dropna(subset=[value])
+    if stats.empty:
+        return pd.DataFrame(index=pd.DatetimeIndex([], freq='MS'))
+    panel = stats.pivot_table(index='month', columns=['area', 'property_type'], values=value,
+                              aggfunc='first', observed=True)
+    panel.index = pd.to_datetime(panel.index)
+    return panel.reindex(pd.date_range(panel.index.min(), panel.index.max(), freq='MS'))
+
+def choose_model(observed_months: int) -> str:
+    if observed_months >= SEASONAL_MIN_MONTHS:
+        return 'sarima'
+    if observed_months >= TREND_MIN_MONTHS:
+        return 'ets'
+    return 'naive'
+
+def _state_space_model(kind: str, endog: np.ndarray):
+    """Airline SARIMA for long series, damped-trend exponential smoothing for shorter ones.
+
+    Both are state space models, so missing months are handled by the Kalman filter
+    and fitted parameters can be re-applied to a longer series without refitting.
+    """
+    if kind == 'sarima':
+        return sm.tsa.SARIMAX(endog, order=(0, 1, 1), seasonal_order=(0, 1, 1, SEASON))
+    return ExponentialSmoothing(endog, trend=True, damped_trend=True)
+
+def _naive_forecast(values: np.ndarray, periods: int) -> np.ndarray:
+    """Mean of the last three observed values, carried forward"""
+    observed = values[np.isfinite(values)]
+    return np.full(periods, observed[-3:].mean())
+
+def fit_series(values: np.ndarray, start: pd.Timestamp, periods: int, state: Optional[Dict[str, Any]] = None,
+               refit_months: int = REFIT_MONTHS) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Forecast one monthly series (NaN for missing months).
+
+    Models are fitted on log values. When state holds parameters fitted for the same
+    model and series start fewer than refit_months ago, they are re-applied by
+    filtering the current series instead of refitting.
+
+    Returns:
+        (forecast, state): forecast has kind, action and mean/lower/upper arrays;
+        state is what to pass next time
+    """
+    # Non-positive values cannot be logged; they are treated as missing months
+    values = np.where(values > 0, values, np.nan)
+    observed = int(np.isfinite(values).sum())
+    kind = choose_model(observed)
+    if kind != 'naive':
+        model = _state_space_model(kind, np.log(values))
+        reuse = (state is not None and state.get('kind') == kind and state.get('start') == start
+                 and 0 <= len(values) - state['months'] < refit_months)
+        try:
+            with warnings.catch_warnings():
+                # Short and gappy series routinely trigger convergence and start-parameter warnings
+                warnings.simplefilter('ignore')
+                results = model.filter(state['params']) if reuse else model.fit(disp=False)
+                forecast = results.get_forecast(periods)
+                mean = np.exp(np.asarray(forecast.predicted_mean))
+                interval = np.exp(np.asarray(forecast.conf_int(alpha=1 - INTERVAL)))
+            if np.all(np.isfinite(mean)) and np.all(np.isfinite(interval)):
+                new_state = state if reuse else {'kind': kind, 'start': start, 'months': len(values),
+                                                 'params': np.asarray(results.params)}
+                return ({'kind': kind, 'action': 'filtered' if reuse else 'fitted',
+                         'mean': mean, 'lower': interval[:, 0], 'upper': interval[:, 1]}, new_state)
+        except (ValueError, np.linalg.LinAlgError):
+            pass
+        kind = 'naive'
+
+    return {'kind': kind, 'action': 'naive', 'mean': _naive_forecast(values, periods), 'lower': None, 'upper': None}, {'kind': 'naive'}
+
+def _fit_many(items: List[tuple], periods: int, refit_months: int) -> List[tuple]:
+    """Worker task: fit_series for a batch of (key, values, start, state) items"""
+    return [(key, *fit_series(values, start, periods, state, refit_months))
+            for key, values, start, state in items]
+
+class ForecastEngine:
+    """Monthly forecasts for every market at once, with fitted parameters cached on disk.
+
+    Each (area, property_type) column of the panel built from the monthly
+    aggregates is forecast separately: seasonal ARIMA when there are at least
+    SEASONAL_MIN_MONTHS observed months, damped-trend exponential smoothing from
+    TREND_MIN_MONTHS, and a flat recent average below that. Series are fitted in
+    worker processes; on later runs cached parameters are re-applied to the longer
+    series (a Kalman filter pass, no optimization) until REFIT_MONTHS new months
+    have accumulated.
+    """
+
+    def __init__(self, cache_dir: str = FORECAST_DIR, value: str = 'median_price', periods: int = 6,
+                 refit_months: int = REFIT_MONTHS, max_workers: Optional[int] = None):
+        self.cache_dir = cache_dir
+        self.value = value
+        self.periods = periods
+        self.refit_months = refit_months
+        self.max_workers = max_workers
+        self.last_run: Dict[str, Any] = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def _state_path(self) -> str:
+        return os.path.join(self.cache_dir, f'{self.value}_states.joblib')
+
+    def load_states(self) -> Dict[tuple, Dict[str, Any]]:
+        if not os.path.exists(self._state_path):
+            return {}
+        try:
+            return joblib.load(self._state_path)
+        except Exception as e:
+            print(f"Ignoring unreadable forecast cache {self._state_path}: {str(e)}")
+            return {}
+
+    def save_states(self, states: Dict[tuple, Dict[str, Any]]):
+        tmp_path = self._state_path + '.tmp'
+        joblib.dump(states, tmp_path)
+        os.replace(tmp_path, self._state_path)
+
+    def _run(self, items: List[tuple]) -> List[tuple]:
+        workers = self.max_workers or os.cpu_count() or 1
+        # A handful of series is not worth starting worker processes for
+        if workers <= 1 or len(items) < 2 * workers:
+            return _fit_many(items, self.periods, self.refit_months)
+        batches = [items[offset::workers * 4] for offset in range(workers * 4)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_fit_many, batch, self.periods, self.refit_months)
+                       for batch in batches if batch]
+            return [result for future in futures for result in future.result()]
+
+    def forecast_panel(self, panel: pd.DataFrame) -> Dict[tuple, List[Dict[str, Any]]]:
+        """Forecasts for every column of a build_panel panel, keyed by (area, property_type)"""
+        start = time.perf_counter()
+        if panel.empty:
+            self.last_run = {'series': 0, 'seconds': 0.0}
+            return {}
+        states = self.load_states()
+        months = pd.date_range(panel.index[-1] + pd.offsets.MonthBegin(1), periods=self.periods, freq='MS')
+
+        items = []
+        for key in panel.columns:
+            series = panel[key]
+            first = series.first_valid_index()
+            if first is None:
+                continue
+            # Each series runs from its first observed month to the end of the panel
+            items.append((key, series.loc[first:].to_numpy(dtype=float), first, states.get(key)))
+
+        forecasts, counts = {}, {}
+        for key, forecast, state in self._run(items):
+            states[key] = state
+            counts[forecast['action']] = counts.get(forecast['action'], 0) + 1
+            forecasts[key] = [
+                {"month": month.strftime('%Y-%m'), "predicted_price": float(forecast['mean'][i]),
+                 "lower": float(forecast['lower'][i]) if forecast['lower'] is not None else None,
+                 "upper": float(forecast['upper'][i]) if forecast['upper'] is not None else None,
+                 "model": forecast['kind']}
+                for i, month in enumerate(months)
+            ]
+        self.save_states(states)
+        self.last_run = dict(counts, series=len(items), seconds=time.perf_counter() - start)
+        return forecasts
+
+    def forecast(self, stats: pd.DataFrame) -> Dict[tuple, List[Dict[str, Any]]]:
+        """Forecasts for every market in market_monthly_stats-shaped rows"""
+        return self.forecast_panel(build_panel(stats, self.value))
+
+    def forecast_market(self, market_stats: pd.DataFrame, area: Optional[str] = None,
+                        property_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Forecast for one market's monthly stats (month + stat columns), sharing the cache"""
+        key = (area or ALL, property_type or ALL)
+        stats = market_stats.assign(area=key[0], property_type=key[1])
+        panel = build_panel(stats, self.value)
+        if panel.empty:
+            return []
+        # Only this market's state changes; the others are kept as they were
+        return self.forecast_panel(panel).get(key, [])
+
+def load_all_market_stats(engine) -> pd.DataFrame:
+    stats = pd.read_sql(sa.select(MarketMonthlyStats), engine)
+    stats['month'] = pd.to_datetime(stats['month'])
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Forecast monthly median prices for every market")
+    parser.add_argument('--periods', type=int, default=6, help="Months to forecast")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument('--refit', action='store_true', help="Ignore cached parameters and refit every series")
+    args = parser.parse_args()
+
+    engine = ForecastEngine(periods=args.periods, max_workers=args.workers,
+                            refit_months=0 if args.refit else REFIT_MONTHS)
+    forecasts = engine.forecast(load_all_market_stats(get_engine()))
+    run = engine.last_run
+    print(f"Forecast {run['series']} markets in {run['seconds']:.2f}s: "
+          + ', '.join(f"{action} {run.get(action, 0)}" for action in ('fitted', 'filtered', 'naive')))
+
+    os.makedirs('output', exist_ok=True)
+    output_path = os.path.join('output', f"market_forecasts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, 'w') as f:
+        json.dump([{"area": area, "property_type": property_type, "forecasts": values}
+                   for (area, property_type), values in sorted(forecasts.items())], f, indent=2)
+    print(f"Saved forecasts to {output_path}")
+
+if __name__ == "__main__":
+    main()
@@ -6,30 +6,30 @@ from datetime import datetime
 import numpy as np
 from setup_database import Property, FeatureCategory, Feature, PropertyFeature
 from mls_field_mapper import MLSFieldMapper
+from bulk_import import bulk_import_properties, list_number_keys
+from feature_import import import_features, FeatureDictionary
+from csv_reader import ENCODINGS, CSV_DTYPES, detect_encoding, iter_csv_chunks
+from snapshot import create_snapshot
+from feature_matrix import load_feature_matrix
+from database import get_engine, get_session
+from migrations import migrate
+from market_aggregates import refresh_market_stats
+from import_profiler import ImportProfiler, stage
+from verify_fields import validate_frame, ValidationReport, DuplicateTracker
+import argparse
 import os
+import time
 
-def create_backup(engine, timestamp):
-    """Create backup using pandas"""
-    try:
-        print("Creating backup...")
-        query = "SELECT * FROM properties"
-        df = pd.read_sql_query(query, engine)
-        backup_path = f'data/backup_{timestamp}.csv'
-        df.to_csv(backup_path, index=False, encoding='utf-8')
-        print(f"Successfully created backup: {backup_path}")
-        return backup_path
-    except Exception as e:
-        print(f"Warning: Could not create backup: {str(e)}")
-        return None
-
-def try_read_csv(file_path):
-    """Try different encodings to read CSV"""
-    encodings = ['utf-8', 'latin1', 'iso-8859-1', 'cp1252']
+def try_read_csv(file_path, detected=None):
+    """Read a CSV, trying the sniffed (or given) encoding first and the others as fallback"""
+    detected = detected or detect_encoding(file_path)
+    encodings = [detected] + [encoding for encoding in ENCODINGS if encoding != detected]
     
     for encoding in encodings:
         try:
             print(f"Trying to read CSV with {encoding} encoding...")
-            df = pd.read_csv(file_path, encoding=encoding)
+            # List Numbers stay text, as in the streamed reader, even when a blank makes the column float
+            df = pd.read_csv(file_path, encoding=encoding, dtype=CSV_DTYPES)
             print(f"Successfully read CSV with {encoding} encoding")
             return df
         except UnicodeDecodeError:
@@ -39,81 +39,292 @@ def try_read_csv(file_path):
     
     raise ValueError("Could not read CSV file with any supported encoding")
 
-def import_data(csv_path, session):
+def read_and_map(csv_path, profiler=None):
+    """Detect the encoding, parse the whole CSV and map its fields, one profiler stage each"""
+    with stage(profiler, 'encoding_detection'):
+        encoding = detect_encoding(csv_path)
+    with stage(profiler, 'csv_parse') as record:
+        df = try_read_csv(csv_path, encoding)
+        record['rows'] = len(df)
+    print(f"Found {len(df)} rows")
+
+    with stage(profiler, 'field_mapping', len(df)):
+        df = MLSFieldMapper().process_dataframe(df)
+    return df
+
+def validate(df, report=None, duplicates=None, profiler=None):
+    """Run the verify_fields rules on a processed frame (or chunk), accumulating into report"""
+    with stage(profiler, 'validation', len(df)):
+        report = validate_frame(df, report or ValidationReport(), duplicates)
+    if profiler:
+        profiler.info['validation'] = {name: entry['count'] for name, entry in report.rules.items()}
+    return report
+
+def print_validation(report):
+    """Print the rules that flagged rows"""
+    for name, entry in report.rules.items():
+        if entry['count']:
+            print(f"Validation {entry['severity']} {name}: {entry['count']} rows")
+
+def import_data(csv_path, session, profiler=None):
     print(f"Reading {csv_path}...")
     try:
-        df = try_read_csv(csv_path)
-        print(f"Found {len(df)} rows")
-        
-        mapper = MLSFieldMapper()
+        df = read_and_map(csv_path, profiler)
         processed_file = csv_path.replace('.csv', '_processed.csv')
-        df = mapper.process_dataframe(df)
         
         df.to_csv(processed_file, index=False, encoding='utf-8')
         print(f"Saved processed file to {processed_file}")
         
         print("Importing/Updating properties...")
+        start = time.perf_counter()
         records_updated = 0
         records_created = 0
         
-        for idx, row in df.iterrows():
-            try:
-                existing_prop = session.query(Property).filter_by(
-                    list_number=str(row['List Number']) if pd.notna(row['List Number']) else None
-                ).first()
-                
-                prop_data = {
-                    'list_number': str(row['List Number']) if pd.notna(row['List Number']) else None,
-                    'agency_name': row.get('Agency Name'),
-                    'agency_phone': row.get('Agency Phone'),
-                    'listing_agent': row.get('Listing Agent'),
-                    'property_type': row.get('property_type'),
-                    'status': row.get('Status'),
-                    'days_on_market': row.get('Days on Market'),
-                    'area': row.get('Area'),
-                    'community': row.get('Community'),
-                    'initial_price': row.get('initial_price'),
-                    'current_price': row.get('current_price'),
-                    'sold_price': row.get('sold_price'),
-                    'development_name': row.get('property_name'),
-                    'state': row.get('state'),
-                    'construction_ft2': row.get('construction_ft2'),
-                    'lot_measurements': row.get('lot_measurements'),
-                    'half_bath': row.get('half_bath'),
-                    'floor_number': row.get('floor_number'),
-                    'furnished': row.get('furnished'),
-                    'construction_m2': row.get('construction_m2')
-                }
-
-                if existing_prop:
-                    for key, value in prop_data.items():
-                        setattr(existing_prop, key, value)
-                    prop = existing_prop
-                    records_updated += 1
-                else:
-                    prop = Property(**prop_data)
-                    session.add(prop)
-                    records_created += 1
-
-                session.flush()
+        with stage(profiler, 'db_upsert', len(df)):
+            for idx, row in df.iterrows():
+                try:
+                    existing_prop = session.query(Property).filter_by(
+                        list_number=str(row['List Number']) if pd.notna(row['List Number']) else None
+                    ).first()
                 
-                if pd.notna(row.get('Features')):
+                    prop_data = {
+                        'list_number': str(row['List Number']) if pd.notna(row['List Number']) else None,
+                        'agency_name': row.get('Agency Name'),
+                        'agency_phone': row.get('Agency Phone'),
+                        'listing_agent': row.get('Listing Agent'),
+                        'property_type': row.get('property_type'),
+                        'status': row.get('Status'),
+                        'days_on_market': row.get('Days on Market'),
+                        'area': row.get('Area'),
+                        'community': row.get('Community'),
+                        'initial_price': row.get('initial_price'),
+                        'current_price': row.get('current_price'),
+                        'sold_price': row.get('sold_price'),
+                        'development_name': row.get('property_name'),
+                        'state': row.get('state'),
+                        'construction_ft2': row.get('construction_ft2'),
+                        'lot_measurements': row.get('lot_measurements'),
+                        'half_bath': row.get('half_bath'),
+                        'floor_number': row.get('floor_number'),
+                        'furnished': row.get('furnished'),
+                        'construction_m2': row.get('construction_m2'),
+                        'begin_date': row.get('begin_date')
+                    }
+                    prop_data = {key: None if pd.isna(value) else value for key, value in prop_data.items()}
+
                     if existing_prop:
-                        session.query(PropertyFeature).filter_by(property_id=prop.id).delete()
-                    
-                    features_list = str(row['Features']).split(';')
-                    for feature in features_list:
-                        if '|' in feature:
-                            category_name, feature_name, value = feature.split('|')
-                            category = get_or_create_category(session, category_name.strip())
-                            feature = get_or_create_feature(session, category.id, feature_name.strip())
-                            prop_feature = PropertyFeature(
-                                property_id=prop.id,
-                                feature_id=feature.id,
-                                value=value.strip()
-                            )
-                            session.add(prop_feature)
+                        for key, value in prop_data.items():
+                            setattr(existing_prop, key, value)
+                        # Written without a hash; the next delta import must not trust the old one
+                        existing_prop.content_hash = None
+                        prop = existing_prop
+                        records_updated += 1
+                    else:
+                        prop = Property(**prop_data)
+                        session.add(prop)
+                        records_created += 1
+
+                    session.flush()
+                
+                    if pd.notna(row.get('Features')):
+                        import_property_features(session, prop.id, row['Features'], replace=bool(existing_prop))
+                        if existing_prop:
+                            # Replaced features change no mapped column, so onupdate would not fire
+                            existing_prop.updated_at = datetime.now()
                 
-                if idx % 10 == 0:  # Commit every 10 records
-                    session.commit()
-                    print(f"Processed {idx+1}/{len(df)} records... (Updated: {records_updated}, Created: {records_created})"))
\ No newline at end of file
+                    if idx % 10 == 0:  # Commit every 10 records
+                        session.commit()
+                        print(f"Processed {idx+1}/{len(df)} records... (Updated: {records_updated}, Created: {records_created})")
+
+                except Exception as e:
+                    print(f"Error processing row {idx}: {str(e)}")
+                    session.rollback()
+                    continue
+
+        with stage(profiler, 'commit'):
+            session.commit()
+        elapsed = time.perf_counter() - start
+        print(f"Import completed in {elapsed:.2f}s ({len(df) / elapsed if elapsed > 0 else 0:.0f} rows/sec) "
+              f"- Updated: {records_updated}, Created: {records_created}")
+        return records_created, records_updated
+
+    except Exception as e:
+        print(f"Error importing data: {str(e)}")
+        session.rollback()
+        raise
+
+def import_property_features(session, prop_id, features, replace=True):
+    """Write the 'category|name|value;...' Features string for a property"""
+    if replace:
+        session.query(PropertyFeature).filter_by(property_id=prop_id).delete()
+
+    for feature in str(features).split(';'):
+        if '|' in feature:
+            category_name, feature_name, value = feature.split('|')
+            category = get_or_create_category(session, category_name.strip())
+            feature = get_or_create_feature(session, category.id, feature_name.strip())
+            session.add(PropertyFeature(
+                property_id=prop_id,
+                feature_id=feature.id,
+                value=value.strip()
+            ))
+
+def changed_rows(df, stats, delta):
+    """Rows of a processed frame whose listing was written by the upsert"""
+    if not delta:
+        return df
+    return df[list_number_keys(df['List Number']).isin(stats['changed'])]
+
+def bulk_import_data(csv_path, session, delta=False, validate_rows=False, profiler=None):
+    """Import a CSV with the set-based upsert instead of the per-row ORM loop"""
+    print(f"Reading {csv_path}...")
+    try:
+        df = read_and_map(csv_path, profiler)
+        if validate_rows:
+            print_validation(validate(df, profiler=profiler))
+
+        stats = bulk_import_properties(df, session, delta=delta, profiler=profiler, commit=False)
+
+        changed = changed_rows(df, stats, delta)
+        with stage(profiler, 'feature_writes', len(changed)):
+            feature_stats = import_features(changed, session)
+        with stage(profiler, 'commit'):
+            session.commit()
+        print(f"Wrote {feature_stats['features']} features for {feature_stats['properties']} properties")
+
+        return stats
+
+    except Exception as e:
+        print(f"Error importing data: {str(e)}")
+        session.rollback()
+        raise
+
+def stream_import_data(csv_path, session, chunksize=50000, encoding=None, delta=False,
+                       validate_rows=False, profiler=None):
+    """Import a CSV chunk by chunk: map each chunk and push it to the database before reading the next"""
+    with stage(profiler, 'encoding_detection'):
+        encoding = encoding or detect_encoding(csv_path)
+    print(f"Streaming {csv_path} ({encoding}) in chunks of {chunksize} rows...")
+
+    mapper = MLSFieldMapper()
+    dictionary = None
+    report, duplicates = ValidationReport(), DuplicateTracker()
+    totals = {'rows': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0, 'features': 0}
+    start = time.perf_counter()
+
+    try:
+        chunks = iter_csv_chunks(csv_path, chunksize=chunksize, encoding=encoding)
+        while True:
+            with stage(profiler, 'csv_parse') as record:
+                chunk = next(chunks, None)
+                record['rows'] = 0 if chunk is None else len(chunk)
+            if chunk is None:
+                break
+
+            with stage(profiler, 'field_mapping', len(chunk)):
+                chunk = mapper.process_dataframe(chunk)
+            if validate_rows:
+                validate(chunk, report, duplicates, profiler)
+
+            stats = bulk_import_properties(chunk, session, delta=delta, profiler=profiler, commit=False)
+
+            changed = changed_rows(chunk, stats, delta)
+            with stage(profiler, 'feature_writes', len(changed)):
+                dictionary = dictionary or FeatureDictionary(session)
+                feature_stats = import_features(changed, session, dictionary)
+            with stage(profiler, 'commit'):
+                session.commit()
+
+            for key in ('rows', 'created', 'updated', 'unchanged', 'skipped'):
+                totals[key] += stats[key]
+            totals['features'] += feature_stats['features']
+
+            elapsed = time.perf_counter() - start
+            print(f"Processed {totals['rows']} records ({totals['rows'] / elapsed:.0f} rows/sec)... "
+                  f"(Updated: {totals['updated']}, Created: {totals['created']}, Unchanged: {totals['unchanged']})")
+
+    except Exception as e:
+        print(f"Error importing data: {str(e)}")
+        session.rollback()
+        raise
+
+    if validate_rows:
+        print_validation(report)
+    totals['seconds'] = time.perf_counter() - start
+    totals['rows_per_sec'] = totals['rows'] / totals['seconds'] if totals['seconds'] > 0 else 0.0
+    print(f"Streaming import completed in {totals['seconds']:.2f}s ({totals['rows_per_sec']:.0f} rows/sec) "
+          f"- Updated: {totals['updated']}, Created: {totals['created']}, "
+          f"Unchanged: {totals['unchanged']}, Skipped: {totals['skipped']}")
+    return totals
+
+def get_or_create_category(session, name):
+    """Get a feature category by name, creating it if needed"""
+    category = session.query(FeatureCategory).filter_by(name=name).first()
+    if not category:
+        category = FeatureCategory(name=name)
+        session.add(category)
+        session.flush()
+    return category
+
+def get_or_create_feature(session, category_id, name):
+    """Get a feature by category and name, creating it if needed"""
+    feature = session.query(Feature).filter_by(category_id=category_id, name=name).first()
+    if not feature:
+        feature = Feature(category_id=category_id, name=name)
+        session.add(feature)
+        session.flush()
+    return feature
+
+def main():
+    parser = argparse.ArgumentParser(description="Import MLS data into the database")
+    parser.add_argument('csv_path', nargs='?', default='data/mls.csv')
+    parser.add_argument('--bulk', action='store_true',
+                        help="Use the set-based bulk upsert instead of the row-by-row import")
+    parser.add_argument('--stream', action='store_true',
+                        help="Read and upsert the CSV in chunks with bounded memory (implies --bulk)")
+    parser.add_argument('--chunksize', type=int, default=50000,
+                        help="Rows per chunk in streaming mode")
+    parser.add_argument('--encoding', help="CSV encoding (sniffed from the file when omitted)")
+    parser.add_argument('--delta', action='store_true',
+                        help="Skip listings whose content hash is unchanged (implies --bulk)")
+    parser.add_argument('--no-snapshot', action='store_true',
+                        help="Skip the pre-import snapshot (see snapshot.py)")
+    parser.add_argument('--validate', action='store_true',
+                        help="Run the verify_fields rules on the mapped rows (bulk and stream modes)")
+    parser.add_argument('--profile', action='store_true',
+                        help="Also write a cProfile dump next to the run report in output/")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    migrate(engine)
+    session = get_session()
+    profiler = ImportProfiler(engine, profile=args.profile)
+    profiler.info['args'] = vars(args)
+
+    if not args.no_snapshot:
+        with stage(profiler, 'snapshot'):
+            create_snapshot(engine)
+
+    try:
+        if args.stream:
+            stream_import_data(args.csv_path, session, chunksize=args.chunksize, encoding=args.encoding,
+                               delta=args.delta, validate_rows=args.validate, profiler=profiler)
+        elif args.bulk or args.delta:
+            bulk_import_data(args.csv_path, session, delta=args.delta,
+                             validate_rows=args.validate, profiler=profiler)
+        else:
+            import_data(args.csv_path, session, profiler=profiler)
+    finally:
+        session.close()
+
+    with stage(profiler, 'market_stats'):
+        refresh_market_stats(engine)
+
+    with stage(profiler, 'feature_matrix'):
+        load_feature_matrix(engine)
+
+    print(profiler.summary())
+    print(f"Saved run report to {profiler.write()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import cProfile
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional
+
+OUTPUT_DIR = 'output'
+
+def _rss_mb(field: str) -> Optional[float]:
+    """VmHWM (peak) or VmRSS (current) of this process in MB, from /proc (Linux only)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS counter so the next reading covers one stage only"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def process_peak_rss_mb() -> float:
+    """Peak RSS of the process since it started, in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+class ImportProfiler:
+    """Wall time, rows/sec, peak RSS and database round trips per import stage.
+
+    Stages with the same name (one per chunk in streaming mode) are accumulated.
+    Round trips are the statements counted by the engine from get_engine, so they
+    are only reported when an engine is given. Peak RSS is per stage on Linux
+    kernels that allow resetting it, and the process peak so far elsewhere.
+    """
+
+    def __init__(self, engine=None, profile: bool = False):
+        self.engine = engine
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.info: Dict[str, Any] = {}
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self._profiler = cProfile.Profile() if profile else None
+        if self._profiler:
+            self._profiler.enable()
+
+    def _queries(self) -> Optional[int]:
+        stats = getattr(self.engine, 'stats', None)
+        return stats.queries if stats else None
+
+    @contextmanager
+    def stage(self, name: str, rows: int = 0) -> Iterator[Dict[str, Any]]:
+        """Time a block; set record['rows'] inside it when the row count is only known afterwards"""
+        record = {'rows': rows}
+        per_stage_peak = _reset_peak_rss()
+        queries = self._queries()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = _rss_mb('VmHWM') if per_stage_peak else None
+            stage = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'rows': 0,
+                                                  'queries': 0, 'peak_rss_mb': 0.0})
+            stage['calls'] += 1
+            stage['seconds'] += elapsed
+            stage['rows'] += record['rows']
+            if queries is not None:
+                stage['queries'] += self._queries() - queries
+            stage['peak_rss_mb'] = max(stage['peak_rss_mb'], peak or process_peak_rss_mb())
+
+    def report(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self._start
+        stages = {}
+        for name, stage in self.stages.items():
+            stages[name] = dict(stage, rows_per_sec=stage['rows'] / stage['seconds'] if stage['seconds'] > 0 else None,
+                                share=stage['seconds'] / elapsed if elapsed > 0 else None)
+        return {
+            'started_at': self.started_at.isoformat(),
+            'seconds': elapsed,
+            'peak_rss_mb': process_peak_rss_mb(),
+            'queries': self._queries(),
+            'stages': stages,
+            **self.info
+        }
+
+    def write(self, output_dir: str = OUTPUT_DIR, name: str = 'import') -> str:
+        """Write the JSON run report (and the cProfile dump if profiling) to output_dir"""
+        os.makedirs(output_dir, exist_ok=True)
+        stamp = self.started_at.strftime('%Y%m%d_%H%M%S')
+        report = self.report()
+        if self._profiler:
+            self._profiler.disable()
+            profile_path = os.path.join(output_dir, f"{name}_profile_{stamp}.prof")
+            self._profiler.dump_stats(profile_path)
+            report['profile'] = profile_path
+        report_path = os.path.join(output_dir, f"{name}_report_{stamp}.json")
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        return report_path
+
+    def summary(self) -> str:
+        report = self.report()
+        lines = [f"Import took {report['seconds']:.2f}s, peak RSS {report['peak_rss_mb']:.0f} MB"]
+        for name, stage in sorted(report['stages'].items(), key=lambda item: -item[1]['seconds']):
+            rate = f", {stage['rows_per_sec']:.0f} rows/sec" if stage['rows'] and stage['rows_per_sec'] else ""
+            lines.append(f"  {name}: {stage['seconds']:.2f}s ({stage['share']:.0%}){rate}, "
+                         f"{stage['queries']} queries, peak {stage['peak_rss_mb']:.0f} MB")
+        return '\n'.join(lines)
+
+@contextmanager
+def stage(profiler: Optional[ImportProfiler], name: str, rows: int = 0) -> Iterator[Dict[str, Any]]:
+    """profiler.stage(name, rows), or a no-op when no profiler is passed"""
+    if profiler is None:
+        yield {'rows': rows}
+    else:
+        with profiler.stage(name, rows) as record:
+            yield record
@@ -0,0 +1,95 @@
+import pandas as pd
+import sqlalchemy as sa
+from typing import Dict, Iterable, Optional
+from setup_database import Property
+from bulk_import import PROPERTY_FIELD_MAP
+from csv_reader import CSV_DTYPES
+
+# Low-cardinality text columns held as pandas categoricals (a few hundred distinct
+# values over millions of rows); list numbers, phones and agents stay as objects
+CATEGORICAL_COLUMNS = ['agency_name', 'property_type', 'status', 'area', 'community',
+                       'development_name', 'state']
+
+# Categorical columns copied unchanged from the MLS export (the others are
+# produced by MLSFieldMapper and are not in the raw CSV)
+RAW_CATEGORICAL_COLUMNS = ['agency_name', 'status', 'area', 'community']
+
+# Integer columns with a known small range; other integers become nullable Int32
+SMALL_INT_DTYPES = {'half_bath': 'Int8', 'floor_number': 'Int16'}
+
+# Prices keep float64: float32 only has 24 bits of mantissa and would round peso
+# prices above ~16.7M. Measurements and derived columns are fine as float32
+FLOAT64_COLUMNS = ['initial_price', 'current_price', 'sold_price']
+
+# Columns the analytics queries derive from begin_date
+DERIVED_DTYPES = {'month': 'Int8', 'year': 'Int16'}
+
+def property_dtypes() -> Dict[str, str]:
+    """Compact pandas dtype of every properties column, derived from the Property model"""
+    dtypes = {}
+    for column in Property.__table__.columns:
+        if column.name in CATEGORICAL_COLUMNS:
+            dtypes[column.name] = 'category'
+        elif isinstance(column.type, sa.Integer):
+            dtypes[column.name] = SMALL_INT_DTYPES.get(column.name, 'Int32')
+        elif isinstance(column.type, sa.Float):
+            dtypes[column.name] = 'float64' if column.name in FLOAT64_COLUMNS else 'float32'
+        elif isinstance(column.type, sa.Boolean):
+            dtypes[column.name] = 'boolean'
+        elif isinstance(column.type, sa.DateTime):
+            dtypes[column.name] = 'datetime64[ns]'
+        else:
+            dtypes[column.name] = 'object'
+    dtypes.update(DERIVED_DTYPES)
+    return dtypes
+
+def csv_dtypes() -> Dict[str, str]:
+    """read_csv dtypes for the raw MLS columns that map straight onto categorical Property columns"""
+    dtypes = {PROPERTY_FIELD_MAP[column]: 'category' for column in RAW_CATEGORICAL_COLUMNS}
+    dtypes.update(CSV_DTYPES)
+    return dtypes
+
+def apply_schema(df: pd.DataFrame, dtypes: Optional[Dict[str, str]] = None,
+                 skip: Iterable[str] = ()) -> pd.DataFrame:
+    """Convert the columns of df that appear in dtypes (default: property_dtypes()).
+
+    Values that do not fit the target type become missing rather than failing,
+    the same way map_properties coerces on import.
+    """
+    dtypes = dtypes or property_dtypes()
+    skip = set(skip)
+    converted = {}
+    for column, dtype in dtypes.items():
+        if column not in df.columns or column in skip or str(df[column].dtype) == dtype:
+            continue
+        values = df[column]
+        if dtype == 'category':
+            converted[column] = values.astype('category')
+        elif dtype == 'datetime64[ns]':
+            converted[column] = pd.to_datetime(values, errors='coerce')
+        elif dtype == 'boolean':
+            converted[column] = values.astype('boolean')
+        elif dtype.startswith('float'):
+            converted[column] = pd.to_numeric(values, errors='coerce').astype(dtype)
+        elif dtype.startswith('Int'):
+            converted[column] = pd.to_numeric(values, errors='coerce').round().astype(dtype)
+    return df.assign(**converted) if converted else df
+
+def read_listings(query, con, chunksize: Optional[int] = 100000) -> pd.DataFrame:
+    """pd.read_sql with the Property schema applied.
+
+    Numeric columns are downcast chunk by chunk so the float64/object copy of the
+    whole result never exists at once; categoricals are built after the chunks are
+    combined, since categoricals with different categories do not concatenate.
+    """
+    dtypes = property_dtypes()
+    categorical = [column for column, dtype in dtypes.items() if dtype == 'category']
+    if chunksize is None:
+        return apply_schema(pd.read_sql(query, con), dtypes)
+
+    chunks = [apply_schema(chunk, dtypes, skip=categorical)
+              for chunk in pd.read_sql(query, con, chunksize=chunksize)]
+    if not chunks:
+        return apply_schema(pd.read_sql(query, con), dtypes)
+    df = chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+    return apply_schema(df, {column: 'category' for column in categorical})
@@ -0,0 +1,146 @@
+import argparse
+import time
+import pandas as pd
+import sqlalchemy as sa
+from datetime import datetime
+from typing import List, Optional
+from setup_database import Property, MarketMonthlyStats
+from database import get_engine
+
+# Stored in place of area / property_type for rollups over all values
+ALL = '__all__'
+
+# Grouping sets written for every month, so any (area, property_type) filter used by
+# MarketAnalytics maps to stored rows (medians cannot be combined after the fact)
+GROUPINGS = [('area', 'property_type'), ('area',), ('property_type',), ()]
+
+LISTING_COLUMNS = [
+    Property.area, Property.property_type, Property.begin_date, Property.current_price,
+    Property.construction_ft2, Property.construction_m2, Property.days_on_market
+]
+
+STAT_COLUMNS = [
+    'listings', 'mean_price', 'median_price', 'mean_price_per_ft2',
+    'median_price_per_ft2', 'median_price_per_m2', 'mean_days_on_market'
+]
+
+def compute_market_stats(df: pd.DataFrame) -> pd.DataFrame:
+    """Monthly aggregates for every grouping set from raw listings.
+
+    Expects area, property_type, begin_date, current_price, construction_ft2,
+    construction_m2 and days_on_market columns; rows without begin_date or with a
+    non-positive price are ignored, as in MarketAnalytics.
+    """
+    numeric = ['current_price', 'construction_ft2', 'construction_m2', 'days_on_market']
+    df = df.assign(**{column: pd.to_numeric(df[column], errors='coerce') for column in numeric})
+    df = df[df['begin_date'].notna() & (df['current_price'] > 0)]
+    df = df.assign(
+        month=pd.to_datetime(df['begin_date']).dt.to_period('M').dt.to_timestamp(),
+        price_per_ft2=df['current_price'] / df['construction_ft2'].where(df['construction_ft2'] > 0),
+        price_per_m2=df['current_price'] / df['construction_m2'].where(df['construction_m2'] > 0)
+    )
+
+    frames = []
+    for keys in GROUPINGS:
+        grouped = df.dropna(subset=list(keys)).groupby(list(keys) + ['month'], observed=True)
+        stats = grouped.agg(
+            listings=('current_price', 'size'),
+            mean_price=('current_price', 'mean'),
+            median_price=('current_price', 'median'),
+            mean_price_per_ft2=('price_per_ft2', 'mean'),
+            median_price_per_ft2=('price_per_ft2', 'median'),
+            median_price_per_m2=('price_per_m2', 'median'),
+            mean_days_on_market=('days_on_market', 'mean')
+        ).reset_index()
+        for key in ('area', 'property_type'):
+            if key not in keys:
+                stats[key] = ALL
+        frames.append(stats)
+
+    columns = ['area', 'property_type', 'month'] + STAT_COLUMNS
+    if not frames or all(frame.empty for frame in frames):
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)[columns]
+
+def _month_ranges(months: List[pd.Timestamp]):
+    """WHERE clause selecting listings that begin in any of the given months"""
+    return sa.or_(*[
+        sa.and_(Property.begin_date >= month.to_pydatetime(),
+                Property.begin_date < (month + pd.offsets.MonthBegin(1)).to_pydatetime())
+        for month in months
+    ])
+
+def _last_refresh(conn) -> Optional[datetime]:
+    return conn.execute(sa.select(sa.func.max(MarketMonthlyStats.refreshed_at))).scalar()
+
+def refresh_market_stats(engine, full: bool = False) -> int:
+    """Bring market_monthly_stats up to date with properties.
+
+    Incremental by default: only months containing listings updated since the last
+    refresh are recomputed (for every area and property type, so listings that
+    moved between areas are handled). A listing whose begin_date changes leaves its
+    old month stale until the next full refresh.
+
+    Returns:
+        Number of aggregate rows written
+    """
+    start = time.perf_counter()
+    table = MarketMonthlyStats.__table__
+    refreshed_at = datetime.now()
+
+    with engine.begin() as conn:
+        since = None if full else _last_refresh(conn)
+        base = sa.select(*LISTING_COLUMNS).where(
+            Property.begin_date.isnot(None), Property.current_price > 0
+        )
+
+        if since is None:
+            listings = pd.read_sql(base, conn)
+            conn.execute(table.delete())
+        else:
+            changed = pd.read_sql(
+                sa.select(Property.begin_date).where(
+                    Property.updated_at >= since, Property.begin_date.isnot(None)
+                ).distinct(),
+                conn
+            )
+            if changed.empty:
+                print("Market stats already up to date")
+                return 0
+            months = sorted(pd.to_datetime(changed['begin_date']).dt.to_period('M').dt.to_timestamp().unique())
+            months = [pd.Timestamp(month) for month in months]
+            listings = pd.read_sql(base.where(_month_ranges(months)), conn)
+            conn.execute(table.delete().where(table.c.month.in_([month.to_pydatetime() for month in months])))
+
+        stats = compute_market_stats(listings)
+        stats['refreshed_at'] = refreshed_at
+        records = stats.astype(object).where(stats.notna(), None).to_dict('records')
+        if records:
+            conn.execute(table.insert(), records)
+
+    kind = 'full' if since is None else 'incremental'
+    print(f"Refreshed market stats ({kind}): {len(records)} rows from {len(listings)} listings "
+          f"in {time.perf_counter() - start:.2f}s")
+    return len(records)
+
+def load_market_stats(engine, area: Optional[str] = None,
+                      property_type: Optional[str] = None) -> pd.DataFrame:
+    """Monthly aggregates for one market (None means all areas / all property types)"""
+    query = (
+        sa.select(MarketMonthlyStats.month, *[getattr(MarketMonthlyStats, column) for column in STAT_COLUMNS])
+        .where(MarketMonthlyStats.area == (area or ALL),
+               MarketMonthlyStats.property_type == (property_type or ALL))
+        .order_by(MarketMonthlyStats.month)
+    )
+    df = pd.read_sql(query, engine)
+    df['month'] = pd.to_datetime(df['month'])
+    return df
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the market_monthly_stats aggregates")
+    parser.add_argument('--full', action='store_true', help="Rebuild from all listings")
+    args = parser.parse_args()
+    refresh_market_stats(get_engine(), full=args.full)
+
+if __name__ == "__main__":
+    main()
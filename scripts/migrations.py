@@ -0,0 +1,157 @@
+import argparse
+import sqlalchemy as sa
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+from setup_database import Base, MarketMonthlyStats
+from database import get_engine
+
+MIGRATIONS_TABLE = 'schema_migrations'
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable
+    downgrade: Optional[Callable] = None
+
+def _add_columns(conn, table_name: str, columns: List[sa.Column]):
+    """ALTER TABLE ADD COLUMN for the given columns the table does not have yet"""
+    existing = {column['name'] for column in sa.inspect(conn).get_columns(table_name)}
+    for column in columns:
+        if column.name not in existing:
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN {column.name} {column_type}")
+            print(f"Added column {table_name}.{column.name}")
+
+def _add_change_tracking(conn):
+    # Spelled out rather than read from the model, so the migration stays the same as the model changes
+    _add_columns(conn, 'properties', [sa.Column('content_hash', sa.String(40)),
+                                      sa.Column('updated_at', sa.DateTime)])
+
+def _hot_column_indexes() -> List[sa.Index]:
+    """Indexes declared on the models for the import and analytics hot paths"""
+    names = {
+        'ix_properties_area_type_begin_date',
+        'ix_properties_updated_at',
+        'ix_property_features_property_id',
+        'ix_property_features_feature_id',
+        'uq_features_category_id_name'
+    }
+    return [index for table in Base.metadata.sorted_tables for index in table.indexes if index.name in names]
+
+def _dedupe_features(conn):
+    """Point property_features at the lowest id of duplicate features, then drop the duplicates"""
+    conn.execute(sa.text("""
+        UPDATE property_features
+        SET feature_id = (
+            SELECT MIN(f2.id)
+            FROM features f1
+            JOIN features f2 ON f2.category_id = f1.category_id AND f2.name = f1.name
+            WHERE f1.id = property_features.feature_id
+        )
+        WHERE feature_id IN (
+            SELECT id FROM features
+            WHERE category_id IS NOT NULL
+                AND id NOT IN (SELECT MIN(id) FROM features GROUP BY category_id, name)
+        )
+    """))
+    conn.execute(sa.text("""
+        DELETE FROM features
+        WHERE category_id IS NOT NULL
+            AND id NOT IN (SELECT MIN(id) FROM features GROUP BY category_id, name)
+    """))
+
+def _create_indexes(conn):
+    _dedupe_features(conn)
+    for index in _hot_column_indexes():
+        index.create(conn, checkfirst=True)
+    if conn.dialect.name == 'postgresql':
+        conn.execute(sa.text("ANALYZE properties; ANALYZE property_features; ANALYZE features"))
+
+def _drop_indexes(conn):
+    for index in _hot_column_indexes():
+        index.drop(conn, checkfirst=True)
+
+def _create_market_stats(conn):
+    MarketMonthlyStats.__table__.create(conn, checkfirst=True)
+
+def _drop_market_stats(conn):
+    MarketMonthlyStats.__table__.drop(conn, checkfirst=True)
+
+# Append only; a version must never change once released. New model columns get a
+# migration of their own (see _add_change_tracking).
+# Range partitioning of properties by begin_date is deliberately not offered: PostgreSQL
+# requires every unique index of a partitioned table to include the partition key, which
+# would drop the global UNIQUE (list_number) the bulk upsert's ON CONFLICT depends on.
+MIGRATIONS = [
+    Migration(1, "Add content_hash and updated_at to properties", _add_change_tracking),
+    Migration(2, "Index property_features, features(category_id, name) and properties hot columns",
+              _create_indexes, _drop_indexes),
+    Migration(3, "Add market_monthly_stats aggregate table", _create_market_stats, _drop_market_stats),
+]
+
+def _migrations_table() -> sa.Table:
+    return sa.Table(
+        MIGRATIONS_TABLE, sa.MetaData(),
+        sa.Column('version', sa.Integer, primary_key=True),
+        sa.Column('description', sa.String),
+        sa.Column('applied_at', sa.DateTime)
+    )
+
+def applied_versions(engine) -> List[int]:
+    table = _migrations_table()
+    table.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        return sorted(conn.execute(sa.select(table.c.version)).scalars())
+
+def migrate(engine, target: Optional[int] = None) -> List[int]:
+    """Apply pending migrations up to target (default: latest), each in its own transaction"""
+    table = _migrations_table()
+    applied = set(applied_versions(engine))
+    done = []
+    for migration in MIGRATIONS:
+        if migration.version in applied or (target is not None and migration.version > target):
+            continue
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+            conn.execute(table.insert().values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=datetime.now()
+            ))
+        print(f"Applied migration {migration.version}: {migration.description}")
+        done.append(migration.version)
+    return done
+
+def downgrade(engine, target: int) -> List[int]:
+    """Revert applied migrations above target, newest first"""
+    table = _migrations_table()
+    applied = set(applied_versions(engine))
+    done = []
+    for migration in reversed(MIGRATIONS):
+        if migration.version not in applied or migration.version <= target:
+            continue
+        if migration.downgrade is None:
+            raise ValueError(f"Migration {migration.version} cannot be reverted")
+        with engine.begin() as conn:
+            migration.downgrade(conn)
+            conn.execute(table.delete().where(table.c.version == migration.version))
+        print(f"Reverted migration {migration.version}: {migration.description}")
+        done.append(migration.version)
+    return done
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply or revert schema migrations")
+    parser.add_argument('--target', type=int, help="Version to migrate to (default: latest)")
+    parser.add_argument('--downgrade', action='store_true', help="Revert migrations above --target")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    if args.downgrade:
+        downgrade(engine, args.target or 0)
+    else:
+        Base.metadata.create_all(engine)
+        migrate(engine, args.target)
+    print(f"Schema at version {max(applied_versions(engine), default=0)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+FT2_PER_M2 = 10.7639
+
+# Canonical property types (lowercased source value -> stored value)
+PROPERTY_TYPES = {
+    'house': 'House', 'casa': 'House', 'single family': 'House', 'residential': 'House',
+    'condo': 'Condo', 'condominium': 'Condo', 'condominio': 'Condo', 'departamento': 'Condo',
+    'apartment': 'Condo', 'townhouse': 'Condo',
+    'lot': 'Lot', 'land': 'Lot', 'lote': 'Lot', 'terreno': 'Lot',
+    'commercial': 'Commercial', 'comercial': 'Commercial', 'local comercial': 'Commercial'
+}
+
+TRUE_VALUES = {'yes', 'y', 'si', 'sí', 'true', 't', '1', 'furnished', 'amueblado'}
+FALSE_VALUES = {'no', 'n', 'false', 'f', '0', 'unfurnished', 'sin amueblar', 'none'}
+
+class FieldSpec(NamedTuple):
+    """How one processed column is derived from the MLS export.
+
+    sources are candidate source columns, the first one present is used. unit is
+    the unit of an 'area' target; values with an explicit ft2/m2 suffix are
+    converted to it. fallback names another target to convert from where this
+    one is missing. values maps lowercased text to canonical values.
+    """
+    target: str
+    sources: Tuple[str, ...]
+    parser: str
+    unit: Optional[str] = None
+    fallback: Optional[str] = None
+    values: Optional[Dict[str, Any]] = None
+    default: Any = None
+
+MLS_FIELD_SPEC = [
+    FieldSpec('property_type', ('Property Type', 'Type'), 'text', values=PROPERTY_TYPES),
+    FieldSpec('initial_price', ('Original List Price', 'Original Price', 'Initial Price'), 'price'),
+    FieldSpec('current_price', ('List Price', 'Current Price', 'Price'), 'price'),
+    FieldSpec('sold_price', ('Sold Price', 'Sale Price'), 'price'),
+    FieldSpec('property_name', ('Development Name', 'Property Name', 'Development'), 'text'),
+    FieldSpec('state', ('State', 'State/Province'), 'text'),
+    FieldSpec('construction_ft2', ('Construction ft2', 'Construction Sq Ft', 'Sq Ft'), 'area',
+              unit='ft2', fallback='construction_m2'),
+    FieldSpec('construction_m2', ('Construction m2', 'Construction M2', 'Construction'), 'area',
+              unit='m2', fallback='construction_ft2'),
+    FieldSpec('lot_measurements', ('Lot Measurements', 'Lot Size', 'Lot Dimensions'), 'text'),
+    FieldSpec('half_bath', ('Half Baths', 'Half Bath'), 'int'),
+    FieldSpec('floor_number', ('Floor Number', 'Floor', 'Unit Floor'), 'int'),
+    FieldSpec('furnished', ('Furnished',), 'boolean'),
+    FieldSpec('begin_date', ('List Date', 'Listing Date', 'Begin Date'), 'date'),
+]
+
+def _on_uniques(values: pd.Series, parse: Callable[[pd.Series], pd.Series]) -> pd.Series:
+    """Apply a vectorized text parser to the distinct values only and broadcast back.
+
+    MLS exports repeat the same price, area and yes/no strings many times, so this
+    parses a small fraction of the rows.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    parsed = parse(pd.Series(uniques, dtype=object))
+    result = parsed.to_numpy()[codes] if len(parsed) else np.full(len(codes), np.nan)
+    result = pd.Series(result, index=values.index)
+    return result.where(codes >= 0)
+
+def _number_text(text: pd.Series) -> pd.Series:
+    """First number in each string, ignoring currency symbols and thousands separators"""
+    number = text.astype(str).str.replace(',', '', regex=False).str.extract(r'(-?\d+(?:\.\d+)?)')[0]
+    return pd.to_numeric(number, errors='coerce')
+
+def parse_text(values: pd.Series, spec: FieldSpec) -> pd.Series:
+    def parse(uniques):
+        text = uniques.astype(str).str.strip()
+        text = text.where(text != '')
+        if spec.values:
+            text = text.str.lower().map(spec.values).fillna(text)
+        return text
+    return _on_uniques(values, parse).astype(object)
+
+def parse_price(values: pd.Series, spec: FieldSpec) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(values):
+        price = values.astype(float)
+    else:
+        price = _on_uniques(values, _number_text).astype(float)
+    # Zero and negative prices are placeholders in the export, not real prices
+    return price.where(price > 0)
+
+def parse_area(values: pd.Series, spec: FieldSpec) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+
+    def parse(uniques):
+        text = uniques.astype(str).str.lower()
+        number = _number_text(text)
+        in_m2 = text.str.contains(r'm2|m²|mts|sqm|metros', regex=True)
+        in_ft2 = text.str.contains(r'ft|sq|pies', regex=True) & ~in_m2
+        if spec.unit == 'ft2':
+            return number.where(~in_m2, number * FT2_PER_M2)
+        return number.where(~in_ft2, number / FT2_PER_M2)
+    return _on_uniques(values, parse).astype(float)
+
+def parse_int(values: pd.Series, spec: FieldSpec) -> pd.Series:
+    if not pd.api.types.is_numeric_dtype(values):
+        values = _on_uniques(values, _number_text)
+    return pd.to_numeric(values, errors='coerce').round().astype('Int64')
+
+def parse_boolean(values: pd.Series, spec: FieldSpec) -> pd.Series:
+    if pd.api.types.is_bool_dtype(values):
+        return values.astype('boolean')
+
+    def parse(uniques):
+        text = uniques.astype(str).str.strip().str.lower()
+        return pd.Series(np.where(text.isin(TRUE_VALUES), True,
+                                  np.where(text.isin(FALSE_VALUES), False, None)), dtype=object)
+    return _on_uniques(values, parse).astype('boolean')
+
+def parse_date(values: pd.Series, spec: FieldSpec) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+
+    def parse(uniques):
+        return pd.Series(pd.to_datetime(uniques.astype(str), errors='coerce', format='mixed'), dtype=object)
+    return pd.to_datetime(_on_uniques(values, parse), errors='coerce')
+
+def source_column(df: pd.DataFrame, target: str, spec: Optional[List[FieldSpec]] = None) -> Optional[str]:
+    """The raw column of df a spec target is derived from, if one is present"""
+    field = next((field for field in spec or MLS_FIELD_SPEC if field.target == target), None)
+    return MLSFieldMapper._source(df, field) if field else None
+
+def parse_number(values: pd.Series) -> pd.Series:
+    """Numbers as written in a raw column; zero and negative values are kept, unlike parse_price"""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+    return _on_uniques(values, _number_text).astype(float)
+
+PARSERS = {
+    'text': parse_text,
+    'price': parse_price,
+    'area': parse_area,
+    'int': parse_int,
+    'boolean': parse_boolean,
+    'date': parse_date
+}
+
+# Conversion factor from the unit of a fallback target to the unit of the target
+UNIT_FACTORS = {('m2', 'ft2'): FT2_PER_M2, ('ft2', 'm2'): 1 / FT2_PER_M2}
+
+class MLSFieldMapper:
+    """Derives the processed columns the import expects from a raw MLS export.
+
+    The spec is compiled once into (target, sources, parser) steps; each step is
+    a handful of column-wide pandas operations, so the cost per chunk does not
+    depend on Python work per row. Source columns are kept as they are.
+    """
+
+    def __init__(self, spec: Optional[List[FieldSpec]] = None):
+        self.spec = spec or MLS_FIELD_SPEC
+        self._steps = self._compile(self.spec)
+
+    @staticmethod
+    def _compile(spec: List[FieldSpec]):
+        targets = {field.target: field for field in spec}
+        steps = []
+        for field in spec:
+            if field.parser not in PARSERS:
+                raise ValueError(f"Unknown parser '{field.parser}' for {field.target}")
+            factor = None
+            if field.fallback:
+                if field.fallback not in targets:
+                    raise ValueError(f"Fallback '{field.fallback}' of {field.target} is not a target")
+                factor = UNIT_FACTORS.get((targets[field.fallback].unit, field.unit), 1.0)
+            steps.append((field, PARSERS[field.parser], factor))
+        return steps
+
+    @staticmethod
+    def _source(df: pd.DataFrame, field: FieldSpec) -> Optional[str]:
+        return next((source for source in field.sources if source in df.columns), None)
+
+    def process_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Return df with every spec target column added"""
+        parsed = {}
+        for field, parse, _ in self._steps:
+            source = self._source(df, field)
+            # An absent source parses like an all-missing column, so the target dtype is the same
+            values = df[source] if source else pd.Series(None, index=df.index, dtype=object)
+            parsed[field.target] = parse(values, field)
+
+        # Unit fallbacks read the parsed values, so ft2 <- m2 and m2 <- ft2 both see the source data
+        filled = {}
+        for field, _, factor in self._steps:
+            if field.fallback:
+                fallback = pd.to_numeric(parsed[field.fallback], errors='coerce') * factor
+                filled[field.target] = pd.to_numeric(parsed[field.target], errors='coerce').fillna(fallback)
+        parsed.update(filled)
+
+        for field, _, _ in self._steps:
+            if field.default is not None and field.target not in filled:
+                parsed[field.target] = parsed[field.target].fillna(field.default)
+        return df.assign(**parsed)
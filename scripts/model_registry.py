@@ -0,0 +1,108 @@
+import os
+import json
+import hashlib
+import threading
+import joblib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+MODEL_DIR = os.path.join('data', 'models')
+
+class ModelRegistry:
+    """Fitted model cache persisted to disk and evicted least-recently-used first.
+
+    Entries are keyed by everything that determines the fit (filters, feature
+    lists, target and the data version), so a new import produces new keys and
+    stale models simply age out. A small in-memory layer avoids reloading models
+    that are used repeatedly in one process.
+    """
+
+    def __init__(self, cache_dir: str = MODEL_DIR, max_entries: int = 100,
+                 max_bytes: Optional[int] = 2 * 1024 ** 3, memory_entries: int = 16):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(**parts) -> str:
+        """Stable key for the parts that determine a fitted model"""
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.joblib')
+
+    def _remember(self, key: str, value: Any):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value for key, or None"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                if os.path.exists(self._path(key)):
+                    os.utime(self._path(key))
+                return self._memory[key]
+
+            path = self._path(key)
+            if not os.path.exists(path):
+                self.misses += 1
+                return None
+            try:
+                value = joblib.load(path)
+            except Exception as e:
+                print(f"Warning: Could not load cached model {key}: {str(e)}")
+                os.remove(path)
+                self.misses += 1
+                return None
+            # mtime doubles as the last-used time for eviction
+            os.utime(path)
+            self._remember(key, value)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any):
+        """Persist a value and evict the least recently used entries over the caps"""
+        with self._lock:
+            tmp_path = self._path(key) + '.tmp'
+            joblib.dump(value, tmp_path)
+            os.replace(tmp_path, self._path(key))
+            self._remember(key, value)
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.joblib'):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries
+                           or (self.max_bytes is not None and total > self.max_bytes and len(entries) > 1)):
+            _, size, name = entries.pop(0)
+            os.remove(os.path.join(self.cache_dir, name))
+            self._memory.pop(name[:-len('.joblib')], None)
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.joblib'):
+                    os.remove(os.path.join(self.cache_dir, name))
+            self._memory.clear()
+
+    def stats(self) -> Dict[str, int]:
+        files = [name for name in os.listdir(self.cache_dir) if name.endswith('.joblib')]
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(files)}
@@ -0,0 +1,126 @@
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+from mls_field_mapper import MLSFieldMapper
+from bulk_import import bulk_import_properties
+from feature_import import import_features
+from import_data import try_read_csv, changed_rows
+from database import get_engine, get_database_url
+from market_aggregates import refresh_market_stats
+from migrations import migrate
+
+# Per-process engine, created by the pool initializer after the worker has started
+_engine = None
+
+def _init_worker(db_url: str):
+    global _engine
+    _engine = get_engine(db_url, pool_size=1, max_overflow=0)
+
+def _import_file(csv_path: str, delta: bool) -> Dict:
+    """Parse, map and upsert one CSV inside a worker process"""
+    timings = {}
+    start = time.perf_counter()
+    df = try_read_csv(csv_path)
+    timings['parse'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df = MLSFieldMapper().process_dataframe(df)
+    timings['map'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    session = sessionmaker(bind=_engine)()
+    try:
+        stats = bulk_import_properties(df, session, delta=delta, commit=False)
+        feature_stats = import_features(changed_rows(df, stats, delta), session)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    timings['db'] = time.perf_counter() - start
+
+    stats.pop('changed')
+    stats.update(file=csv_path, features=feature_stats['features'], timings=timings,
+                 seconds=sum(timings.values()))
+    return stats
+
+def find_csv_files(source: str) -> List[str]:
+    """Expand a directory or glob into CSV paths, skipping _processed.csv copies"""
+    pattern = os.path.join(source, '*.csv') if os.path.isdir(source) else source
+    return sorted(path for path in glob.glob(pattern) if not path.endswith('_processed.csv'))
+
+def parallel_import(source: str, db_url: str, max_workers: Optional[int] = None,
+                    delta: bool = False) -> Dict:
+    """Import every CSV in a directory or glob with one worker process per file.
+
+    Each worker owns a single-connection engine, so the database sees at most
+    max_workers connections. SQLite allows one writer at a time, so its files
+    are imported by a single worker.
+    """
+    files = find_csv_files(source)
+    if not files:
+        raise ValueError(f"No CSV files found for {source}")
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(files))
+    if max_workers > 1 and make_url(db_url).get_backend_name() == 'sqlite':
+        print("SQLite does not allow concurrent writers; importing with 1 worker")
+        max_workers = 1
+    print(f"Importing {len(files)} files with {max_workers} workers...")
+
+    results, errors = [], {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(db_url,)) as pool:
+        futures = {pool.submit(_import_file, path, delta): path for path in files}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                errors[path] = str(e)
+                print(f"Error importing {path}: {str(e)}")
+                continue
+            results.append(result)
+            timings = result['timings']
+            print(f"{path}: {result['rows']} rows in {result['seconds']:.2f}s "
+                  f"(parse {timings['parse']:.2f}s, map {timings['map']:.2f}s, db {timings['db']:.2f}s)")
+
+    elapsed = time.perf_counter() - start
+    rows = sum(result['rows'] for result in results)
+    summary = {
+        'files': sorted(results, key=lambda result: result['file']),
+        'errors': errors,
+        'rows': rows,
+        'created': sum(result['created'] for result in results),
+        'updated': sum(result['updated'] for result in results),
+        'unchanged': sum(result['unchanged'] for result in results),
+        'seconds': elapsed,
+        'rows_per_sec': rows / elapsed if elapsed > 0 else 0.0,
+        'workers': max_workers
+    }
+    print(f"Imported {rows} rows from {len(results)}/{len(files)} files in {elapsed:.2f}s "
+          f"({summary['rows_per_sec']:.0f} rows/sec) - Created: {summary['created']}, "
+          f"Updated: {summary['updated']}, Unchanged: {summary['unchanged']}")
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Import several MLS CSVs in parallel")
+    parser.add_argument('source', nargs='?', default='data', help="Directory or glob of CSV files")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument('--delta', action='store_true', help="Skip listings whose content hash is unchanged")
+    args = parser.parse_args()
+
+    db_url = get_database_url()
+    engine = get_engine(db_url)
+    migrate(engine)
+    parallel_import(args.source, db_url, max_workers=args.workers, delta=args.delta)
+    refresh_market_stats(engine)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import hashlib
+import time
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+from typing import Any, Dict, List, Optional, Tuple
+from setup_database import Property
+from bulk_import import PROPERTY_FIELD_MAP, map_properties
+from csv_reader import iter_csv_chunks
+from mls_field_mapper import MLSFieldMapper
+
+# Mapped fields compared between the CSV and the properties table (list_number is the key)
+DIGEST_COLUMNS = [column for column in PROPERTY_FIELD_MAP if column != 'list_number']
+
+# Row digests are the first 60 bits of an MD5, so bucket sums fit PostgreSQL's bigint casts
+DIGEST_HEX = 15
+DIGEST_MOD = 1 << (4 * DIGEST_HEX)
+
+# Buckets are picked from the first 16 bits of MD5(list_number)
+BUCKET_HEX = 4
+
+SEPARATOR = '\x1f'
+
+def _canonical(props: pd.DataFrame) -> pd.Series:
+    """One string per row of the DIGEST_COLUMNS values, rendered the way _sql_canonical renders them.
+
+    Floats are compared in hundredths (prices to the cent) so the text form does
+    not depend on how either side prints floats.
+    """
+    parts = []
+    for name in DIGEST_COLUMNS:
+        column_type = Property.__table__.c[name].type
+        values = props[name] if name in props.columns else pd.Series(None, index=props.index, dtype=object)
+        missing = values.isna().to_numpy()
+        if isinstance(column_type, (sa.Float, sa.Integer)):
+            numbers = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+            numbers = numbers * 100 if isinstance(column_type, sa.Float) else numbers
+            missing |= np.isnan(numbers)
+            text = np.rint(np.where(missing, 0, numbers)).astype(np.int64).astype(str).astype(object)
+        elif isinstance(column_type, sa.Boolean):
+            text = np.where(values.astype('boolean').fillna(False).to_numpy(dtype=bool), '1', '0').astype(object)
+        elif isinstance(column_type, sa.DateTime):
+            dates = pd.to_datetime(values, errors='coerce')
+            missing |= dates.isna().to_numpy()
+            text = dates.dt.strftime('%Y-%m-%d %H:%M:%S').to_numpy(dtype=object)
+        else:
+            text = values.astype(object).astype(str).to_numpy()
+        text[missing] = ''
+        parts.append(text)
+
+    return pd.Series([SEPARATOR.join(row) for row in zip(*parts)], index=props.index, dtype=object)
+
+def _sql_canonical(dialect_name: str) -> str:
+    """SQL expression equivalent to _canonical for one properties row.
+
+    Only PostgreSQL is supported; reconcile streams other databases through
+    _canonical instead. The tests run it against the PostgreSQL database named by
+    TEST_DATABASE_URL, and are skipped when there is none.
+    """
+    if dialect_name != 'postgresql':
+        raise ValueError(f"unsupported dialect {dialect_name}")
+    parts = []
+    for name in DIGEST_COLUMNS:
+        column_type = Property.__table__.c[name].type
+        if isinstance(column_type, sa.Float):
+            part = f"round({name} * 100)::bigint::text"
+        elif isinstance(column_type, sa.Integer):
+            part = f"{name}::text"
+        elif isinstance(column_type, sa.Boolean):
+            part = f"CASE WHEN {name} THEN '1' WHEN NOT {name} THEN '0' END"
+        elif isinstance(column_type, sa.DateTime):
+            part = f"to_char({name}, 'YYYY-MM-DD HH24:MI:SS')"
+        else:
+            part = f"{name}::text"
+        parts.append(f"coalesce({part}, '')")
+    return " || chr(31) || ".join(parts)
+
+def row_digests(props: pd.DataFrame) -> pd.DataFrame:
+    """list_number, bucket and 60-bit content digest of mapped property rows"""
+    props = props[props['list_number'].notna()]
+    canonical = _canonical(props)
+    digests = [int(hashlib.md5(value.encode('utf-8')).hexdigest()[:DIGEST_HEX], 16) for value in canonical]
+    keys = [int(hashlib.md5(key.encode('utf-8')).hexdigest()[:BUCKET_HEX], 16) for key in props['list_number']]
+    return pd.DataFrame({
+        'list_number': props['list_number'].to_numpy(),
+        'key_hash': np.array(keys, dtype=np.int64),
+        'digest': np.array(digests, dtype=np.uint64)
+    })
+
+def _with_buckets(digests: pd.DataFrame, buckets: int) -> pd.DataFrame:
+    return digests.assign(bucket=digests['key_hash'] % buckets)
+
+def bucket_summary(digests: pd.DataFrame) -> pd.DataFrame:
+    """Order-independent (rows, digest sum) per bucket; equal summaries mean equal buckets"""
+    grouped = digests.groupby('bucket')
+    summary = pd.DataFrame({
+        'rows': grouped.size(),
+        # uint64 addition wraps mod 2^64, a multiple of DIGEST_MOD
+        'digest_sum': grouped['digest'].sum().astype(np.uint64) % np.uint64(DIGEST_MOD)
+    })
+    return summary
+
+def csv_digests(csv_path: str, chunksize: int = 100000, encoding: Optional[str] = None) -> pd.DataFrame:
+    """Row digests of a raw MLS CSV, mapped chunk by chunk as on import (last duplicate wins)"""
+    mapper = MLSFieldMapper()
+    frames = [row_digests(map_properties(mapper.process_dataframe(chunk)))
+              for chunk in iter_csv_chunks(csv_path, chunksize=chunksize, encoding=encoding)]
+    if not frames:
+        return row_digests(map_properties(pd.DataFrame(columns=['List Number'])))
+    digests = pd.concat(frames, ignore_index=True)
+    return digests.drop_duplicates('list_number', keep='last').reset_index(drop=True)
+
+def _pg_bucket_sql(buckets: int) -> Tuple[str, str]:
+    """Bucket and row digest SQL expressions matching _with_buckets and row_digests"""
+    bucket = f"(('x' || substr(md5(list_number), 1, {BUCKET_HEX}))::bit({4 * BUCKET_HEX})::int % {buckets})"
+    digest = f"('x' || substr(md5({_sql_canonical('postgresql')}), 1, {DIGEST_HEX}))::bit({4 * DIGEST_HEX})::bigint"
+    return bucket, digest
+
+def db_bucket_summary(conn, buckets: int) -> pd.DataFrame:
+    """Bucket summary of the properties table computed by PostgreSQL"""
+    bucket, digest = _pg_bucket_sql(buckets)
+    query = sa.text(f"""
+        SELECT {bucket} AS bucket, COUNT(*) AS rows, SUM({digest}) % {DIGEST_MOD} AS digest_sum
+        FROM properties
+        WHERE list_number IS NOT NULL
+        GROUP BY 1
+    """)
+    summary = pd.read_sql(query, conn).set_index('bucket')
+    summary['digest_sum'] = summary['digest_sum'].astype(object).map(int).astype(np.uint64)
+    return summary
+
+def db_bucket_digests(conn, buckets: int, selected: List[int]) -> pd.DataFrame:
+    """Row digests of the listings in the selected buckets, computed by PostgreSQL"""
+    bucket, digest = _pg_bucket_sql(buckets)
+    query = sa.text(f"""
+        SELECT list_number, {bucket} AS bucket, {digest} AS digest
+        FROM properties
+        WHERE list_number IS NOT NULL AND {bucket} = ANY(:buckets)
+    """)
+    digests = pd.read_sql(query, conn, params={'buckets': [int(value) for value in selected]})
+    digests['digest'] = digests['digest'].astype(np.uint64)
+    return digests
+
+def db_digests(conn, batch_size: int = 100000) -> pd.DataFrame:
+    """Row digests of the whole properties table, streamed in batches (dialects without md5)"""
+    columns = [Property.__table__.c[name] for name in ['list_number'] + DIGEST_COLUMNS]
+    result = conn.execution_options(yield_per=batch_size).execute(
+        sa.select(*columns).where(Property.list_number.isnot(None))
+    )
+    frames = [row_digests(pd.DataFrame(rows, columns=list(result.keys())))
+              for rows in result.partitions()]
+    if not frames:
+        return row_digests(pd.DataFrame(columns=['list_number'] + DIGEST_COLUMNS))
+    return pd.concat(frames, ignore_index=True)
+
+def _diff_rows(csv: pd.DataFrame, db: pd.DataFrame) -> Dict[str, List[str]]:
+    merged = csv[['list_number', 'digest']].merge(
+        db[['list_number', 'digest']], on='list_number', how='outer',
+        suffixes=('_csv', '_db'), indicator=True
+    )
+    both = merged[merged['_merge'] == 'both']
+    return {
+        'missing': sorted(merged.loc[merged['_merge'] == 'left_only', 'list_number']),
+        'extra': sorted(merged.loc[merged['_merge'] == 'right_only', 'list_number']),
+        'changed': sorted(both.loc[both['digest_csv'] != both['digest_db'], 'list_number'])
+    }
+
+def reconcile(csv_path: str, engine, buckets: int = 1024, chunksize: int = 100000,
+              encoding: Optional[str] = None) -> Dict[str, Any]:
+    """Compare a CSV with the properties table by per-row digests of the mapped fields.
+
+    Both sides are reduced to per-bucket (rows, digest sum) summaries first; only
+    buckets whose summaries differ are compared row by row. On PostgreSQL the
+    digests and summaries are computed in the database, so only the mismatched
+    buckets' (list_number, digest) pairs are transferred. Other databases are
+    streamed through the same digest in Python.
+
+    Returns:
+        Dict with missing (in CSV, not in DB), extra (in DB, not in CSV) and
+        changed list numbers, plus row and bucket counts
+    """
+    start = time.perf_counter()
+    csv = _with_buckets(csv_digests(csv_path, chunksize, encoding), buckets)
+    csv_summary = bucket_summary(csv)
+
+    with engine.connect() as conn:
+        if conn.dialect.name == 'postgresql':
+            db_summary = db_bucket_summary(conn, buckets)
+            db = None
+        else:
+            db = _with_buckets(db_digests(conn, chunksize), buckets)
+            db_summary = bucket_summary(db)
+
+        summaries = csv_summary.join(db_summary, how='outer', lsuffix='_csv', rsuffix='_db')
+        mismatched = summaries[
+            (summaries['rows_csv'] != summaries['rows_db'])
+            | (summaries['digest_sum_csv'] != summaries['digest_sum_db'])
+        ].index.tolist()
+
+        if db is None:
+            db = db_bucket_digests(conn, buckets, mismatched) if mismatched else csv.iloc[0:0]
+        else:
+            db = db[db['bucket'].isin(mismatched)]
+
+    diff = _diff_rows(csv[csv['bucket'].isin(mismatched)], db)
+    result = {
+        'csv_rows': len(csv),
+        'db_rows': int(db_summary['rows'].sum()) if len(db_summary) else 0,
+        'buckets': buckets,
+        'mismatched_buckets': len(mismatched),
+        **diff,
+        'seconds': time.perf_counter() - start
+    }
+    print(f"Reconciled {result['csv_rows']} CSV rows with {result['db_rows']} listings in "
+          f"{result['seconds']:.2f}s: {len(diff['missing'])} missing, {len(diff['extra'])} extra, "
+          f"{len(diff['changed'])} changed ({len(mismatched)}/{buckets} buckets differ)")
+    return result
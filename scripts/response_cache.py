@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+RESPONSE_CACHE_DB = os.path.join('data', 'response_cache.db')
+
+# Cached responses older than this are requested again (listing text changes make new keys anyway)
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+
+# Least recently used responses beyond this many are evicted
+MAX_ENTRIES = 50000
+
+CREATE_RESPONSES = '''
+    CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        response TEXT,
+        input_tokens INTEGER,
+        output_tokens INTEGER,
+        created_at REAL,
+        last_used REAL
+    )
+'''
+
+CREATE_LAST_USED_INDEX = 'CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)'
+
+SELECT_RESPONSE = 'SELECT response, input_tokens, output_tokens, created_at FROM responses WHERE key = ?'
+
+TOUCH_RESPONSE = 'UPDATE responses SET last_used = ? WHERE key = ?'
+
+DELETE_RESPONSE = 'DELETE FROM responses WHERE key = ?'
+
+INSERT_RESPONSE = '''
+    INSERT OR REPLACE INTO responses (key, response, input_tokens, output_tokens, created_at, last_used)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+DELETE_EXPIRED = 'DELETE FROM responses WHERE created_at < ?'
+
+DELETE_LEAST_RECENT = '''
+    DELETE FROM responses WHERE key IN (
+        SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?
+    )
+'''
+
+def cache_key(model: str, max_tokens: int, temperature: float, system: Optional[str], prompt: str) -> str:
+    """Hash of everything that determines a single-turn response"""
+    request = json.dumps([model, max_tokens, temperature, system or '', prompt])
+    return hashlib.sha256(request.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """Model responses stored in SQLite by cache_key.
+
+    Entries expire ttl_seconds after they were written, and once there are more
+    than max_entries the least recently used are evicted. hits, misses and
+    evictions count this instance's lookups.
+    """
+
+    def __init__(self, path: str = RESPONSE_CACHE_DB, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(CREATE_RESPONSES)
+        self.conn.execute(CREATE_LAST_USED_INDEX)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached response (response, input_tokens, output_tokens) or None"""
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(SELECT_RESPONSE, (key,)).fetchone()
+            if row is not None and row[3] < now - self.ttl_seconds:
+                self.conn.execute(DELETE_RESPONSE, (key,))
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute(TOUCH_RESPONSE, (now, key))
+            self.hits += 1
+        return {'response': row[0], 'input_tokens': row[1], 'output_tokens': row[2]}
+
+    def put(self, key: str, response: str, input_tokens: Optional[int] = None,
+            output_tokens: Optional[int] = None):
+        now = time.time()
+        with self._lock:
+            self.conn.execute('BEGIN')
+            try:
+                self.conn.execute(INSERT_RESPONSE, (key, response, input_tokens, output_tokens, now, now))
+                evicted = self.conn.execute(DELETE_EXPIRED, (now - self.ttl_seconds,)).rowcount
+                evicted += self.conn.execute(DELETE_LEAST_RECENT, (self.max_entries,)).rowcount
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.evictions += evicted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self.conn.execute('SELECT count(*) FROM responses').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': entries,
+                'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
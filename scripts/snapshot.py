@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import time
+import pyarrow as pa
+import pyarrow.parquet as pq
+import sqlalchemy as sa
+from datetime import datetime
+from sqlalchemy.dialects import postgresql, sqlite
+from typing import Dict, List, Optional
+from setup_database import Base, Property, PropertyFeature
+from database import get_engine
+
+SNAPSHOT_DIR = os.path.join('data', 'snapshots')
+
+# Restore order (parents first)
+SNAPSHOT_TABLES = ['feature_categories', 'features', 'properties', 'property_features']
+
+def _arrow_type(column_type) -> pa.DataType:
+    """Arrow type that preserves the SQLAlchemy column type"""
+    if isinstance(column_type, sa.Boolean):
+        return pa.bool_()
+    if isinstance(column_type, sa.Integer):
+        return pa.int64()
+    if isinstance(column_type, sa.Float):
+        return pa.float64()
+    if isinstance(column_type, sa.DateTime):
+        return pa.timestamp('us')
+    return pa.string()
+
+def _arrow_schema(table: sa.Table) -> pa.Schema:
+    return pa.schema([(column.name, _arrow_type(column.type)) for column in table.columns])
+
+def _changed_query(table: sa.Table, since: Optional[datetime]):
+    """Rows of a table to snapshot; everything when since is None"""
+    query = sa.select(table)
+    if since is None or table.name in ('feature_categories', 'features'):
+        # Lookup tables are small and referenced by id, so they are always copied whole
+        return query.order_by(table.c.id)
+    if table.name == 'properties':
+        return query.where(Property.updated_at >= since).order_by(table.c.id)
+    changed = sa.select(Property.id).where(Property.updated_at >= since)
+    return query.where(PropertyFeature.property_id.in_(changed)).order_by(table.c.id)
+
+def _write_table(conn, table: sa.Table, path: str, since: Optional[datetime],
+                 batch_size: int, compression: str) -> int:
+    """Stream a table through a server-side cursor into a Parquet file"""
+    schema = _arrow_schema(table)
+    result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+        _changed_query(table, since)
+    )
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression=compression) as writer:
+        for partition in result.partitions():
+            columns = list(zip(*partition))
+            arrays = [pa.array(values, type=field.type) for values, field in zip(columns, schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(partition)
+    return rows
+
+def list_snapshots(snapshot_dir: str = SNAPSHOT_DIR) -> List[str]:
+    """Snapshot directories, oldest first"""
+    if not os.path.isdir(snapshot_dir):
+        return []
+    names = sorted(
+        name for name in os.listdir(snapshot_dir)
+        if os.path.exists(os.path.join(snapshot_dir, name, 'manifest.json'))
+    )
+    return [os.path.join(snapshot_dir, name) for name in names]
+
+def read_manifest(snapshot_path: str) -> Dict:
+    with open(os.path.join(snapshot_path, 'manifest.json')) as f:
+        return json.load(f)
+
+def create_snapshot(engine, snapshot_dir: str = SNAPSHOT_DIR, incremental: bool = True,
+                    batch_size: int = 50000, compression: str = 'zstd') -> str:
+    """Snapshot the listing tables into compressed Parquet files.
+
+    With incremental=True and an earlier snapshot present, only properties updated
+    since that snapshot (and their property_features) are written; the manifest
+    points at the previous snapshot so restore can replay the chain. Deleted
+    listings are not tracked by incremental snapshots.
+
+    Returns:
+        Path of the snapshot directory
+    """
+    previous = list_snapshots(snapshot_dir)
+    base = previous[-1] if incremental and previous else None
+    since = datetime.fromisoformat(read_manifest(base)['taken_at']) if base else None
+
+    # Taken before reading so rows updated while the snapshot runs land in the next one
+    taken_at = datetime.now()
+    snapshot_path = os.path.join(snapshot_dir, taken_at.strftime('%Y%m%d_%H%M%S_%f'))
+    os.makedirs(snapshot_path)
+
+    start = time.perf_counter()
+    counts = {}
+    with engine.connect() as conn:
+        for name in SNAPSHOT_TABLES:
+            table = Base.metadata.tables[name]
+            path = os.path.join(snapshot_path, f'{name}.parquet')
+            counts[name] = _write_table(conn, table, path, since, batch_size, compression)
+
+    manifest = {
+        'taken_at': taken_at.isoformat(),
+        'base': os.path.basename(base) if base else None,
+        'since': since.isoformat() if since else None,
+        'tables': counts
+    }
+    with open(os.path.join(snapshot_path, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    kind = 'incremental' if base else 'full'
+    print(f"Created {kind} snapshot {snapshot_path} in {time.perf_counter() - start:.2f}s: "
+          + ', '.join(f"{name}={count}" for name, count in counts.items()))
+    return snapshot_path
+
+def _upsert(conn, table: sa.Table, rows: List[Dict]):
+    """Insert rows, replacing any with the same id"""
+    dialect = conn.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+        updates = {column.name: insert.excluded[column.name] for column in table.columns if column.name != 'id'}
+        conn.execute(insert.on_conflict_do_update(index_elements=['id'], set_=updates), rows)
+    else:
+        conn.execute(table.delete().where(table.c.id.in_([row['id'] for row in rows])))
+        conn.execute(table.insert(), rows)
+
+def _snapshot_chain(snapshot_path: str) -> List[str]:
+    """The full snapshot followed by the incremental ones leading to snapshot_path"""
+    chain = [snapshot_path]
+    manifest = read_manifest(snapshot_path)
+    while manifest['base']:
+        chain.insert(0, os.path.join(os.path.dirname(snapshot_path), manifest['base']))
+        manifest = read_manifest(chain[0])
+    return chain
+
+def restore_snapshot(engine, snapshot_path: str, batch_size: int = 50000):
+    """Replace the listing tables with the state captured by a snapshot"""
+    chain = _snapshot_chain(snapshot_path)
+    start = time.perf_counter()
+
+    with engine.begin() as conn:
+        for name in reversed(SNAPSHOT_TABLES):
+            conn.execute(Base.metadata.tables[name].delete())
+
+        features = Base.metadata.tables['property_features']
+        for index, path in enumerate(chain):
+            for name in SNAPSHOT_TABLES:
+                table = Base.metadata.tables[name]
+                parquet = pq.ParquetFile(os.path.join(path, f'{name}.parquet'))
+                for batch in parquet.iter_batches(batch_size=batch_size):
+                    rows = batch.to_pylist()
+                    if name == 'properties' and index > 0:
+                        # An incremental snapshot carries the complete feature set of each changed
+                        # property, which may be empty, so their earlier features are dropped first
+                        property_ids = [row['id'] for row in rows]
+                        conn.execute(features.delete().where(features.c.property_id.in_(property_ids)))
+                    _upsert(conn, table, rows)
+
+        if conn.dialect.name == 'postgresql':
+            for name in SNAPSHOT_TABLES:
+                conn.execute(sa.text(
+                    f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {name}), 0) + 1, false)"
+                ))
+
+    print(f"Restored {snapshot_path} ({len(chain)} snapshot(s)) in {time.perf_counter() - start:.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot or restore the listing tables")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    create = subparsers.add_parser('create', help="Take a snapshot")
+    create.add_argument('--full', action='store_true', help="Snapshot every row, not just changes")
+    restore = subparsers.add_parser('restore', help="Restore a snapshot")
+    restore.add_argument('snapshot', help="Snapshot directory (defaults to the latest)", nargs='?')
+    subparsers.add_parser('list', help="List snapshots")
+    args = parser.parse_args()
+
+    engine = get_engine()
+
+    if args.command == 'create':
+        create_snapshot(engine, incremental=not args.full)
+    elif args.command == 'restore':
+        snapshots = list_snapshots()
+        snapshot = args.snapshot or (snapshots[-1] if snapshots else None)
+        if not snapshot:
+            print("No snapshots found")
+            return
+        restore_snapshot(engine, snapshot)
+    else:
+        for path in list_snapshots():
+            manifest = read_manifest(path)
+            kind = f"incremental on {manifest['base']}" if manifest['base'] else 'full'
+            print(f"{path}: {kind}, {manifest['tables']}")
+
+if __name__ == "__main__":
+    main()
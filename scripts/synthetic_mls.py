@@ -0,0 +1,113 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+PROPERTY_TYPE_VALUES = ['Casa', 'Departamento', 'Condo', 'Terreno', 'Local Comercial', 'House', 'Lot']
+STATE_VALUES = ['Jalisco', 'Nayarit', 'Quintana Roo', 'Baja California Sur', 'Guanajuato']
+FURNISHED_VALUES = ['Yes', 'No', 'Sí', 'no', 'Partially', '']
+COMMUNITY_VALUES = ['Bucerías', 'La Peñita', 'San Pancho', 'Sayulita', 'Nuevo Vallarta',
+                    'Zona Romántica', 'Versalles', 'Marina Vallarta', 'Conchas Chinas', 'El Tigre']
+AGENT_NAMES = ['José Núñez', 'María Peña', 'Ana López', 'Raúl Gómez', 'Sofía Ibáñez',
+               'John Smith', 'Lucía Martínez', 'Andrés Muñoz']
+
+# category -> (feature names, values) used for the Features column
+FEATURE_CATALOG = {
+    'Interior': (['Amueblado', 'Air Conditioning', 'Ceiling Fans', 'Walk-in Closet', 'Cocina Integral'],
+                 ['Yes', 'Sí', 'Partial']),
+    'Exterior': (['Pool', 'Garden', 'Terraza', 'Roof Deck', 'Palapa'], ['Yes', 'Private', 'Shared']),
+    'Views': (['Ocean View', 'Mountain View', 'Vista a la Bahía', 'City View'], ['Yes', 'Partial']),
+    'Amenities': (['Gym', 'Seguridad 24h', 'Elevator', 'Parking', 'Beach Club'], ['Yes', 'On site']),
+    'Utilities': (['Solar Panels', 'Cisterna', 'Gas Estacionario', 'Internet'], ['Yes', 'No'])
+}
+
+# Supported file encodings; all of them can represent the accented Spanish text above
+ENCODINGS = ['utf-8', 'latin1', 'cp1252']
+
+def _pick(rng, values, rows: int, missing: float = 0.0) -> np.ndarray:
+    picked = np.asarray(values, dtype=object)[rng.integers(len(values), size=rows)]
+    if missing:
+        picked[rng.random(rows) < missing] = None
+    return picked
+
+def _feature_strings(rng, count: int) -> np.ndarray:
+    """count distinct-ish 'category|name|value;...' strings to sample rows from"""
+    tokens = [f"{category}|{name}|{value}"
+              for category, (names, values) in FEATURE_CATALOG.items()
+              for name in names for value in values]
+    strings = []
+    for _ in range(count):
+        chosen = rng.choice(len(tokens), size=rng.integers(1, 8), replace=False)
+        strings.append(';'.join(tokens[i] for i in sorted(chosen)))
+    return np.array(strings, dtype=object)
+
+def synthetic_mls_frame(rows: int, seed_value: int = 42) -> pd.DataFrame:
+    """Deterministic raw MLS export rows in the formats MLSFieldMapper and import_data expect"""
+    rng = np.random.default_rng(seed_value)
+
+    # Formatted strings are built for the distinct values and indexed, as real exports repeat them
+    price_steps = np.arange(50, 5000) * 1000
+    price_text = np.array([f"${price:,.0f}" for price in price_steps], dtype=object)
+    price_text[::7] = [f"{price:,.0f} MXN" for price in price_steps[::7]]
+    current = rng.integers(len(price_steps), size=rows)
+    initial = np.minimum(current + rng.integers(0, 50, size=rows), len(price_steps) - 1)
+
+    sizes = np.arange(30, 800)
+    size_text = np.array([f"{size} m2" for size in sizes], dtype=object)
+    size_text[::3] = [f"{size * 10.7639:,.0f} sq ft" for size in sizes[::3]]
+
+    start = datetime(2019, 1, 1)
+    dates = pd.date_range(start, periods=6 * 365, freq='D')
+    date_text = np.array(dates.strftime('%Y-%m-%d'), dtype=object)
+    date_text[::5] = dates[::5].strftime('%m/%d/%Y')
+
+    return pd.DataFrame({
+        'List Number': (1000000 + np.arange(rows)).astype(str),
+        'Agency Name': _pick(rng, [f"Agency {i}" for i in range(200)], rows),
+        'Agency Phone': _pick(rng, [f"+52 322 {i:03d} {i * 7 % 10000:04d}" for i in range(200)], rows),
+        'Listing Agent': _pick(rng, AGENT_NAMES, rows),
+        'Status': _pick(rng, ['Active', 'Sold', 'Pending', 'Expired'], rows),
+        'Days on Market': rng.integers(0, 720, size=rows),
+        'Area': _pick(rng, [f"Area {i}" for i in range(40)], rows),
+        'Community': _pick(rng, COMMUNITY_VALUES, rows, missing=0.1),
+        'Property Type': _pick(rng, PROPERTY_TYPE_VALUES, rows),
+        'List Date': _pick(rng, date_text, rows, missing=0.02),
+        'Original List Price': price_text[initial],
+        'List Price': price_text[current],
+        'Sold Price': _pick(rng, price_text, rows, missing=0.7),
+        'Development Name': _pick(rng, [f"Development {i}" for i in range(500)], rows, missing=0.4),
+        'State': _pick(rng, STATE_VALUES, rows),
+        'Construction': _pick(rng, size_text, rows, missing=0.1),
+        'Lot Size': _pick(rng, ['10x20', '15x30', '20x40', '12.5x25'], rows, missing=0.3),
+        'Half Baths': _pick(rng, ['0', '1', '2', '1.0'], rows, missing=0.2),
+        'Floor Number': _pick(rng, [str(i) for i in range(1, 20)], rows, missing=0.5),
+        'Furnished': _pick(rng, FURNISHED_VALUES, rows, missing=0.2),
+        'Features': _pick(rng, _feature_strings(rng, 5000), rows, missing=0.15)
+    })
+
+def write_mls_csv(path: str, rows: int, seed_value: int = 42, encoding: str = 'utf-8',
+                  chunksize: int = 200000) -> str:
+    """Write a synthetic MLS CSV in chunks; the same arguments always produce the same file"""
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unsupported encoding {encoding}; use one of {ENCODINGS}")
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding=encoding, newline='') as f:
+        for part, start in enumerate(range(0, rows, chunksize)):
+            frame = synthetic_mls_frame(min(chunksize, rows - start), seed_value + part)
+            frame['List Number'] = (1000000 + start + np.arange(len(frame))).astype(str)
+            frame.to_csv(f, index=False, header=part == 0)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic MLS CSV")
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--encoding', default='utf-8', choices=ENCODINGS)
+    args = parser.parse_args()
+    write_mls_csv(args.path, args.rows, args.seed, args.encoding)
+    print(f"Wrote {args.rows} synthetic listings to {args.path} ({args.encoding})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from setup_database import Base, Property
+from analytics_queries import listing_columns, build_listings_query
+from listing_schema import apply_schema, read_listings
+from market_aggregates import ALL, compute_market_stats
+from snapshot import create_snapshot
+from duckdb_analytics import SnapshotAnalytics, duckdb
+
+def listings_engine():
+    """In-memory database with a few listings covering the query filters"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        Property(list_number='1', area="O'Brien", property_type='House',
+                 current_price=100000.0, begin_date=datetime(2023, 3, 15)),
+        Property(list_number='2', area='South', property_type='House',
+                 current_price=200000.0, begin_date=datetime(2024, 11, 1)),
+        Property(list_number='3', area='South', property_type='House',
+                 current_price=0.0, begin_date=datetime(2024, 5, 1)),
+        Property(list_number='4', area='South', property_type='Condo',
+                 current_price=300000.0, begin_date=None)
+    ])
+    session.commit()
+    session.close()
+    return engine
+
+class TestListingsQuery(unittest.TestCase):
+    def setUp(self):
+        self.engine = listings_engine()
+
+    def test_unknown_columns_skipped(self):
+        """Columns the table does not have are dropped, duplicates once"""
+        columns = listing_columns(['area', 'total_bedrooms', 'current_price', 'area'])
+        self.assertEqual(columns, ['area', 'current_price'])
+
+    def test_filters_are_bound(self):
+        """Filter values are parameters, not SQL text"""
+        query = build_listings_query(['area'], area="O'Brien", property_type='House')
+        self.assertNotIn("O'Brien", str(query))
+        df = pd.read_sql(query, self.engine)
+        self.assertEqual(list(df['area']), ["O'Brien"])
+
+    def test_date_parts_and_price_filter(self):
+        """Month and year come from the database; unpriced and undated listings are excluded"""
+        df = pd.read_sql(build_listings_query(['current_price'], area='South'), self.engine)
+        self.assertEqual(list(df.columns), ['current_price', 'month', 'year'])
+        self.assertEqual(df[['month', 'year']].values.tolist(), [[11, 2024]])
+
+    def test_read_listings_typed(self):
+        """Loaded listings use the compact Property schema"""
+        query = build_listings_query(['area', 'current_price', 'construction_ft2', 'begin_date'])
+        df = read_listings(query, self.engine, chunksize=1)
+        self.assertEqual(str(df['area'].dtype), 'category')
+        self.assertEqual(str(df['current_price'].dtype), 'float64')
+        self.assertEqual(str(df['construction_ft2'].dtype), 'float32')
+        self.assertEqual(str(df['month'].dtype), 'Int8')
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df['begin_date']))
+        self.assertEqual(sorted(df['area'].cat.categories), ["O'Brien", 'South'])
+
+    def test_apply_schema_coerces(self):
+        """Values that do not fit the target type become missing"""
+        df = apply_schema(pd.DataFrame({'half_bath': ['1', 'x', None], 'status': ['A', 'A', 'B']}))
+        self.assertEqual(str(df['half_bath'].dtype), 'Int8')
+        self.assertEqual(df['half_bath'].isna().tolist(), [False, True, True])
+        self.assertEqual(str(df['status'].dtype), 'category')
+
+@unittest.skipIf(duckdb is None, "duckdb is not installed")
+class TestSnapshotAnalytics(unittest.TestCase):
+    def setUp(self):
+        self.engine = listings_engine()
+        self.snapshot_dir = tempfile.mkdtemp()
+        create_snapshot(self.engine, self.snapshot_dir, incremental=False)
+        # A later incremental snapshot replaces the changed listing
+        with self.engine.begin() as conn:
+            conn.execute(Property.__table__.update().where(Property.list_number == '1')
+                         .values(current_price=150000.0, updated_at=datetime.now()))
+        create_snapshot(self.engine, self.snapshot_dir)
+        self.analytics = SnapshotAnalytics(snapshot_dir=self.snapshot_dir)
+
+    def tearDown(self):
+        self.analytics.close()
+        shutil.rmtree(self.snapshot_dir)
+
+    def test_listings_query_on_snapshot(self):
+        """The database listings query runs unchanged over the snapshot chain"""
+        query = build_listings_query(['list_number', 'current_price'])
+        df = self.analytics.read_listings(query)
+        self.assertEqual(sorted(df['list_number']), ['1', '2'])
+        self.assertEqual(df.set_index('list_number').loc['1', 'current_price'], 150000.0)
+        self.assertEqual(str(df['month'].dtype), 'Int8')
+
+    def test_market_stats_match_pandas(self):
+        """DuckDB aggregates equal compute_market_stats over the same listings"""
+        listings = pd.read_sql(build_listings_query(
+            ['area', 'property_type', 'begin_date', 'current_price', 'construction_ft2',
+             'construction_m2', 'days_on_market'], date_parts=False), self.engine)
+        expected = compute_market_stats(listings).sort_values(['area', 'property_type', 'month'])
+        actual = self.analytics.all_market_stats()
+        pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected.reset_index(drop=True),
+                                      check_dtype=False)
+        south = self.analytics.market_stats(area='South')
+        self.assertEqual(south['median_price'].tolist(), [200000.0])
+        self.assertEqual(len(actual[(actual['area'] == ALL) & (actual['property_type'] == ALL)]), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from sqlalchemy.orm import sessionmaker
+from setup_database import Base, Property, FeatureCategory, Feature, PropertyFeature
+from database import get_engine
+from batch_analytics import analyze_all_markets
+
+class TestAnalyzeAllMarkets(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        # The feature matrix cache is written under data/ in the working directory
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.engine = get_engine(f"sqlite:///{os.path.join(self.tmp.name, 'market.db')}")
+        Base.metadata.create_all(self.engine)
+
+        session = sessionmaker(bind=self.engine)()
+        session.add_all([FeatureCategory(id=1, name='Exterior'), Feature(id=10, category_id=1, name='Pool')])
+        markets = [('Centro', 'Casa', 24), ('Centro', 'Condo', 24), ('Norte', 'Casa', 3)]
+        for area, property_type, count in markets:
+            for i in range(count):
+                session.add(Property(
+                    list_number=f'{area}-{property_type}-{i}', area=area, property_type=property_type,
+                    current_price=100000.0 + 5000 * i, construction_ft2=1000.0 + 50 * i,
+                    begin_date=datetime(2023, 1 + i % 12, 1 + i),
+                    features=[PropertyFeature(feature_id=10, value='Yes')] if i % 2 else []
+                ))
+        session.commit()
+        session.close()
+
+    def tearDown(self):
+        self.engine.dispose()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_workers_use_the_given_engine(self):
+        """Worker processes read from the engine passed in, not the default database"""
+        results = analyze_all_markets(self.engine, max_workers=2, min_listings=20,
+                                      model_dir=os.path.join(self.tmp.name, 'models'))
+
+        self.assertEqual(results['errors'], [])
+        self.assertEqual([(market['area'], market['property_type'], market['listings'])
+                          for market in results['markets']],
+                         [('Centro', 'Casa', 24), ('Centro', 'Condo', 24)])
+        self.assertEqual(results['skipped'], [{'area': 'Norte', 'property_type': 'Casa', 'listings': 3}])
+        self.assertEqual(results['workers'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
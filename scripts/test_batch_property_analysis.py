@@ -0,0 +1,153 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import anthropic
+import httpx
+from batch_property_analysis import analyze_properties
+from response_cache import ResponseCache
+
+class StubAPI(ThreadingHTTPServer):
+    """Local stand-in for the Messages API: scripted error statuses, then canned answers"""
+
+    def __init__(self, errors=()):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.errors = list(errors)
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server = self.server
+        with server.lock:
+            server.requests.append(body)
+            status = server.errors.pop(0) if server.errors else 200
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(0.02)
+        with server.lock:
+            server.in_flight -= 1
+
+        if status == 200:
+            prompt = body['messages'][0]['content']
+            payload = {"id": "msg_1", "type": "message", "role": "assistant", "model": body['model'],
+                       "content": [{"type": "text", "text": f"Analysis of {prompt.split('Type: ')[1].split()[0]}"}],
+                       "stop_reason": "end_turn", "stop_sequence": None,
+                       "usage": {"input_tokens": 50, "output_tokens": 5}}
+        else:
+            payload = {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}}
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        if status == 429:
+            self.send_header('retry-after', '0')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def listings(count: int):
+    return [{'list_number': str(number), 'area': 'Centro', 'state': 'Jalisco',
+             'current_price': 1e6, 'property_type': f'Type{number}', 'features': 'Pool: Yes'}
+            for number in range(count)]
+
+class TestBatchPropertyAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.tmp.name, 'analyses.jsonl')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_batch(self, server, properties, **kwargs):
+        kwargs.setdefault('requests_per_minute', 6000)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        async def run():
+            client = anthropic.AsyncAnthropic(api_key='test', base_url=f'http://127.0.0.1:{server.server_port}',
+                                              max_retries=0, http_client=httpx.AsyncClient())
+            try:
+                return await analyze_properties(properties, client, self.checkpoint, backoff=0.01, **kwargs)
+            finally:
+                await client.close()
+        try:
+            return asyncio.run(run())
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def records(self):
+        with open(self.checkpoint) as f:
+            return [json.loads(line) for line in f]
+
+    def test_overload_retried_and_concurrency_bounded(self):
+        """429 and 529 responses are retried; no more than concurrency requests run at once"""
+        server = StubAPI(errors=[529, 429, 529])
+        counts = self.run_batch(server, listings(12), concurrency=3)
+        self.assertEqual(counts, {'analyzed': 12, 'skipped': 0, 'failed': 0, 'cached': 0})
+        self.assertEqual(len(server.requests), 15)
+        self.assertLessEqual(server.max_in_flight, 3)
+        analyses = {record['list_number']: record['analysis'] for record in self.records()}
+        self.assertEqual(analyses['7'], 'Analysis of Type7')
+
+    def test_resume_from_checkpoint(self):
+        """A second run only sends the listings without a stored analysis"""
+        counts = self.run_batch(StubAPI(errors=[400]), listings(4), concurrency=1)
+        self.assertEqual(counts, {'analyzed': 3, 'skipped': 0, 'failed': 1, 'cached': 0})
+
+        server = StubAPI()
+        counts = self.run_batch(server, listings(6), concurrency=2)
+        self.assertEqual(counts, {'analyzed': 3, 'skipped': 3, 'failed': 0, 'cached': 0})
+        self.assertEqual(sorted(request['messages'][0]['content'].split('Type: ')[1].split()[0]
+                                for request in server.requests), ['Type0', 'Type4', 'Type5'])
+
+    def test_changed_listing_resent_on_resume(self):
+        """A listing whose text changed since its stored analysis is analyzed again"""
+        self.run_batch(StubAPI(), listings(3), concurrency=2)
+
+        server = StubAPI()
+        changed = listings(3)
+        changed[1]['property_type'] = 'Casa'
+        counts = self.run_batch(server, changed, concurrency=2)
+        self.assertEqual(counts, {'analyzed': 1, 'skipped': 2, 'failed': 0, 'cached': 0})
+        self.assertEqual(len(server.requests), 1)
+        analyses = {record['list_number']: record['analysis'] for record in self.records()}
+        self.assertEqual(analyses['1'], 'Analysis of Casa')
+
+        # Rerunning the changed listings sends nothing
+        counts = self.run_batch(StubAPI(), changed, concurrency=2)
+        self.assertEqual(counts, {'analyzed': 0, 'skipped': 3, 'failed': 0, 'cached': 0})
+
+    def test_cached_responses_not_requested(self):
+        """Unchanged listings in a fresh run are answered from the response cache"""
+        cache = ResponseCache(os.path.join(self.tmp.name, 'cache.db'))
+        self.run_batch(StubAPI(), listings(3), concurrency=2, cache=cache)
+        self.checkpoint = os.path.join(self.tmp.name, 'fresh.jsonl')
+
+        server = StubAPI()
+        changed = listings(3)
+        changed[1]['current_price'] = 2e6
+        counts = self.run_batch(server, changed, concurrency=2, cache=cache)
+        self.assertEqual(counts, {'analyzed': 3, 'skipped': 0, 'failed': 0, 'cached': 2})
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+        cache.close()
+
+    def test_rate_limited(self):
+        """Requests are paced by the requests-per-minute bucket"""
+        start = time.perf_counter()
+        self.run_batch(StubAPI(), listings(4), concurrency=4, requests_per_minute=600)
+        # 10 per second with a one-request bucket: the fourth starts about 0.3s in
+        self.assertGreaterEqual(time.perf_counter() - start, 0.25)
+
+if __name__ == '__main__':
+    unittest.main()
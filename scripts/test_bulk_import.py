@@ -0,0 +1,254 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from setup_database import Base, Property, Feature, FeatureCategory, PropertyFeature
+from bulk_import import map_properties, bulk_upsert_properties, bulk_import_properties
+from feature_import import parse_features, import_features, FeatureDictionary
+from import_profiler import ImportProfiler
+from database import get_engine
+from import_data import bulk_import_data, import_data, stream_import_data
+
+class TestBulkImport(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+
+        # Processed MLS frame as produced by MLSFieldMapper.process_dataframe
+        self.df = pd.DataFrame({
+            'List Number': [101, 102, 103],
+            'Agency Name': ['Agency 1', 'Agency 2', 'Agency 3'],
+            'Status': ['Active', 'Sold', 'Active'],
+            'Area': ['North', 'South', 'East'],
+            'Days on Market': [10.0, None, 15.0],
+            'property_type': ['House', 'Condo', 'House'],
+            'current_price': [100000.0, 200000.0, 300000.0],
+            'construction_ft2': [1500.0, 1200.0, 1800.0],
+            'furnished': [True, False, None]
+        })
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_map_properties(self):
+        """Mapped frame uses Property column names and types"""
+        props = map_properties(self.df)
+        self.assertEqual(list(props['list_number']), ['101', '102', '103'])
+        self.assertEqual(str(props['days_on_market'].dtype), 'Int64')
+        self.assertTrue(props['agency_phone'].isna().all())
+
+    def test_insert_then_update(self):
+        """Second run updates existing listings instead of duplicating them"""
+        created, updated = bulk_upsert_properties(self.session, map_properties(self.df))
+        self.session.commit()
+        self.assertEqual((created, updated), (3, 0))
+
+        changed = self.df.copy()
+        changed.loc[0, 'current_price'] = 95000.0
+        changed.loc[3] = changed.loc[2]
+        changed.loc[3, 'List Number'] = 104
+        created, updated = bulk_upsert_properties(self.session, map_properties(changed))
+        self.session.commit()
+        self.assertEqual((created, updated), (1, 3))
+
+        self.assertEqual(self.session.query(Property).count(), 4)
+        prop = self.session.query(Property).filter_by(list_number='101').one()
+        self.assertEqual(prop.current_price, 95000.0)
+        self.assertIsNone(self.session.query(Property).filter_by(list_number='102').one().days_on_market)
+
+    def test_duplicate_and_missing_list_numbers(self):
+        """Last duplicate wins and rows without a list number are skipped"""
+        df = self.df.copy()
+        df.loc[1, 'List Number'] = 101
+        df.loc[2, 'List Number'] = None
+        created, updated = bulk_upsert_properties(self.session, map_properties(df))
+        self.session.commit()
+        self.assertEqual((created, updated), (1, 0))
+        self.assertEqual(self.session.query(Property).one().status, 'Sold')
+
+    def test_delta_skips_unchanged(self):
+        """Delta import only writes listings whose content hash changed"""
+        stats = bulk_import_properties(self.df, self.session, delta=True)
+        self.assertEqual((stats['created'], stats['unchanged']), (3, 0))
+        first = self.session.query(Property).filter_by(list_number='102').one().updated_at
+
+        changed = self.df.copy()
+        changed.loc[0, 'Status'] = 'Sold'
+        stats = bulk_import_properties(changed, self.session, delta=True)
+        self.assertEqual((stats['created'], stats['updated'], stats['unchanged']), (0, 1, 2))
+        self.assertEqual(stats['changed'], {'101'})
+        self.assertEqual(self.session.query(Property).filter_by(list_number='101').one().status, 'Sold')
+
+        # A full (non-delta) upsert keeps updated_at for listings whose content did not change
+        bulk_import_properties(changed, self.session)
+        self.assertEqual(self.session.query(Property).filter_by(list_number='102').one().updated_at, first)
+
+class TestFeatureImport(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+
+        self.df = pd.DataFrame({
+            'List Number': [101, 102, 103],
+            'Features': [
+                'Amenities|Pool|Yes;View|Ocean View|Yes',
+                'Amenities|Pool|No;bad token;Parking|Garage|2',
+                None
+            ]
+        })
+        bulk_upsert_properties(self.session, map_properties(self.df))
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_parse_features(self):
+        """Malformed tokens are dropped and parts are stripped"""
+        parsed = parse_features(self.df)
+        self.assertEqual(len(parsed), 4)
+        self.assertEqual(list(parsed['list_number']), ['101', '101', '102', '102'])
+        self.assertEqual(parsed.loc[3, 'value'], '2')
+
+    def test_import_features(self):
+        """Names are created once and features are replaced on re-import"""
+        stats = import_features(self.df, self.session)
+        self.session.commit()
+        self.assertEqual(stats, {'properties': 2, 'features': 4})
+        self.assertEqual(self.session.query(FeatureCategory).count(), 3)
+        self.assertEqual(self.session.query(Feature).count(), 3)
+
+        changed = self.df.copy()
+        changed.loc[0, 'Features'] = 'Amenities|Pool|No'
+        dictionary = FeatureDictionary(self.session)
+        import_features(changed, self.session, dictionary)
+        self.session.commit()
+
+        self.assertEqual(self.session.query(Feature).count(), 3)
+        prop = self.session.query(Property).filter_by(list_number='101').one()
+        values = [(pf.feature.name, pf.value) for pf in prop.features]
+        self.assertEqual(values, [('Pool', 'No')])
+        self.assertEqual(self.session.query(PropertyFeature).count(), 3)
+
+    def test_duplicate_list_numbers(self):
+        """Features of a repeated List Number come from its last row, like the property"""
+        df = pd.concat([self.df, pd.DataFrame({'List Number': [101], 'Features': ['Parking|Garage|1']})],
+                       ignore_index=True)
+        stats = import_features(df, self.session)
+        self.session.commit()
+        self.assertEqual(stats, {'properties': 2, 'features': 3})
+        prop = self.session.query(Property).filter_by(list_number='101').one()
+        self.assertEqual([(pf.feature.name, pf.value) for pf in prop.features], [('Garage', '1')])
+
+class TestCsvImportPaths(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmp.name, 'mls.csv')
+        # The blank List Number would make pandas read the column as floats
+        with open(self.csv_path, 'w') as f:
+            f.write('List Number,Status,Area\n101,Active,North\n102,Sold,South\n,Active,East\n')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def stored_keys(self, import_function):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        import_function(self.csv_path, session)
+        keys = sorted(prop.list_number for prop in session.query(Property))
+        session.close()
+        return keys
+
+    def test_blank_list_number(self):
+        """Whole-file and streamed imports store the same List Number keys"""
+        self.assertEqual(self.stored_keys(bulk_import_data), ['101', '102'])
+        self.assertEqual(self.stored_keys(stream_import_data), ['101', '102'])
+
+    def test_delta_rerun_after_failed_feature_write(self):
+        """A listing whose features failed to write is not skipped as unchanged by the next delta run"""
+        with open(self.csv_path, 'w') as f:
+            f.write('List Number,Status,Features\n101,Active,Amenities|Pool|Yes\n')
+        for import_function in (bulk_import_data, stream_import_data):
+            engine = create_engine("sqlite://")
+            Base.metadata.create_all(engine)
+            session = sessionmaker(bind=engine)()
+            session.execute(text("CREATE TRIGGER fail BEFORE INSERT ON property_features "
+                                 "BEGIN SELECT RAISE(ABORT, 'disk full'); END"))
+            session.commit()
+            with self.assertRaises(Exception):
+                import_function(self.csv_path, session, delta=True)
+            session.execute(text("DROP TRIGGER fail"))
+            session.commit()
+
+            stats = import_function(self.csv_path, session, delta=True)
+            self.assertEqual((stats['created'], stats['unchanged']), (1, 0))
+            prop = session.query(Property).filter_by(list_number='101').one()
+            self.assertEqual([(pf.feature.name, pf.value) for pf in prop.features], [('Pool', 'Yes')])
+            session.close()
+
+    def test_legacy_feature_change_moves_updated_at(self):
+        """A row-by-row reimport that only changes the features still marks the listing updated"""
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        updated = []
+        for value in ('Yes', 'No'):
+            with open(self.csv_path, 'w') as f:
+                f.write(f'List Number,Status,Features\n101,Active,Amenities|Pool|{value}\n')
+            import_data(self.csv_path, session)
+            prop = session.query(Property).filter_by(list_number='101').one()
+            updated.append(prop.updated_at)
+        self.assertGreater(updated[1], updated[0])
+        self.assertEqual([pf.value for pf in prop.features], ['No'])
+        session.close()
+
+    def test_legacy_import_matches_bulk(self):
+        """The row-by-row import stores the same fields, begin_date and blanks included"""
+        with open(self.csv_path, 'w') as f:
+            f.write('List Number,Status,List Date,Furnished,List Price\n'
+                    '101,Active,2024-03-05,Yes,"$100,000"\n102,Sold,,,\n')
+        stored = []
+        for import_function in (bulk_import_data, import_data):
+            engine = create_engine("sqlite://")
+            Base.metadata.create_all(engine)
+            session = sessionmaker(bind=engine)()
+            import_function(self.csv_path, session)
+            stored.append([(prop.list_number, prop.begin_date, prop.furnished, prop.current_price)
+                           for prop in session.query(Property).order_by(Property.list_number)])
+            session.close()
+        self.assertEqual(stored[1], stored[0])
+        self.assertEqual(stored[1][0], ('101', datetime(2024, 3, 5), True, 100000.0))
+        self.assertEqual(stored[1][1], ('102', None, None, None))
+
+class TestImportProfiler(unittest.TestCase):
+    def test_stages_and_report(self):
+        """Stages accumulate time, rows and round trips and are written as JSON"""
+        engine = get_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        profiler = ImportProfiler(engine)
+        df = pd.DataFrame({'List Number': [1, 2], 'current_price': [1.0, 2.0]})
+
+        bulk_import_properties(df, session, profiler=profiler)
+        bulk_import_properties(df, session, profiler=profiler)
+        session.close()
+
+        stage = profiler.report()['stages']['db_upsert']
+        self.assertEqual(stage['calls'], 2)
+        self.assertEqual(stage['rows'], 4)
+        self.assertGreater(stage['queries'], 0)
+        self.assertGreater(stage['peak_rss_mb'], 0)
+        self.assertIn('commit', profiler.stages)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(profiler.write(tmp)) as f:
+                self.assertEqual(json.load(f)['stages']['db_upsert']['rows'], 4)
+
+if __name__ == '__main__':
+    unittest.main()
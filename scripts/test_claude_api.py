@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from claude_api import ClaudeAPI
+
+class StubMessages:
+    """messages.create that records its arguments and answers with numbered replies"""
+
+    def __init__(self):
+        self.requests = []
+        self.error = None
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        if self.error:
+            raise self.error
+        return SimpleNamespace(content=[SimpleNamespace(text=f"Reply {len(self.requests)}")],
+                               usage=SimpleNamespace(input_tokens=50, output_tokens=7))
+
+class StubClient:
+    def __init__(self):
+        self.messages = StubMessages()
+
+    def count_tokens(self, text):
+        return len(text.split())
+
+class TestClaudeAPI(unittest.TestCase):
+    def setUp(self):
+        # The conversation store and response cache live under data/ in the working directory
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.client = StubClient()
+        self.api = ClaudeAPI(client=self.client)
+
+    def tearDown(self):
+        self.api.close()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_send_message(self):
+        """Requests carry the history and the system prompt only when given; exchanges are stored"""
+        conv_id = self.api.create_conversation(metadata={'type': 'test'})
+        self.assertEqual(self.api.send_message("Hello there", conv_id, system_prompt="Be brief"), "Reply 1")
+        self.assertEqual(self.api.send_message("And again", conv_id), "Reply 2")
+
+        first, second = self.client.messages.requests
+        self.assertEqual(first['system'], "Be brief")
+        self.assertEqual(first['messages'], [{'role': 'user', 'content': 'Hello there'}])
+        self.assertNotIn('system', second)
+        self.assertEqual([message['content'] for message in second['messages']],
+                         ['Hello there', 'Reply 1', 'And again'])
+        self.assertEqual(second['temperature'], 0.7)
+
+        # User messages are counted locally, replies take the usage the response reports
+        history = self.api.get_conversation_history(conv_id)
+        self.assertEqual([(m['role'], m['content'], m['tokens']) for m in history], [
+            ('user', 'Hello there', 2), ('assistant', 'Reply 1', 7),
+            ('user', 'And again', 2), ('assistant', 'Reply 2', 7)
+        ])
+        self.assertIsNotNone(self.api.last_response)
+
+    def test_send_message_error(self):
+        """A failed request returns the error text and stores nothing"""
+        conv_id = self.api.create_conversation()
+        self.client.messages.error = RuntimeError("overloaded")
+        self.assertEqual(self.api.send_message("Hello", conv_id), "Error sending message: overloaded")
+        self.assertIsNone(self.api.last_response)
+        self.assertEqual(self.api.get_conversation_history(conv_id), [])
+
+    def test_analyze_property_cached_only_on_success(self):
+        """An analysis is cached only when send_message returned the model's text"""
+        listing = {'list_number': '101', 'area': 'Centro', 'state': 'Jalisco',
+                   'current_price': 1e6, 'property_type': 'Casa', 'features': 'Pool: Yes'}
+        self.api.store.conn.execute("CREATE TRIGGER fail BEFORE INSERT ON messages "
+                                    "BEGIN SELECT RAISE(ABORT, 'disk full'); END")
+        result = self.api.analyze_property(listing)
+        self.assertEqual(result['analysis'], "Error sending message: disk full")
+        self.assertIsNone(self.api.last_response)
+        self.assertEqual(self.api.response_cache.stats()['entries'], 0)
+
+        self.api.store.conn.execute("DROP TRIGGER fail")
+        result = self.api.analyze_property(listing)
+        self.assertEqual((result['analysis'], result['cached']), ("Reply 2", False))
+        result = self.api.analyze_property(listing)
+        self.assertEqual((result['analysis'], result['cached']), ("Reply 2", True))
+        self.assertEqual(len(self.client.messages.requests), 2)
+
+if __name__ == '__main__':
+    unittest.main()
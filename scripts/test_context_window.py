@@ -0,0 +1,53 @@
+import unittest
+from context_window import ContextWindow, TokenCounter, estimate_tokens
+
+def exchange(turns: int, tokens: int = 10):
+    history = []
+    for turn in range(turns):
+        history.append({'role': 'user', 'content': f'question {turn}', 'tokens': tokens})
+        history.append({'role': 'assistant', 'content': f'answer {turn}', 'tokens': tokens})
+    return history
+
+class TestContextWindow(unittest.TestCase):
+    def setUp(self):
+        self.counted = []
+        def count(text):
+            self.counted.append(text)
+            return len(text.split())
+        self.counter = TokenCounter(count)
+
+    def test_counts_cached(self):
+        """Each distinct text is tokenized once; stored counts are not recounted"""
+        self.assertEqual(self.counter.count('three word text'), 3)
+        self.assertEqual(self.counter.count('three word text'), 3)
+        self.assertEqual(self.counter.message_tokens({'content': 'x y', 'tokens': 7}), 7)
+        self.assertEqual(self.counter.message_tokens({'content': 'x y', 'tokens': 0}), 2)
+        self.assertEqual(self.counted, ['three word text', 'x y'])
+
+    def test_estimate_fallback(self):
+        """A failing tokenizer falls back to the character estimate"""
+        def broken(text):
+            raise RuntimeError('no tokenizer')
+        counter = TokenCounter(broken)
+        self.assertEqual(counter.count('a' * 10), estimate_tokens('a' * 10))
+        self.assertEqual(estimate_tokens('a' * 10), 3)
+
+    def test_newest_history_within_budget(self):
+        """Only the newest turns that fit are sent, starting with a user turn"""
+        window = ContextWindow(max_tokens=37, counter=self.counter)
+        messages, dropped = window.fit(exchange(5), 'new question', 'be brief')
+        # 37 - 2 (message) - 2 (system) leaves room for three stored messages, the oldest an answer
+        self.assertEqual(dropped, 8)
+        self.assertEqual([msg['content'] for msg in messages], ['question 4', 'answer 4', 'new question'])
+        self.assertEqual(set(messages[0]), {'role', 'content'})
+
+    def test_cost_independent_of_length(self):
+        """A long conversation sends no more than a short one once the budget is full"""
+        window = ContextWindow(max_tokens=100, counter=self.counter)
+        short, _ = window.fit(exchange(20), 'next')
+        long, dropped = window.fit(exchange(2000), 'next')
+        self.assertEqual(len(short), len(long))
+        self.assertEqual(dropped, 4000 - len(long) + 1)
+
+if __name__ == '__main__':
+    unittest.main()
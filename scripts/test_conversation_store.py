@@ -0,0 +1,78 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from conversation_store import ConversationStore
+
+class TestConversationStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'conversations.db')
+        self.store = ConversationStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_exchange_in_order(self):
+        """A user/assistant pair is stored together and read back in insertion order"""
+        self.store.create_conversation('conv_1', {'type': 'test'})
+        self.store.add_messages('conv_1', [('user', 'Hi', 1), ('assistant', 'Hello', 2)])
+        self.store.add_message('conv_1', 'user', 'Bye', 1)
+        history = self.store.history('conv_1')
+        self.assertEqual([(m['role'], m['content'], m['tokens']) for m in history],
+                         [('user', 'Hi', 1), ('assistant', 'Hello', 2), ('user', 'Bye', 1)])
+
+        # A second store (another process) sees the same rows from disk
+        other = ConversationStore(self.path)
+        self.assertEqual(other.history('conv_1'), history)
+        other.close()
+
+    def test_history_cached(self):
+        """History is read from disk once, then kept up to date in memory"""
+        self.store.create_conversation('conv_1')
+        self.store.add_messages('conv_1', [('user', 'Hi', 1), ('assistant', 'Hello', 2)])
+        self.store._histories.clear()
+        self.store.history('conv_1')
+
+        queries = []
+        self.store.conn.set_trace_callback(queries.append)
+        self.store.add_messages('conv_1', [('user', 'More', 1), ('assistant', 'Sure', 1)])
+        history = self.store.history('conv_1')
+        self.assertEqual(len(history), 4)
+        # Only the newest message id is checked, the history itself is not read again
+        self.assertFalse([query for query in queries if 'SELECT id, role' in query])
+        history.append({})
+        self.assertEqual(len(self.store.history('conv_1')), 4)
+
+    def test_other_writer(self):
+        """Messages another store appends are not hidden by the cached history"""
+        self.store.create_conversation('conv_1')
+        self.store.add_message('conv_1', 'user', 'Hi', 1)
+        self.assertEqual(len(self.store.history('conv_1')), 1)
+
+        other = ConversationStore(self.path)
+        other.add_messages('conv_1', [('assistant', 'Hello', 2), ('user', 'More', 1)])
+        other.close()
+        self.assertEqual([m['content'] for m in self.store.history('conv_1')], ['Hi', 'Hello', 'More'])
+
+        # A write after another store's is not appended to the stale copy either
+        other = ConversationStore(self.path)
+        other.add_message('conv_1', 'assistant', 'Sure', 1)
+        other.close()
+        self.store.add_message('conv_1', 'user', 'Bye', 1)
+        self.assertEqual([m['content'] for m in self.store.history('conv_1')],
+                         ['Hi', 'Hello', 'More', 'Sure', 'Bye'])
+
+    def test_failed_batch_rolled_back(self):
+        """Either both messages of an exchange are stored or neither"""
+        self.store.create_conversation('conv_1')
+        self.store.conn.execute('CREATE TRIGGER no_empty BEFORE INSERT ON messages WHEN NEW.content = \'\' '
+                                'BEGIN SELECT RAISE(ABORT, \'empty\'); END')
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.store.add_messages('conv_1', [('user', 'Hi', 1), ('assistant', '', 0)])
+        self.assertEqual(self.store.history('conv_1'), [])
+        self.assertEqual(self.store.conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+
+if __name__ == '__main__':
+    unittest.main()
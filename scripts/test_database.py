@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+from sqlalchemy import text
+import database
+from database import InstrumentedQueuePool, engine_stats, get_engine
+
+class TestGetEngine(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.url = f"sqlite:///{os.path.join(self.tmp.name, 'market.db')}"
+
+    def tearDown(self):
+        for key in [key for key in database._engines if key[0] == self.url]:
+            database._engines.pop(key).dispose()
+        self.tmp.cleanup()
+
+    def test_cached_per_url_and_settings(self):
+        """Callers with the same URL and overrides share one engine"""
+        engine = get_engine(self.url)
+        self.assertIs(get_engine(self.url), engine)
+        self.assertIsNot(get_engine(self.url, pool_size=1), engine)
+        self.assertIs(get_engine(self.url, pool_size=1), get_engine(self.url, pool_size=1))
+
+    def test_sqlite_wal(self):
+        """SQLite connections are opened in WAL mode"""
+        with get_engine(self.url).connect() as conn:
+            self.assertEqual(conn.execute(text("PRAGMA journal_mode")).scalar(), 'wal')
+            self.assertEqual(conn.execute(text("PRAGMA synchronous")).scalar(), 1)
+
+    def test_checkout_counters(self):
+        """Checkouts, active connections, waits and queries are counted"""
+        engine = get_engine(self.url, poolclass=InstrumentedQueuePool, pool_size=2, max_overflow=0)
+        with engine.connect() as first:
+            first.execute(text("SELECT 1"))
+            with engine.connect() as second:
+                second.execute(text("SELECT 1"))
+                self.assertEqual(engine.stats.active_connections, 2)
+
+        stats = engine_stats(engine)
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['active_connections'], 0)
+        self.assertEqual(stats['peak_active_connections'], 2)
+        self.assertGreaterEqual(stats['queries'], 2)
+        self.assertGreater(stats['checkout_wait_total'], 0)
+        self.assertIn('Pool size: 2', stats['pool'])
+
+if __name__ == '__main__':
+    unittest.main()
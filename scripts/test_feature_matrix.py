@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from setup_database import Base, Property, FeatureCategory, Feature, PropertyFeature
+from feature_matrix import FeatureMatrix, load_feature_matrix, parse_feature_values
+
+class TestFeatureMatrix(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'feature_matrix.npz')
+
+        self.session = sessionmaker(bind=self.engine)()
+        yesterday = datetime.now() - timedelta(days=1)
+        category = FeatureCategory(id=1, name='Exterior')
+        self.session.add_all([
+            category,
+            Feature(id=10, category_id=1, name='Pool'),
+            Feature(id=20, category_id=1, name='Parking Spaces'),
+            Property(id=1, list_number='1', updated_at=yesterday),
+            Property(id=2, list_number='2', updated_at=yesterday),
+            Property(id=3, list_number='3', updated_at=yesterday),
+            PropertyFeature(property_id=1, feature_id=10, value='Yes'),
+            PropertyFeature(property_id=1, feature_id=20, value='2'),
+            PropertyFeature(property_id=2, feature_id=10, value='No')
+        ])
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+        self.tmp.cleanup()
+
+    def test_parse_values(self):
+        """Numbers are kept, no-like values are 0 and other text marks presence"""
+        values = parse_feature_values(pd.Series(['3', '1,200 m2', 'Yes', 'Private', 'No', None]))
+        self.assertEqual(values.tolist(), [3.0, 1200.0, 1.0, 1.0, 0.0, 0.0])
+
+    def test_rows(self):
+        """Rows come back in the requested order; unknown properties and features are zeros"""
+        matrix = load_feature_matrix(self.engine, self.path)
+        self.assertEqual(matrix.names([10, 20]), ['Exterior: Pool', 'Exterior: Parking Spaces'])
+        rows = matrix.rows([3, 1, 99, 2], [20, 10, 30]).toarray()
+        np.testing.assert_array_equal(rows, [[0, 0, 0], [2, 1, 0], [0, 0, 0], [0, 0, 0]])
+        self.assertEqual(matrix.frequent_features([1, 2, 3], min_count=1).tolist(), [10, 20])
+
+    def test_incremental_update(self):
+        """Only properties updated since the cache was written are re-read"""
+        load_feature_matrix(self.engine, self.path)
+        self.session.query(PropertyFeature).filter_by(property_id=1, feature_id=20).delete()
+        self.session.add_all([
+            Feature(id=30, category_id=1, name='Ocean View'),
+            PropertyFeature(property_id=3, feature_id=30, value='Partial')
+        ])
+        self.session.query(Property).filter(Property.id.in_([1, 3])).update(
+            {Property.updated_at: datetime.now()}, synchronize_session=False
+        )
+        self.session.commit()
+
+        updated = load_feature_matrix(self.engine, self.path)
+        rebuilt = FeatureMatrix.build(lambda query: pd.read_sql(query, self.engine))
+        np.testing.assert_array_equal(updated.property_ids, rebuilt.property_ids)
+        np.testing.assert_array_equal(updated.rows(rebuilt.property_ids, rebuilt.feature_ids).toarray(),
+                                      rebuilt.matrix.toarray())
+        self.assertEqual(FeatureMatrix.load(self.path).names([30]), ['Exterior: Ocean View'])
+
+if __name__ == '__main__':
+    unittest.main()
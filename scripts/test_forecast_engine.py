@@ -0,0 +1,70 @@
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from forecast_engine import ForecastEngine, build_panel, fit_series
+
+def monthly_stats(area: str, months: int, start: str = '2020-01-01') -> pd.DataFrame:
+    """Trending, seasonal monthly median prices for one market"""
+    index = np.arange(months)
+    prices = 1e6 * (1 + 0.01 * index) * (1 + 0.05 * np.sin(index * 2 * np.pi / 12))
+    return pd.DataFrame({
+        'area': area, 'property_type': 'House',
+        'month': pd.date_range(start, periods=months, freq='MS'),
+        'median_price': prices, 'listings': 10
+    })
+
+class TestForecastEngine(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = ForecastEngine(cache_dir=self.tmp.name, periods=3, max_workers=1)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_panel(self):
+        """Markets become columns over one continuous month index"""
+        stats = pd.concat([monthly_stats('North', 6), monthly_stats('South', 3, '2020-02-01')])
+        stats = stats[stats['month'] != '2020-03-01']
+        panel = build_panel(stats)
+        self.assertEqual(len(panel), 6)
+        self.assertEqual(sorted(panel.columns), [('North', 'House'), ('South', 'House')])
+        self.assertTrue(np.isnan(panel.loc['2020-03-01', ('North', 'House')]))
+
+    def test_model_by_series_length(self):
+        """Long series get seasonal ARIMA, medium ones smoothing and short ones a naive forecast"""
+        stats = pd.concat([monthly_stats('Long', 40), monthly_stats('Medium', 15, '2022-02-01'),
+                           monthly_stats('Short', 4, '2023-01-01')])
+        forecasts = self.engine.forecast(stats)
+        models = {key[0]: values[0]['model'] for key, values in forecasts.items()}
+        self.assertEqual(models, {'Long': 'sarima', 'Medium': 'ets', 'Short': 'naive'})
+        self.assertEqual([row['month'] for row in forecasts[('Long', 'House')]], ['2023-05', '2023-06', '2023-07'])
+        long = forecasts[('Long', 'House')][0]
+        self.assertLess(long['lower'], long['predicted_price'])
+        self.assertLess(long['predicted_price'], long['upper'])
+        self.assertIsNone(forecasts[('Short', 'House')][0]['lower'])
+
+    def test_cached_parameters_reused(self):
+        """A new month is filtered with the cached parameters instead of refitting"""
+        self.engine.forecast(monthly_stats('North', 40))
+        self.assertEqual(self.engine.last_run['fitted'], 1)
+        market = monthly_stats('North', 41).drop(columns=['area', 'property_type'])
+        forecast = self.engine.forecast_market(market, 'North', 'House')
+        self.assertEqual(self.engine.last_run.get('filtered'), 1)
+        self.assertEqual(forecast[0]['month'], '2023-06')
+
+        self.engine.refit_months = 1
+        self.engine.forecast_market(market, 'North', 'House')
+        self.assertEqual(self.engine.last_run.get('fitted'), 1)
+
+    def test_unusable_values_missing(self):
+        """Zero prices count as missing months instead of breaking the log model"""
+        values = np.linspace(1e6, 2e6, 20)
+        values[5] = 0
+        forecast, state = fit_series(values, pd.Timestamp('2020-01-01'), 2)
+        self.assertEqual(forecast['kind'], 'ets')
+        self.assertTrue(np.all(np.isfinite(forecast['mean'])))
+        self.assertEqual(state['months'], 20)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import pandas as pd
+import sqlalchemy as sa
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from setup_database import Base, MarketMonthlyStats
+from bulk_import import bulk_import_properties
+from market_aggregates import LISTING_COLUMNS, STAT_COLUMNS, compute_market_stats, refresh_market_stats
+
+KEY = ['area', 'property_type', 'month']
+
+class TestRefreshMarketStats(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.listings = pd.DataFrame({
+            'List Number': [str(number) for number in range(1, 9)],
+            'Area': ['North', 'North', 'South', 'South', 'North', 'South', 'North', 'South'],
+            'property_type': ['House', 'Condo', 'House', 'House', 'House', 'Condo', 'Condo', 'House'],
+            'current_price': [100000.0, 150000.0, 200000.0, 250000.0, 120000.0, 180000.0, 90000.0, 300000.0],
+            'construction_m2': [100.0, 80.0, 150.0, None, 110.0, 90.0, 70.0, 200.0],
+            'Days on Market': [10, 20, 30, 40, 50, 60, 70, 80],
+            'begin_date': pd.to_datetime(['2024-01-05', '2024-01-20', '2024-01-25', '2024-02-03',
+                                          '2024-02-14', '2024-03-01', '2024-03-09', '2024-03-30'])
+        })
+        bulk_import_properties(self.listings, self.session, delta=True)
+
+    def tearDown(self):
+        self.session.close()
+
+    def stored(self) -> pd.DataFrame:
+        table = MarketMonthlyStats.__table__
+        columns = [table.c[column] for column in KEY + STAT_COLUMNS + ['refreshed_at']]
+        df = pd.read_sql(sa.select(*columns), self.engine)
+        df['month'] = pd.to_datetime(df['month'])
+        df[STAT_COLUMNS] = df[STAT_COLUMNS].astype(float)
+        return df.sort_values(KEY).reset_index(drop=True)
+
+    def test_incremental_matches_full_rebuild(self):
+        """After a delta import, recomputing only the changed month gives the full rebuild's rows"""
+        full_rows = refresh_market_stats(self.engine, full=True)
+        before = self.stored()
+
+        changed = self.listings[self.listings['List Number'] == '4'].assign(current_price=400000.0)
+        bulk_import_properties(changed, self.session, delta=True)
+        rows = refresh_market_stats(self.engine)
+        after = self.stored()
+
+        # Only February was recomputed
+        rewritten = after[after['refreshed_at'] != before['refreshed_at'].iloc[0]]
+        self.assertEqual(set(rewritten['month'].dt.month), {2})
+        self.assertEqual(rows, len(rewritten))
+        self.assertLess(rows, full_rows)
+
+        expected = compute_market_stats(pd.read_sql(sa.select(*LISTING_COLUMNS), self.engine))
+        expected['month'] = pd.to_datetime(expected['month'])
+        pd.testing.assert_frame_equal(after[KEY + STAT_COLUMNS],
+                                      expected.sort_values(KEY).reset_index(drop=True),
+                                      check_dtype=False)
+        self.assertEqual(refresh_market_stats(self.engine), 0)
+
+if __name__ == '__main__':
+    unittest.main()
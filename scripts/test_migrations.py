@@ -0,0 +1,70 @@
+import unittest
+import sqlalchemy as sa
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from setup_database import Property
+from migrations import MIGRATIONS, applied_versions, migrate
+
+# The tables as the original setup_database.py created them
+BASELINE_SCHEMA = [
+    """CREATE TABLE properties (
+        id INTEGER PRIMARY KEY, list_number VARCHAR UNIQUE, agency_name VARCHAR, agency_phone VARCHAR,
+        listing_agent VARCHAR, property_type VARCHAR, status VARCHAR, days_on_market INTEGER,
+        area VARCHAR, community VARCHAR, initial_price FLOAT, current_price FLOAT, sold_price FLOAT,
+        development_name VARCHAR, state VARCHAR, construction_ft2 FLOAT, lot_measurements VARCHAR,
+        half_bath INTEGER, floor_number INTEGER, furnished BOOLEAN, construction_m2 FLOAT,
+        begin_date DATETIME
+    )""",
+    "CREATE TABLE feature_categories (id INTEGER PRIMARY KEY, name VARCHAR UNIQUE)",
+    """CREATE TABLE features (
+        id INTEGER PRIMARY KEY, category_id INTEGER REFERENCES feature_categories (id), name VARCHAR
+    )""",
+    """CREATE TABLE property_features (
+        id INTEGER PRIMARY KEY, property_id INTEGER REFERENCES properties (id),
+        feature_id INTEGER REFERENCES features (id), value VARCHAR
+    )""",
+]
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        with self.engine.begin() as conn:
+            for statement in BASELINE_SCHEMA:
+                conn.exec_driver_sql(statement)
+            conn.exec_driver_sql("INSERT INTO properties (id, list_number) VALUES (1, '101')")
+            conn.exec_driver_sql("INSERT INTO feature_categories (id, name) VALUES (1, 'Amenities')")
+            # A duplicate feature name, which the unique index of migration 2 does not allow
+            conn.exec_driver_sql("INSERT INTO features (id, category_id, name) VALUES (1, 1, 'Pool'), (2, 1, 'Pool')")
+            conn.exec_driver_sql("INSERT INTO property_features (property_id, feature_id, value) VALUES (1, 2, 'Yes')")
+
+    def test_migrate_baseline(self):
+        """A database created before migrations existed is brought up to the current model"""
+        self.assertEqual(migrate(self.engine), [migration.version for migration in MIGRATIONS])
+        self.assertEqual(applied_versions(self.engine), [1, 2, 3])
+        self.assertEqual(migrate(self.engine), [])
+
+        inspector = sa.inspect(self.engine)
+        columns = {column['name'] for column in inspector.get_columns('properties')}
+        self.assertTrue({'content_hash', 'updated_at'} <= columns)
+        self.assertIn('ix_properties_updated_at', {index['name'] for index in inspector.get_indexes('properties')})
+        self.assertTrue(inspector.has_table('market_monthly_stats'))
+
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.exec_driver_sql("SELECT id FROM features").scalars().all(), [1])
+            self.assertEqual(conn.exec_driver_sql("SELECT feature_id FROM property_features").scalar(), 1)
+
+        # The migrated table works with the current model
+        session = sessionmaker(bind=self.engine)()
+        session.add(Property(list_number='102', content_hash='abc'))
+        session.commit()
+        self.assertIsNotNone(session.query(Property).filter_by(list_number='102').one().updated_at)
+        session.close()
+
+    def test_target_version(self):
+        """Migrating to a target stops there and later runs apply the rest"""
+        self.assertEqual(migrate(self.engine, target=1), [1])
+        self.assertFalse(sa.inspect(self.engine).has_table('market_monthly_stats'))
+        self.assertEqual(migrate(self.engine), [2, 3])
+
+if __name__ == '__main__':
+    unittest.main()
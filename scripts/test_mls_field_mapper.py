@@ -0,0 +1,68 @@
+import unittest
+import pandas as pd
+from mls_field_mapper import MLSFieldMapper, FieldSpec, FT2_PER_M2
+from synthetic_mls import synthetic_mls_frame
+
+class TestMLSFieldMapper(unittest.TestCase):
+    def setUp(self):
+        self.mapper = MLSFieldMapper()
+        self.raw = pd.DataFrame({
+            'List Number': ['A1', 'A2', 'A3'],
+            'Property Type': ['Casa', ' departamento ', None],
+            'List Price': ['$1,250,000', '350,000.50 MXN', '0'],
+            'Construction': ['150 m2', '1,200 sq ft', None],
+            'Half Baths': ['1', '2.0', 'n/a'],
+            'Furnished': ['Yes', 'no', 'Partially']
+        })
+
+    def test_prices(self):
+        """Price strings are parsed; zero prices become missing"""
+        df = self.mapper.process_dataframe(self.raw)
+        self.assertEqual(df['current_price'].iloc[0], 1250000.0)
+        self.assertEqual(df['current_price'].iloc[1], 350000.5)
+        self.assertTrue(pd.isna(df['current_price'].iloc[2]))
+
+    def test_areas_converted(self):
+        """Areas are converted between m2 and ft2 in both directions"""
+        df = self.mapper.process_dataframe(self.raw)
+        self.assertAlmostEqual(df['construction_m2'].iloc[0], 150.0)
+        self.assertAlmostEqual(df['construction_ft2'].iloc[0], 150.0 * FT2_PER_M2)
+        self.assertAlmostEqual(df['construction_m2'].iloc[1], 1200.0 / FT2_PER_M2)
+        self.assertAlmostEqual(df['construction_ft2'].iloc[1], 1200.0)
+
+    def test_text_and_flags(self):
+        """Property types are normalized, ints and booleans coerced, unknowns missing"""
+        df = self.mapper.process_dataframe(self.raw)
+        self.assertEqual(df['property_type'].tolist()[:2], ['House', 'Condo'])
+        self.assertTrue(pd.isna(df['property_type'].iloc[2]))
+        self.assertEqual(str(df['half_bath'].dtype), 'Int64')
+        self.assertEqual(df['half_bath'].tolist()[:2], [1, 2])
+        self.assertEqual(df['furnished'].tolist()[:2], [True, False])
+        self.assertTrue(pd.isna(df['furnished'].iloc[2]))
+
+    def test_missing_sources(self):
+        """Targets without a source column are added empty, source columns are kept"""
+        df = self.mapper.process_dataframe(self.raw)
+        self.assertIn('List Price', df.columns)
+        self.assertTrue(df['sold_price'].isna().all())
+        self.assertEqual(str(df['furnished'].dtype), 'boolean')
+
+    def test_custom_spec(self):
+        """A spec can override sources and defaults; bad specs are rejected"""
+        mapper = MLSFieldMapper([FieldSpec('state', ('Estado',), 'text', default='Jalisco')])
+        df = mapper.process_dataframe(pd.DataFrame({'Estado': ['Nayarit', None]}))
+        self.assertEqual(df['state'].tolist(), ['Nayarit', 'Jalisco'])
+        with self.assertRaises(ValueError):
+            MLSFieldMapper([FieldSpec('state', ('State',), 'unknown')])
+
+    def test_synthetic_listings(self):
+        """Synthetic exports are deterministic and map cleanly, list dates included"""
+        raw = synthetic_mls_frame(500, seed_value=7)
+        pd.testing.assert_frame_equal(raw, synthetic_mls_frame(500, seed_value=7))
+        df = self.mapper.process_dataframe(raw)
+        self.assertTrue(df['current_price'].notna().all())
+        self.assertEqual(str(df['begin_date'].dtype), 'datetime64[ns]')
+        self.assertGreater(df['begin_date'].notna().mean(), 0.9)
+
+if __name__ == '__main__':
+    unittest.main()
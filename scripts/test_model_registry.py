@@ -0,0 +1,51 @@
+import os
+import tempfile
+import time
+import unittest
+from model_registry import ModelRegistry
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def age(self, registry, key, seconds):
+        """Backdate an entry's last use"""
+        past = time.time() - seconds
+        os.utime(registry._path(key), (past, past))
+
+    def test_entry_limit_evicts_least_recently_used(self):
+        """Over max_entries the entry used longest ago goes, from disk and memory"""
+        registry = ModelRegistry(self.tmp.name, max_entries=2, max_bytes=None)
+        registry.put('a', [1])
+        registry.put('b', [2])
+        self.age(registry, 'a', 20)
+        self.age(registry, 'b', 10)
+        self.assertEqual(registry.get('a'), [1])
+        registry.put('c', [3])
+
+        self.assertIsNone(registry.get('b'))
+        self.assertEqual(registry.get('a'), [1])
+        self.assertEqual(registry.stats(), {'hits': 2, 'misses': 1, 'entries': 2})
+
+        # Entries written by another process are found on disk
+        self.assertEqual(ModelRegistry(self.tmp.name).get('c'), [3])
+
+    def test_byte_limit(self):
+        """Over max_bytes the oldest entries go, but the newest is kept even if it alone is too big"""
+        registry = ModelRegistry(self.tmp.name, max_bytes=2500)
+        registry.put('a', b'x' * 1000)
+        registry.put('b', b'x' * 1000)
+        self.age(registry, 'a', 20)
+        self.age(registry, 'b', 10)
+        registry.put('c', b'x' * 1000)
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ['b.joblib', 'c.joblib'])
+
+        registry.put('d', b'x' * 5000)
+        self.assertEqual(os.listdir(self.tmp.name), ['d.joblib'])
+        self.assertIsNone(registry.get('c'))
+
+if __name__ == '__main__':
+    unittest.main()
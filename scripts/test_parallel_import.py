@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from setup_database import Base, Property
+from parallel_import import parallel_import
+
+class TestParallelImport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_url = f"sqlite:///{os.path.join(self.tmp.name, 'market.db')}"
+        self.engine = create_engine(self.db_url)
+        Base.metadata.create_all(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def write_csv(self, name: str, text: str) -> str:
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_per_file_counts_and_errors(self):
+        """Each file reports its own counts; a file that cannot be read does not stop the others"""
+        first = self.write_csv('mls_1.csv', 'List Number,Status,List Price,Features\n'
+                               '101,Active,"$100,000",Amenities|Pool|Yes\n102,Sold,"$200,000",\n')
+        second = self.write_csv('mls_2.csv', 'List Number,Status,List Price\n102,Sold,"$210,000"\n103,Active,\n')
+        broken = self.write_csv('mls_3.csv', '')
+        self.write_csv('mls_1_processed.csv', 'List Number\n999\n')
+
+        summary = parallel_import(self.tmp.name, self.db_url, max_workers=2)
+        self.assertEqual(list(summary['errors']), [broken])
+        files = {result['file']: result for result in summary['files']}
+        self.assertEqual(sorted(files), [first, second])
+        self.assertEqual((files[first]['rows'], files[first]['created'], files[first]['features']), (2, 2, 1))
+        self.assertEqual((files[second]['rows'], files[second]['created'], files[second]['updated']), (2, 1, 1))
+        self.assertEqual((summary['rows'], summary['created'], summary['updated']), (4, 3, 1))
+
+        session = sessionmaker(bind=self.engine)()
+        prices = {prop.list_number: prop.current_price for prop in session.query(Property)}
+        self.assertEqual(prices, {'101': 100000.0, '102': 210000.0, '103': None})
+        session.close()
+
+    def test_sqlite_single_writer(self):
+        """SQLite files are imported one at a time, so none fail with 'database is locked'"""
+        for number in range(3):
+            self.write_csv(f'mls_{number}.csv', 'List Number,Status\n' + ''.join(
+                f'{number}{row},Active\n' for row in range(50)))
+        summary = parallel_import(self.tmp.name, self.db_url, max_workers=3)
+        self.assertEqual(summary['workers'], 1)
+        self.assertEqual(summary['errors'], {})
+        self.assertEqual(summary['created'], 150)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+import pandas as pd
+import sqlalchemy as sa
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+from setup_database import Base, Property
+from bulk_import import bulk_import_properties
+from mls_field_mapper import MLSFieldMapper
+from reconcile import (DIGEST_COLUMNS, _canonical, _pg_bucket_sql, _sql_canonical, _with_buckets,
+                       bucket_summary, db_bucket_digests, db_bucket_summary, db_digests, reconcile,
+                       row_digests)
+
+# Schema the PostgreSQL tests create (and drop) in the TEST_DATABASE_URL database
+TEST_SCHEMA = 'reconcile_test'
+
+class TestReconcile(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmp.name, 'mls.csv')
+
+        raw = pd.DataFrame({
+            'List Number': ['101', '102', '103', '104'],
+            'Agency Name': ['Agency 1', 'Agency 2', 'Agency 3', 'Agency 4'],
+            'Status': ['Active', 'Sold', 'Active', 'Active'],
+            'Area': ['North', 'South', 'East', 'West'],
+            'Property Type': ['Casa', 'Condo', 'Lot', 'Casa'],
+            'List Price': ['$100,000.10', '$200,000', '$300,000', '$400,000'],
+            'Construction': ['150 m2', '1,200 sq ft', None, '90 m2'],
+            'Furnished': ['Yes', 'No', None, 'Yes']
+        })
+        raw.to_csv(self.csv_path, index=False)
+
+        session = sessionmaker(bind=self.engine)()
+        bulk_import_properties(MLSFieldMapper().process_dataframe(raw), session)
+        session.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_identical(self):
+        """A fresh import reconciles cleanly"""
+        result = reconcile(self.csv_path, self.engine, buckets=4)
+        self.assertEqual(result['csv_rows'], 4)
+        self.assertEqual(result['db_rows'], 4)
+        self.assertEqual(result['mismatched_buckets'], 0)
+        self.assertEqual((result['missing'], result['extra'], result['changed']), ([], [], []))
+
+    def test_differences(self):
+        """Missing, extra and changed listings are pinpointed"""
+        with self.engine.begin() as conn:
+            conn.execute(text("UPDATE properties SET current_price = 100000.2 WHERE list_number = '101'"))
+            conn.execute(text("UPDATE properties SET furnished = NULL WHERE list_number = '102'"))
+            conn.execute(text("DELETE FROM properties WHERE list_number = '103'"))
+            conn.execute(text("INSERT INTO properties (list_number) VALUES ('999')"))
+        result = reconcile(self.csv_path, self.engine, buckets=4)
+        self.assertEqual(result['missing'], ['103'])
+        self.assertEqual(result['extra'], ['999'])
+        self.assertEqual(result['changed'], ['101', '102'])
+
+class TestPostgresSql(unittest.TestCase):
+    """The server-side digest SQL, checked as text since no PostgreSQL server is available here"""
+
+    def test_canonical_parts(self):
+        """Each column is rendered as _canonical renders it, in DIGEST_COLUMNS order"""
+        parts = dict(zip(DIGEST_COLUMNS, _sql_canonical('postgresql').split(" || chr(31) || ")))
+        self.assertEqual(len(parts), len(DIGEST_COLUMNS))
+        self.assertEqual(parts['agency_name'], "coalesce(agency_name::text, '')")
+        self.assertEqual(parts['days_on_market'], "coalesce(days_on_market::text, '')")
+        self.assertEqual(parts['current_price'], "coalesce(round(current_price * 100)::bigint::text, '')")
+        self.assertEqual(parts['furnished'], "coalesce(CASE WHEN furnished THEN '1' WHEN NOT furnished THEN '0' END, '')")
+        self.assertEqual(parts['begin_date'], "coalesce(to_char(begin_date, 'YYYY-MM-DD HH24:MI:SS'), '')")
+
+    def test_known_digest(self):
+        """A known row's canonical text and digest, as the SQL expressions compute them"""
+        row = pd.DataFrame({'list_number': ['101'], 'agency_name': ['Agency 1'], 'days_on_market': [12],
+                            'current_price': [100000.1], 'furnished': [True],
+                            'begin_date': [pd.Timestamp('2024-03-05 14:30')]})
+        values = {'agency_name': 'Agency 1', 'days_on_market': '12', 'current_price': '10000010',
+                  'furnished': '1', 'begin_date': '2024-03-05 14:30:00'}
+        expected = '\x1f'.join(values.get(name, '') for name in DIGEST_COLUMNS)
+        self.assertEqual(_canonical(row).iloc[0], expected)
+
+        # md5 = 2d9b88654bb9b46a80b795ca6846e930; ('x' || substr(md5, 1, 15))::bit(60)::bigint
+        self.assertEqual(int(row_digests(row)['digest'].iloc[0]), 0x2d9b88654bb9b46)
+        _, digest = _pg_bucket_sql(4)
+        self.assertTrue(digest.startswith("('x' || substr(md5("))
+        self.assertTrue(digest.endswith("), 1, 15))::bit(60)::bigint"))
+
+    def test_unsupported_dialect(self):
+        with self.assertRaisesRegex(ValueError, 'unsupported dialect sqlite'):
+            _sql_canonical('sqlite')
+
+class TestPostgresDigests(unittest.TestCase):
+    """The server-side digest SQL run on PostgreSQL; set TEST_DATABASE_URL to a scratch database"""
+
+    @classmethod
+    def setUpClass(cls):
+        url = os.getenv('TEST_DATABASE_URL')
+        if not url or make_url(url).get_backend_name() != 'postgresql':
+            raise unittest.SkipTest("TEST_DATABASE_URL does not name a PostgreSQL database")
+        cls.engine = create_engine(url, connect_args={'options': f'-c search_path={TEST_SCHEMA}'})
+        try:
+            with cls.engine.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE"))
+                conn.execute(text(f"CREATE SCHEMA {TEST_SCHEMA}"))
+        except sa.exc.OperationalError as e:
+            cls.engine.dispose()
+            raise unittest.SkipTest(f"PostgreSQL is not available: {e}")
+        Base.metadata.create_all(cls.engine)
+
+        session = sessionmaker(bind=cls.engine)()
+        session.add_all([
+            Property(list_number='101', agency_name='Agency 1', status='Active', area='Peñasco',
+                     current_price=100000.1, initial_price=99999.99, construction_m2=150.25,
+                     construction_ft2=1617.29, days_on_market=12, half_bath=1, furnished=True,
+                     begin_date=datetime(2024, 3, 5, 14, 30, 15)),
+            Property(list_number='102', agency_name='Agency 2', status='Sold', sold_price=2500000.0,
+                     floor_number=3, furnished=False, lot_measurements='10 x 20'),
+            Property(list_number='103'),
+            Property(list_number=None, current_price=1.0)
+        ] + [Property(list_number=str(number), current_price=number * 1234.56, area=f'Area {number % 3}')
+             for number in range(200, 250)])
+        session.commit()
+        session.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        with cls.engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE"))
+        cls.engine.dispose()
+
+    def test_sql_matches_python(self):
+        """Canonical text, row digests and bucket summaries computed by the server equal _canonical's"""
+        columns = [Property.__table__.c[name] for name in ['list_number'] + DIGEST_COLUMNS]
+        with self.engine.connect() as conn:
+            rows = pd.read_sql(sa.select(*columns).where(Property.list_number.isnot(None))
+                               .order_by(Property.list_number), conn)
+            sql = pd.read_sql(text(f"SELECT list_number, {_sql_canonical('postgresql')} AS canonical "
+                                   f"FROM properties WHERE list_number IS NOT NULL ORDER BY list_number"), conn)
+            self.assertEqual(sql['canonical'].tolist(), _canonical(rows).tolist())
+
+            python = _with_buckets(db_digests(conn), 16).sort_values('list_number')
+            server = db_bucket_digests(conn, 16, list(range(16))).sort_values('list_number')
+            self.assertEqual(server['list_number'].tolist(), python['list_number'].tolist())
+            self.assertEqual(server['bucket'].tolist(), python['bucket'].tolist())
+            self.assertEqual(server['digest'].tolist(), python['digest'].tolist())
+
+            pd.testing.assert_frame_equal(db_bucket_summary(conn, 16).sort_index(), bucket_summary(python),
+                                          check_dtype=False, check_names=False)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import time
+import unittest
+from response_cache import ResponseCache, cache_key
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'response_cache.db')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_covers_request(self):
+        """Any change to model settings, system prompt or prompt gives a different key"""
+        base = cache_key('model', 1024, 0.7, None, 'prompt')
+        self.assertEqual(base, cache_key('model', 1024, 0.7, '', 'prompt'))
+        variants = [cache_key('other', 1024, 0.7, None, 'prompt'), cache_key('model', 512, 0.7, None, 'prompt'),
+                    cache_key('model', 1024, 0.0, None, 'prompt'), cache_key('model', 1024, 0.7, 'be brief', 'prompt'),
+                    cache_key('model', 1024, 0.7, None, 'prompt ')]
+        self.assertNotIn(base, variants)
+        self.assertEqual(len(set(variants)), len(variants))
+
+    def test_hits_persist(self):
+        """Stored responses are found again by later instances and counted"""
+        cache = ResponseCache(self.path)
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', 'analysis', 100, 20)
+        cache.close()
+
+        cache = ResponseCache(self.path)
+        self.assertEqual(cache.get('a'), {'response': 'analysis', 'input_tokens': 100, 'output_tokens': 20})
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 0, 'evictions': 0, 'entries': 1, 'hit_rate': 1.0})
+        cache.close()
+
+    def test_expired_entries_missed(self):
+        """Entries older than the TTL are dropped instead of returned"""
+        cache = ResponseCache(self.path, ttl_seconds=60)
+        cache.put('a', 'old')
+        cache.conn.execute('UPDATE responses SET created_at = ?', (time.time() - 120,))
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual((cache.misses, cache.evictions, cache.stats()['entries']), (1, 1, 0))
+        cache.close()
+
+    def test_least_recently_used_evicted(self):
+        """Beyond max_entries the least recently used responses go first"""
+        cache = ResponseCache(self.path, max_entries=2)
+        cache.put('a', '1')
+        cache.put('b', '2')
+        cache.conn.execute("UPDATE responses SET last_used = last_used - 10 WHERE key = 'b'")
+        cache.get('a')
+        cache.put('c', '3')
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertEqual(cache.evictions, 1)
+        cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+import pandas as pd
+import sqlalchemy as sa
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from setup_database import Base, Property, FeatureCategory, Feature, PropertyFeature
+from snapshot import create_snapshot, list_snapshots, read_manifest, restore_snapshot
+from duckdb_analytics import SnapshotAnalytics, duckdb
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.snapshot_dir = tempfile.mkdtemp()
+        self.session = sessionmaker(bind=self.engine)()
+        self.session.add_all([
+            FeatureCategory(id=1, name='Amenities'),
+            Feature(id=10, category_id=1, name='Pool'),
+            Feature(id=20, category_id=1, name='Garage'),
+            Property(id=1, list_number='1', current_price=100000.0),
+            Property(id=2, list_number='2', current_price=200000.0),
+            PropertyFeature(property_id=1, feature_id=10, value='Yes'),
+            PropertyFeature(property_id=2, feature_id=20, value='1')
+        ])
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+        shutil.rmtree(self.snapshot_dir)
+
+    def state(self):
+        """Listings with their prices and features, as plain tuples"""
+        self.session.expire_all()
+        return sorted(
+            (prop.list_number, prop.current_price, sorted((pf.feature.name, pf.value) for pf in prop.features))
+            for prop in self.session.query(Property)
+        )
+
+    def change_listings(self):
+        """Listing 1 loses all its features, listing 2 changes and listing 3 is new"""
+        now = datetime.now()
+        self.session.query(PropertyFeature).filter_by(property_id=1).delete()
+        self.session.query(Property).filter_by(id=1).update({Property.updated_at: now})
+        self.session.query(Property).filter_by(id=2).update({Property.current_price: 210000.0,
+                                                             Property.updated_at: now})
+        self.session.query(PropertyFeature).filter_by(property_id=2).update({PropertyFeature.value: '2'})
+        self.session.add_all([Property(id=3, list_number='3', current_price=300000.0),
+                              PropertyFeature(property_id=3, feature_id=10, value='Private')])
+        self.session.commit()
+
+    def test_full_and_incremental_restore(self):
+        """Restoring any snapshot of a chain gives back the tables as they were when it was taken"""
+        full = create_snapshot(self.engine, self.snapshot_dir)
+        full_state = self.state()
+
+        self.change_listings()
+        incremental = create_snapshot(self.engine, self.snapshot_dir)
+        incremental_state = self.state()
+
+        manifest = read_manifest(incremental)
+        self.assertEqual(manifest['tables']['properties'], 3)
+        self.assertEqual(manifest['base'], full.split('/')[-1])
+        self.assertEqual(list_snapshots(self.snapshot_dir), [full, incremental])
+
+        # Later edits are discarded by a restore
+        self.session.query(PropertyFeature).delete()
+        self.session.query(Property).filter_by(id=2).update({Property.current_price: 1.0})
+        self.session.commit()
+
+        restore_snapshot(self.engine, incremental)
+        self.assertEqual(self.state(), incremental_state)
+        self.assertEqual(incremental_state[0], ('1', 100000.0, []))
+
+        restore_snapshot(self.engine, full)
+        self.assertEqual(self.state(), full_state)
+
+    @unittest.skipIf(duckdb is None, "duckdb is not installed")
+    def test_snapshot_views_match_restore(self):
+        """DuckDB views over an incremental chain hold the same feature rows as a restore"""
+        create_snapshot(self.engine, self.snapshot_dir)
+        self.change_listings()
+        incremental = create_snapshot(self.engine, self.snapshot_dir)
+
+        query = sa.select(PropertyFeature.property_id, PropertyFeature.feature_id, PropertyFeature.value)
+        analytics = SnapshotAnalytics(incremental)
+        actual = analytics.read(query.order_by(PropertyFeature.property_id)).reset_index(drop=True)
+        analytics.close()
+        expected = pd.read_sql(query.order_by(PropertyFeature.property_id), self.engine)
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+        self.assertEqual(actual['property_id'].tolist(), [2, 3])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
+import os
+import tempfile
 import unittest
 import pandas as pd
-from verify_fields import verify_fields
+from verify_fields import verify_fields, validate_frame, validate_csv, ValidationReport, DuplicateTracker
 
 class TestVerifyFields(unittest.TestCase):
     def setUp(self):
@@ -42,5 +44,57 @@ class TestVerifyFields(unittest.TestCase):
         # Should still return True but log a warning
         self.assertTrue(result)
 
+    def test_report_counts_all_rules(self):
+        """Every rule is evaluated and offending rows are reported"""
+        invalid_data = self.valid_data.copy()
+        invalid_data['current_price'] = [100000, 'n/a', -5]
+        invalid_data.loc[1, 'List Number'] = 'A1'
+        report = validate_frame(invalid_data)
+        self.assertFalse(report.passed)
+        self.assertEqual(report.rules['invalid_type']['rows'], [1])
+        self.assertEqual(report.rules['invalid_type']['fields'], {'current_price': 1})
+        self.assertEqual(report.rules['invalid_price']['rows'], [2])
+        self.assertEqual(report.rules['duplicate_list_number']['rows'], [1])
+
+    def test_chunked_duplicates(self):
+        """Duplicates are found across chunks and row indices are kept"""
+        report = ValidationReport(max_rows=1)
+        duplicates = DuplicateTracker()
+        validate_frame(self.valid_data, report, duplicates)
+        validate_frame(self.valid_data.set_axis([3, 4, 5]), report, duplicates)
+        self.assertEqual(report.rows, 6)
+        self.assertEqual(report.rules['duplicate_list_number']['count'], 3)
+        self.assertEqual(report.rules['duplicate_list_number']['rows'], [3])
+        self.assertTrue(report.passed)
+
+    def test_validate_csv(self):
+        """A processed CSV is validated chunk by chunk"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'mls_processed.csv')
+            self.valid_data.to_csv(path, index=False)
+            report = validate_csv(path, chunksize=2, map_fields=False)
+        self.assertEqual(report.rows, 3)
+        self.assertTrue(report.passed)
+
+    def test_validate_raw_csv(self):
+        """Prices the mapper would blank are still flagged when validating a raw export"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'mls.csv')
+            pd.DataFrame({
+                'List Number': ['A1', 'A2', 'A3', 'A4', 'A5'],
+                'Agency Name': ['Agency 1'] * 5,
+                'Status': ['Active'] * 5,
+                'Area': ['North'] * 5,
+                'Property Type': ['Casa', 'Condo', 'Casa', 'Lote', 'Casa'],
+                'List Price': ['$100,000', '0', '-5', 'call for price', None]
+            }).to_csv(path, index=False)
+            report = validate_csv(path, chunksize=2)
+        self.assertFalse(report.passed)
+        self.assertEqual(report.rules['invalid_price']['rows'], [1, 2])
+        self.assertEqual(report.rules['invalid_type']['rows'], [3])
+        self.assertEqual(report.rules['invalid_type']['fields'], {'current_price': 1})
+        self.assertEqual(report.rules['empty_required']['fields'], {'current_price': 1})
+        self.assertEqual(report.missing_fields, [])
+
 if __name__ == '__main__':
     unittest.main()
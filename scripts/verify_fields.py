@@ -1,6 +1,168 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
 import pandas as pd
 import logging
 from datetime import datetime
+from typing import Any, Dict, List, Optional
+from csv_reader import iter_csv_chunks
+from listing_schema import csv_dtypes
+from mls_field_mapper import MLSFieldMapper, parse_number, source_column
+
+REQUIRED_FIELDS = [
+    'List Number',
+    'Agency Name',
+    'Status',
+    'Area',
+    'current_price',
+    'property_type'
+]
+
+# Fields whose values must be coercible to numbers
+NUMERIC_FIELDS = ['current_price', 'construction_ft2', 'Days on Market']
+
+# Rule name -> severity; any 'error' fails the verification, 'warning' rows are only reported
+RULES = {
+    'missing_fields': 'error',
+    'invalid_type': 'error',
+    'invalid_price': 'error',
+    'empty_required': 'warning',
+    'invalid_size': 'warning',
+    'duplicate_list_number': 'warning'
+}
+
+class ValidationReport:
+    """Per-rule offending row counts and indices, accumulated over one or more chunks.
+
+    At most max_rows indices are kept per rule so the report stays small for any
+    feed size; counts are always exact.
+    """
+
+    def __init__(self, max_rows: int = 1000):
+        self.max_rows = max_rows
+        self.rows = 0
+        self.missing_fields: List[str] = []
+        self.rules: Dict[str, Dict[str, Any]] = {
+            name: {'severity': severity, 'count': 0, 'rows': [], 'fields': {}}
+            for name, severity in RULES.items()
+        }
+
+    def add(self, rule: str, index: pd.Index, field: Optional[str] = None):
+        if not len(index):
+            return
+        entry = self.rules[rule]
+        entry['count'] += len(index)
+        room = self.max_rows - len(entry['rows'])
+        if room > 0:
+            entry['rows'].extend(index[:room].tolist())
+        if field:
+            entry['fields'][field] = entry['fields'].get(field, 0) + len(index)
+
+    @property
+    def passed(self) -> bool:
+        return all(entry['count'] == 0 for entry in self.rules.values() if entry['severity'] == 'error')
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'rows': self.rows,
+            'passed': self.passed,
+            'missing_fields': self.missing_fields,
+            'rules': self.rules
+        }
+
+    def log(self):
+        if self.missing_fields:
+            logging.error(f"Missing required fields: {self.missing_fields}")
+        for name, entry in self.rules.items():
+            if entry['count'] and name != 'missing_fields':
+                level = logging.ERROR if entry['severity'] == 'error' else logging.WARNING
+                detail = f" by field {entry['fields']}" if entry['fields'] else ""
+                logging.log(level, f"{name}: {entry['count']} rows{detail}, e.g. rows {entry['rows'][:10]}")
+
+class DuplicateTracker:
+    """Detects keys repeated within or across chunks.
+
+    Keeps a sorted array of 64-bit key hashes (8 bytes per distinct key rather
+    than a Python set of strings); merging each sorted chunk in is a linear
+    run merge.
+    """
+
+    def __init__(self):
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def duplicated(self, keys: pd.Series) -> pd.Series:
+        present = keys.notna().to_numpy()
+        hashes = pd.util.hash_pandas_object(keys.astype(str), index=False).to_numpy()
+
+        seen = np.zeros(len(keys), dtype=bool)
+        if len(self.hashes):
+            positions = np.minimum(np.searchsorted(self.hashes, hashes), len(self.hashes) - 1)
+            seen = self.hashes[positions] == hashes
+        duplicated = present & (seen | keys.duplicated().to_numpy())
+
+        new = np.unique(hashes[present & ~duplicated])
+        self.hashes = np.sort(np.concatenate([self.hashes, new]), kind='stable')
+        return pd.Series(duplicated, index=keys.index)
+
+def validate_frame(df: pd.DataFrame, report: Optional[ValidationReport] = None,
+                   duplicates: Optional[DuplicateTracker] = None) -> ValidationReport:
+    """Evaluate every rule on a processed MLS frame (or one chunk of it) into report.
+
+    Fields that MLSFieldMapper derives are checked on their raw source column when
+    the frame still has it, since the mapper blanks zero, negative and unparseable prices.
+    """
+    report = report or ValidationReport()
+    duplicates = duplicates or DuplicateTracker()
+    report.rows += len(df)
+
+    for field in REQUIRED_FIELDS:
+        source = source_column(df, field) or field
+        if source not in df.columns:
+            if field not in report.missing_fields:
+                report.missing_fields.append(field)
+                report.rules['missing_fields']['count'] += 1
+        else:
+            report.add('empty_required', df.index[df[source].isna().to_numpy()], field)
+
+    numbers = {}
+    for field in NUMERIC_FIELDS:
+        source = source_column(df, field)
+        if source or field in df.columns:
+            values = df[source or field]
+            numbers[field] = parse_number(values) if source else pd.to_numeric(values, errors='coerce')
+            invalid = numbers[field].isna() & values.notna()
+            report.add('invalid_type', df.index[invalid.to_numpy()], field)
+
+    if 'current_price' in numbers:
+        report.add('invalid_price', df.index[(numbers['current_price'] <= 0).to_numpy()])
+    if 'construction_ft2' in numbers:
+        report.add('invalid_size', df.index[(numbers['construction_ft2'] <= 0).to_numpy()])
+    if 'List Number' in df.columns:
+        report.add('duplicate_list_number', df.index[duplicates.duplicated(df['List Number']).to_numpy()])
+
+    return report
+
+def validate_csv(csv_path: str, chunksize: int = 100000, encoding: Optional[str] = None,
+                 map_fields: bool = True, max_rows: int = 1000) -> ValidationReport:
+    """Validate an MLS CSV chunk by chunk, so memory is bounded by chunksize.
+
+    Row indices in the report are positions in the file (0 = first data row).
+    With map_fields, each chunk goes through MLSFieldMapper first, as on import.
+    """
+    report = ValidationReport(max_rows)
+    duplicates = DuplicateTracker()
+    mapper = MLSFieldMapper() if map_fields else None
+    start = time.perf_counter()
+    for chunk in iter_csv_chunks(csv_path, chunksize=chunksize, encoding=encoding, dtype=csv_dtypes()):
+        if mapper:
+            chunk = mapper.process_dataframe(chunk)
+        validate_frame(chunk, report, duplicates)
+    elapsed = time.perf_counter() - start
+    print(f"Validated {report.rows} rows in {elapsed:.2f}s "
+          f"({report.rows / elapsed if elapsed > 0 else 0:.0f} rows/sec)")
+    return report
 
 def verify_fields(df: pd.DataFrame) -> bool:
     """Verify all required fields are present and valid"""
@@ -10,84 +172,45 @@ def verify_fields(df: pd.DataFrame) -> bool:
         level=logging.INFO,
         format='%(asctime)s - %(levelname)s - %(message)s'
     )
-    
+
     try:
-        # Required fields
-        required_fields = [
-            'List Number',
-            'Agency Name',
-            'Status',
-            'Area',
-            'current_price',
-            'property_type'
-        ]
-        
-        # Check for missing required fields
-        missing_fields = [field for field in required_fields if field not in df.columns]
-        if missing_fields:
-            logging.error(f"Missing required fields: {missing_fields}")
-            return False
-            
-        # Verify data types
-        type_checks = {
-            'List Number': str,
-            'current_price': [float, int],
-            'construction_ft2': [float, int],
-            'Days on Market': [float, int]
-        }
-        
-        for field, expected_types in type_checks.items():
-            if field in df.columns:
-                if not isinstance(expected_types, list):
-                    expected_types = [expected_types]
-                    
-                valid_type = any(df[field].dtype == type for type in expected_types)
-                if not valid_type:
-                    logging.error(f"Invalid data type for {field}. Expected {expected_types}, got {df[field].dtype}")
-                    return False
-                    
-        # Check for empty values in required fields
-        for field in required_fields:
-            empty_count = df[field].isna().sum()
-            if empty_count > 0:
-                logging.warning(f"Found {empty_count} empty values in {field}")
-                
-        # Verify value ranges
-        if 'current_price' in df.columns:
-            invalid_prices = (df['current_price'] <= 0).sum()
-            if invalid_prices > 0:
-                logging.error(f"Found {invalid_prices} invalid prices (<=0)")
-                return False
-                
-        if 'construction_ft2' in df.columns:
-            invalid_sizes = (df['construction_ft2'] <= 0).sum()
-            if invalid_sizes > 0:
-                logging.warning(f"Found {invalid_sizes} invalid construction sizes (<=0)")
-                
-        # Check for duplicate listings
-        duplicates = df['List Number'].duplicated().sum()
-        if duplicates > 0:
-            logging.warning(f"Found {duplicates} duplicate listing numbers")
-            
-        logging.info("Field verification completed successfully")
-        return True
-        
+        report = validate_frame(df)
+        report.log()
+        if report.passed:
+            logging.info("Field verification completed successfully")
+        return report.passed
+
     except Exception as e:
         logging.error(f"Error during field verification: {str(e)}")
         return False
 
 def main():
+    parser = argparse.ArgumentParser(description="Validate an MLS CSV export")
+    parser.add_argument('csv_path', nargs='?', default='data/mls.csv')
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--encoding', help="CSV encoding (sniffed from the file when omitted)")
+    parser.add_argument('--processed', action='store_true',
+                        help="The CSV is already mapped (e.g. an *_processed.csv from import_data)")
+    args = parser.parse_args()
+
     try:
-        # Load CSV file
-        df = pd.read_csv('data/mls.csv')
-        print(f"Loaded {len(df)} records")
-        
-        # Verify fields
-        if verify_fields(df):
+        report = validate_csv(args.csv_path, chunksize=args.chunksize, encoding=args.encoding,
+                              map_fields=not args.processed)
+
+        os.makedirs('output', exist_ok=True)
+        report_path = os.path.join('output', f"field_verification_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        with open(report_path, 'w') as f:
+            json.dump(report.to_dict(), f, indent=2)
+
+        for name, entry in report.rules.items():
+            if entry['count']:
+                print(f"{entry['severity'].upper()} {name}: {entry['count']}")
+        if report.passed:
             print("Field verification passed")
         else:
-            print("Field verification failed - check log file for details")
-            
+            print("Field verification failed")
+        print(f"Saved report to {report_path}")
+
     except Exception as e:
         print(f"Error: {str(e)}")
 